@@ -1,13 +1,15 @@
 import streamlit as st
-from pptx import Presentation
-from pptx.enum.shapes import MSO_SHAPE_TYPE
-import json
-import io
-import zipfile
+import os
 import random
-import urllib.parse
-import re
-import base64
+import zipfile
+import zlib
+
+from remix_core import (
+    DeckCache, DuplicateIndex, ExportBuilder, HttpBackend, ImageNormalizer, OverlayIndex, PreviewCache, ProjectStore, Verifier, VerifyCache,
+    add_builtin_prompts, as_reader, check_item, default_main_prompt, describe_key, extract_images_from_ppt, get_random_remix,
+    index_dataset_items, merge_dataset_zips, parse_bulk_remix_text, read_manifest, renumber_json_file, spool_file, verify_request,
+)
+from remix_core import metrics
 
 # ================= 🎨 1. DESIGN TOKENS & CSS =================
 MY_DESIGN_TOKENS = {
@@ -101,43 +103,7 @@ def inject_layout_css(tokens):
     """
     st.markdown(css, unsafe_allow_html=True)
 
-# ================= 2. DATA LISTS =================
-
-REMIX_LIST_EN = [
-    {"label": "Want a wider view?", "prompt": "Create an expanded image with extended space."},
-    {"label": "Want to zoom in?", "prompt": "Create a micro-detail close-up variant of this image."},
-    {"label": "Try paper cut style?", "prompt": "Remake this image in a modern paper cut style with layered colors and soft shadows."},
-    {"label": "Make this embroidery style?", "prompt": "Remake this image in a textile embroidery style with visible stitched threads."},
-    {"label": "Change to Pixel Art", "prompt": "Create this picture as a retro pixel art, with nostalgic detail and game shading."},
-    {"label": "Apply Glitch Effect", "prompt": "Remake this image as a glitch digital art, with pixel splits and cyberpunk noise."},
-    {"label": "Change to Watercolor", "prompt": "Create this picture as a watercolor painting."},
-    {"label": "Change to Impressionism", "prompt": "Create this picture as an Impressionist painting, with loose brushwork, luminous color, and fleeting light."},
-    {"label": "Draw with colored pencil?", "prompt": "Remake this image as a colored pencil drawing."},
-    {"label": "Try fine-line style?", "prompt": "Remake this image as a Chinese Gongbi painting with precise outlines, soft washes, and detailed forms."},
-    {"label": "Try Chinese paper cut style?", "prompt": "Remake this image as a Chinese paper cut, with red silhouettes, cultural motifs, and symmetrical patterns."},
-    {"label": "Try Ukiyo-e style?", "prompt": "Remake this image as a Japanese Ukiyo-e, with woodblock texture, flat colors, and flowing lines."},
-    {"label": "Make this a portrait?", "prompt": "Remake this image as a photo portrait, with natural light, and shallow depth."},
-    {"label": "Make this stained glass?", "prompt": "Remake this image as a stained glass design with colorful panes, bold outlines, and glowing light."},
-    {"label": "Try silkscreen style?", "prompt": "Remake this image as a silkscreen print."},
-    {"label": "Make this anime?", "prompt": "Remake this image as an anime illustration with expressive light and a dynamic layout."},
-    {"label": "Add sepia tone?", "prompt": "Remake this image as a sepia-toned memory with aged paper texture."},
-    {"label": "Make this pop art?", "prompt": "Remake this image as a high-saturation pop art, with bold blocks and hues."},
-    {"label": "Make this a gradient mesh?", "prompt": "Remake this image as a gradient mesh, blending colors seamlessly across the composition."},
-    {"label": "Make this a 3D figure?", "prompt": "Remake this image as a photorealistic 3D render of a collectible figure, made of real materials like resin or plastic with cinematic lighting, studio backdrop, and ultra-fine modeling detail."},
-    {"label": "Try duotone colors?", "prompt": "Remake this image as a duotone image."},
-    {"label": "Make this monochrome?", "prompt": "Remake this image as a monochrome image."},
-    {"label": "Add neon lighting?", "prompt": "Remake this image as a neon-lit scene with vibrant color contrasts."},
-    {"label": "Make this mechanical?", "prompt": "Create a mechanical version of the subject with exposed gears, metallic joints, and precise components."},
-    {"label": "Make this crystal?", "prompt": "Remake this image to be in an iridescent fantasy realm with the subject as translucent glass or crystal, glowing and refracted."}
-]
-
-COPILOT_GEN_INSTRUCTION = """A remix prompt consists of a short, 2–5-word title and an instruction.
-Please write 5 remix prompts for me based on the uploaded image.
-Format:
-Label: [Title]
-Prompt: [Instruction]"""
-
-def get_random_remix(): return random.choice(REMIX_LIST_EN)
+# ================= 2. CALLBACKS =================
 
 def randomize_callback(index, session_key_root, current_id_val):
     new_remix = get_random_remix()
@@ -145,54 +111,6 @@ def randomize_callback(index, session_key_root, current_id_val):
     st.session_state[f"l_{current_id_val}_{index}"] = new_remix['label']
     st.session_state[f"p_{current_id_val}_{index}"] = new_remix['prompt']
 
-def parse_bulk_remix_text(raw_text):
-    if not raw_text.strip(): return []
-    ACTION_KEYWORDS = ("create", "change", "recreate", "replace", "generate", "make", "transform", "add", "switch", "use", "apply", "convert", "turn")
-    lines = raw_text.split('\n')
-    parsed_items = []
-    processed_indices = set() 
-    def clean_line_start(s): return re.sub(r'^[\d\.\-\*\s]+', '', s).strip()
-
-    for i, line in enumerate(lines):
-        clean_current = clean_line_start(line)
-        lower_current = clean_current.lower()
-        is_prompt_start = lower_current.startswith(ACTION_KEYWORDS)
-        inline_split = line.split(":", 1)
-        has_inline_title = len(inline_split) > 1 and clean_line_start(inline_split[1]).lower().startswith(ACTION_KEYWORDS)
-
-        if is_prompt_start or has_inline_title:
-            title = "Remix Option"
-            prompt_text = ""
-            if has_inline_title:
-                title = clean_line_start(inline_split[0])
-                prompt_text = clean_line_start(inline_split[1])
-                processed_indices.add(i)
-            else:
-                prompt_text = clean_current
-                processed_indices.add(i)
-                k = i - 1
-                while k >= 0:
-                    prev_line = lines[k].strip()
-                    if prev_line and k not in processed_indices:
-                        title = clean_line_start(prev_line)
-                        processed_indices.add(k)
-                        break
-                    k -= 1
-            j = i + 1
-            while j < len(lines):
-                next_line = lines[j].strip()
-                if not next_line: j+=1; continue
-                clean_next = clean_line_start(next_line)
-                if clean_next.lower().startswith(ACTION_KEYWORDS): break
-                if j + 1 < len(lines):
-                    clean_next_next = clean_line_start(lines[j+1])
-                    if clean_next_next.lower().startswith(ACTION_KEYWORDS): break
-                prompt_text += " " + next_line
-                processed_indices.add(j)
-                j += 1
-            parsed_items.append({"label": title, "prompt": prompt_text})
-    return parsed_items
-
 def batch_parse_callback(session_key, current_id_val):
     batch_text = st.session_state.get("batch_input_area", "")
     parsed_items = parse_bulk_remix_text(batch_text)
@@ -210,140 +128,269 @@ def batch_parse_callback(session_key, current_id_val):
     else:
         st.session_state["_parse_error"] = True
 
-# --- File Operations ---
-
-def process_ppt_file(uploaded_file, start_id):
-    uploaded_file.seek(0) # 关键：重置文件指针
-    try:
-        prs = Presentation(uploaded_file)
-    except zipfile.BadZipFile:
-        raise ValueError("File is not a valid .pptx file.")
-    except Exception as e:
-        raise ValueError(f"Error reading PPT: {str(e)}")
-
-    current_id = int(start_id)
-    extracted_data = []
-    image_storage = {}
-    
-    for index, slide in enumerate(prs.slides):
-        slide_info = {"id": str(current_id), "original_prompt_text": "", "image_filename": ""}
-        found_image = False
-        
-        # === 核心修改：更强力的图片查找逻辑 ===
-        # 它可以识别：普通图片、图片占位符
-        
-        # 1. 优先寻找图片
-        target_shape = None
-        
-        # 遍历形状寻找图片
-        for shape in slide.shapes:
-            # A. 检查是否是普通图片
-            if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                target_shape = shape
-                break # 每个 Slide 只取第一张图
-            
-            # B. 检查是否是占位符且包含图片 (关键修复!)
-            elif shape.shape_type == MSO_SHAPE_TYPE.PLACEHOLDER:
-                if hasattr(shape, "image") and shape.image:
-                    target_shape = shape
-                    break
-        
-        # 如果找到了图片形状，提取数据
-        if target_shape:
-            try:
-                img_bytes = target_shape.image.blob
-                img_name = f"{current_id}.png"
-                image_storage[img_name] = img_bytes
-                slide_info["image_filename"] = img_name
-                found_image = True
-            except Exception:
-                pass # 如果图片数据损坏，跳过
-
-        # 2. 提取文字 (逻辑保持不变，但增加鲁棒性)
-        for shape in slide.shapes:
-            if shape.has_text_frame:
-                text = shape.text.strip()
-                # 只有当文字长度足够，且比当前已提取的文字更长时才更新
-                if len(text) > 5 and len(text) > len(slide_info["original_prompt_text"]):
-                    slide_info["original_prompt_text"] = text
-
-        # 只有当确实找到了图片时，才算作有效 Slide
-        if found_image:
-            extracted_data.append(slide_info)
-            current_id += 1
-            
-    return extracted_data, image_storage
-
-def create_final_zip(processed_jsons, image_storage):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        combined_list = []
-        sorted_keys = sorted(processed_jsons.keys(), key=lambda x: int(processed_jsons[x]['id']))
-        for key in sorted_keys:
-            item = processed_jsons[key]
-            clean_item = {
-                "id": item.get("id"),
-                "prompt": item.get("prompt"),
-                "remixSuggestions": [
-                    {"label": r.get("label"), "prompt": r.get("prompt")} for r in item.get("remixSuggestions", [])
-                ]
-            }
-            combined_list.append(clean_item)
-            target_img_name = f"{item.get('id')}.png"
-            if target_img_name in image_storage:
-                zip_file.writestr(f"images/{target_img_name}", image_storage[target_img_name])
-        json_str = json.dumps(combined_list, indent=4, ensure_ascii=False)
-        zip_file.writestr("dataset.json", json_str)
-    return zip_buffer
-
-def renumber_json_ids(json_file, start_num):
-    try:
-        content = json.load(json_file)
-        if not isinstance(content, list): return None, "Error: JSON root must be a list []"
-        counter = int(start_num)
-        for item in content:
-            if 'id' in item:
-                item['id'] = str(counter)
-                counter += 1
-        return json.dumps(content, indent=4, ensure_ascii=False), None
-    except Exception as e:
-        return None, f"Error: {str(e)}"
-
-def extract_images_from_ppt(uploaded_file, start_id):
-    uploaded_file.seek(0)
-    try:
-        prs = Presentation(uploaded_file)
-    except Exception as e:
-        return None, f"Error: {str(e)}"
-    zip_buffer = io.BytesIO()
-    current_id = int(start_id)
-    count = 0
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                    img_name = f"{current_id}.png"
-                    img_bytes = shape.image.blob
-                    zip_file.writestr(img_name, img_bytes)
-                    current_id += 1
-                    count += 1
-    return zip_buffer, count
+def card_request(item_id, idx, prompt):
+    # 每张卡片的 seed 默认由 ID 和位置决定，prompt 不变时重新 Verify 或重新打开 slide 都直接用缓存；
+    # 点过 🔄 (换一张) 的卡片用当时随机抽的 seed
+    seed = st.session_state.get(f"vs_{item_id}_{idx}")
+    if seed is None: seed = zlib.crc32(f"{item_id}:{idx}".encode()) % 10000
+    return verify_request(prompt, seed)
+
+def card_prompts(projects, project_id, item_id):
+    # 当前 slide 用编辑框里的内容，其他 slide 用项目库里保存的卡片；还没打开过的 slide 先抽好卡片存成草稿
+    remixes = st.session_state.get(f"remix_{item_id}")
+    if remixes is None:
+        state = projects.card_state(project_id, item_id)
+        if state is None:
+            remixes = [get_random_remix() for _ in range(3)]
+            projects.save_draft(project_id, item_id, remixes)
+        else: remixes = state["remixSuggestions"]
+    return [st.session_state.get(f"p_{item_id}_{idx}", r["prompt"]) for idx, r in enumerate(remixes)]
+
+def verify_cards(cards):
+    # cards: [(item_id, idx, prompt)]，并发请求，完成一张更新一次进度
+    requests = [card_request(item_id, idx, prompt) for item_id, idx, prompt in cards if prompt.strip()]
+    if not requests: return
+    total = len(set(requests))
+    progress = st.progress(0.0, text=f"Verifying {total} prompts...")
+    done = []
+    def on_done(request, result):
+        done.append(result)
+        progress.progress(len(done) / total, text=f"Verified {len(done)} / {total}")
+    results = get_verifier().verify_all(requests, on_done)
+    st.session_state["_verify_failed"] = (sum(isinstance(r, Exception) for r in results.values()), total)
+
+# 会话里只保留当前 slide 的控件状态，其余都在项目库里
+WORKING_SET_PREFIXES = ("m_", "l_", "p_", "remix_")
+
+def load_working_set(projects, project_id, item):
+    item_id = item['id']
+    if st.session_state.get("_working_id") == (project_id, item_id): return
+    for key in [k for k in st.session_state if k.startswith(WORKING_SET_PREFIXES)]: del st.session_state[key]
+    state = projects.card_state(project_id, item_id)
+    if state is None:
+        remixes = [get_random_remix() for _ in range(3)]
+        projects.save_draft(project_id, item_id, remixes)
+    else:
+        remixes = state["remixSuggestions"] + [get_random_remix() for _ in range(3 - len(state["remixSuggestions"]))]
+        if state["prompt"] is not None: st.session_state[f"m_{item_id}"] = state["prompt"]
+    st.session_state[f"remix_{item_id}"] = remixes
+    st.session_state["_live"] = {}
+    st.session_state["_working_id"] = (project_id, item_id)
+
+def slide_values(state, item_id):
+    # state: st.session_state，或者各个 fragment 每次运行时更新的 "_live" 副本 (下载按钮的回调不在脚本线程里，读不到 session_state)
+    remixes = [{"label": state.get(f"l_{item_id}_{i}", ""), "prompt": state.get(f"p_{item_id}_{i}", "")} for i in range(3)]
+    return {"id": item_id, "prompt": state.get(f"m_{item_id}", ""), "remixSuggestions": remixes}
+
+def open_project(project_id):
+    st.session_state.project_id = project_id
+    st.session_state.current_idx = get_project_store().first_unsaved(project_id)
+    st.query_params["project"] = str(project_id)
+    st.rerun()
+
+def close_project():
+    st.session_state.project_id = None
+    st.session_state.pop("_working_id", None)
+    st.query_params.pop("project", None)
+    st.rerun()
 
 # ================= 3. MAIN UI =================
+# 缩略图缓存按图片内容寻址，所有会话共用一份
+@st.cache_resource
+def get_preview_cache(): return PreviewCache()
+
+# Verify 预览缓存在磁盘上，REMIX_VERIFY_URL 可以换成本地替身服务 (python -m remix_core stand-in)
+@st.cache_resource
+def get_verifier():
+    cache_dir = os.environ.get("REMIX_VERIFY_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "remix-studio", "verify")
+    backend = HttpBackend(os.environ.get("REMIX_VERIFY_URL") or "https://image.pollinations.ai/prompt/")
+    return Verifier(backend, VerifyCache(cache_dir))
+
+# 项目 (每张 slide 的编辑结果) 保存在 SQLite 里，服务重启后可以继续
+@st.cache_resource
+def get_project_store():
+    return ProjectStore(os.environ.get("REMIX_PROJECT_DIR") or os.path.join(os.path.expanduser("~"), ".remix-studio", "projects"))
+
+# 解析过的 pptx 按内容缓存在磁盘上：刷新页面、重新上传、或在图片提取器里上传同一个文件都不用重新解析
+@st.cache_resource
+def get_deck_cache():
+    cache_dir = os.environ.get("REMIX_DECK_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "remix-studio", "decks")
+    return DeckCache(cache_dir)
+
+# 图片处理 (识别格式/转码/缩小) 的结果按图片摘要缓存，同样的参数所有会话共用一个
+@st.cache_resource
+def get_normalizer(fmt, quality, max_side): return ImageNormalizer(fmt, quality, max_side or None)
+
+# 查重索引：内置 remix 列表 (或 REMIX_DEDUPE_INDEX 指向的、python -m remix_core dedupe --save-index 建好的索引)
+# 所有项目共用一份；每个项目另有一个只含自己已保存 slide 的小索引，之后每次 Save & Next 先查再加入
+@st.cache_resource
+def get_dedupe_base():
+    path = os.environ.get("REMIX_DEDUPE_INDEX")
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            return DuplicateIndex.load(f)
+    index = DuplicateIndex()
+    add_builtin_prompts(index)
+    return index
+
+# 挤出去的项目下次用到时从项目库重建
+@st.cache_resource(max_entries=64)
+def get_dedupe_index(project_id):
+    index = OverlayIndex(get_dedupe_base())
+    index_dataset_items(index, project_source(project_id), get_project_store().processed(project_id).values())
+    return index
+
+def project_source(project_id): return f"project-{project_id}"
+
+def show_duplicates(item_id, dupes):
+    for field, hits in dupes:
+        score, key, text = hits[0]
+        where = f"slide {key[1]} {key[2]}" if key[0] == project_source(st.session_state.project_id) else describe_key(key)
+        st.warning(f"Slide {item_id} {field} is {score:.0%} similar to {where}: “{text[:80]}”")
+
+IMAGE_FORMAT_LABELS = {"original": "Unchanged (.png names)", "keep": "Detect format", "png": "PNG", "jpeg": "JPEG", "webp": "WebP"}
+
+def image_options_ui(key):
+    # 导出图片的格式选项；"original" 与以前一样原样写成 .png，不经过 normalizer
+    fmt = st.selectbox("Images", list(IMAGE_FORMAT_LABELS), format_func=IMAGE_FORMAT_LABELS.get, key=f"{key}_format")
+    max_side = st.number_input("Max side (px, 0 = full size)", min_value=0, value=0, step=256, key=f"{key}_max_side")
+    quality = st.slider("Quality", 50, 100, 90, key=f"{key}_quality") if fmt in ("jpeg", "webp") else 90
+    if fmt == "original" and not max_side: return None
+    return get_normalizer("keep" if fmt == "original" else fmt, quality, max_side)
+
+def stage_caption(stats):
+    images, zipped = stats["stages"]["images"], stats["stages"]["zip"]
+    return (f"Images {images['bytes_in'] / 1e6:.1f} → {images['bytes_out'] / 1e6:.1f} MB in {images['seconds']:.2f}s "
+            f"({images['transcoded']} transcoded, {images['failed']} kept as-is) · "
+            f"Zip {zipped['bytes_in'] / 1e6:.1f} → {zipped['bytes_out'] / 1e6:.1f} MB in {zipped['seconds']:.2f}s")
+
 st.set_page_config(page_title="Remix Studio", layout="wide", page_icon="🧶")
 inject_layout_css(MY_DESIGN_TOKENS)
 
 # Tabs
 tab_main, tab_fix, tab_extract = st.tabs(["🧶 Remix Editor", "🔢 JSON ID Fixer", "🖼️ PPT Image Extractor"])
 
+# ================= 3b. EDITOR FRAGMENTS =================
+# 编辑器拆成几个 st.fragment：在一张卡片里打字、🎲、Verify 只重新运行这张卡片，
+# 不再重新注入 CSS、生成左侧图片、重建导出菜单。换 slide / 保存 / 批量粘贴等仍然整页重跑
+
+@st.fragment
+def image_panel(project_id, idx):
+    projects = get_project_store()
+    item, images = projects.slide(project_id, idx), projects.images(project_id)
+    img_name = item['image_filename']
+    st.markdown(f"#### ID {item['id']}")
+    if img_name in images:
+        # 显示缓存的缩略图，并在后台预先生成前后 slide 的缩略图
+        previews = get_preview_cache()
+        data_uri = previews.get(images.digest_of(img_name), images[img_name])
+        st.markdown(f"""<div class="left-panel"><img src="{data_uri}" /></div>""", unsafe_allow_html=True)
+        total = projects.slide_count(project_id)
+        neighbours = [projects.slide(project_id, i)['image_filename'] for i in (idx + 1, idx - 1) if 0 <= i < total]
+        previews.prefetch([(images.digest_of(n), images[n]) for n in neighbours])
+    else:
+        st.error("Image missing")
+
+@st.fragment
+def export_panel(project_id, current_id):
+    projects = get_project_store()
+    images = projects.images(project_id)
+    live = st.session_state["_live"]
+    with st.popover("⚙️ Export"):
+        # 已保存的结果从项目库里读，当前 slide 用编辑框里的内容；都在点击下载时才读取和压缩
+        def export_data():
+            data = projects.processed(project_id)
+            data[f"{current_id}.json"] = slide_values(live, current_id)
+            return data
+        builder = st.session_state.export_builder
+        delta = st.toggle("Only changes since a previous export", key="export_delta",
+                          help="Download only new or changed items and images plus a manifest.json; merge them into the previous ZIP with python -m remix_core apply")
+        dedup = st.toggle("One file per unique image", key="export_dedup", disabled=delta, help="Write each distinct image once plus an images.json ID → image manifest")
+        layout = "unique" if dedup and not delta else "copies"
+        normalizer = image_options_ui("export")
+        # st.download_button 会把整个压缩包读进内存再发送；很大的数据集用 python -m remix_core convert 导出
+        if not delta:
+            st.download_button("⬇️ Download ZIP", data=lambda: builder.build_file(export_data(), images, layout, normalizer=normalizer), file_name="dataset.zip", mime="application/zip", type="primary", use_container_width=True)
+        else:
+            # 上次导出的 dataset.zip、上次的增量包或 manifest.json 都可以 (后两个很小)；读出来的 manifest 按上传的文件缓存
+            previous = st.file_uploader("Previous export (ZIP or manifest.json)", type=["zip", "json"], key="export_base")
+            base = None
+            if previous is not None:
+                cached = st.session_state.get("_export_base")
+                if cached is None or cached[0] != previous.file_id:
+                    try:
+                        cached = st.session_state["_export_base"] = (previous.file_id, read_manifest(previous))
+                    except (ValueError, zipfile.BadZipFile) as e:
+                        cached = None
+                        st.error(f"Error: {e}")
+                base = cached and cached[1]
+            if base is not None:
+                st.caption(f"Previous export: {len(base['items'])} items")
+                st.download_button("⬇️ Download changes", data=lambda: builder.build_delta_file(export_data(), images, base, normalizer=normalizer), file_name="dataset_changes.zip", mime="application/zip", type="primary", use_container_width=True)
+        store_stats = images.stats()
+        st.caption(f"Images: {store_stats['unique']} unique of {store_stats['images']} "
+                   f"({store_stats['saved_bytes'] / 1e6:.1f} MB saved by dedup)")
+        if builder.last_stats:
+            stats = builder.last_stats
+            st.caption(f"Last build: {stats['cached']}/{stats['entries']} entries from cache "
+                       f"({stats['cached_bytes'] / 1e6:.1f} / {stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.2f}s")
+            if "changed" in stats: st.caption(f"Changes only: {stats['changed']} items new or changed, {stats['removed']} removed")
+            st.caption(stage_caption(stats))
+        if st.button("📂 Switch project", use_container_width=True):
+            close_project()
+
+@st.fragment
+def main_prompt_panel(item):
+    m_key = f"m_{item['id']}"
+    st.text_area("main_hidden", value=default_main_prompt(item['original_prompt_text']), height=80, key=m_key, label_visibility="collapsed")
+    st.session_state["_live"][m_key] = st.session_state[m_key]
+
+@st.fragment
+def remix_card(current_id, i):
+    session_key = f"remix_{current_id}"
+    current_remixes = st.session_state[session_key]
+    live = st.session_state["_live"]
+    with st.container(border=True):
+        # Title
+        l_key = f"l_{current_id}_{i}"
+        if l_key not in st.session_state: st.session_state[l_key] = current_remixes[i]['label']
+        live[l_key] = st.text_input(f"L{i}", value=current_remixes[i]['label'], key=l_key, label_visibility="collapsed", placeholder="Label")
+
+        # Dice
+        st.button("🎲", key=f"rnd_{current_id}_{i}", on_click=randomize_callback, args=(i, session_key, current_id), use_container_width=True)
+
+        # Prompt
+        p_key = f"p_{current_id}_{i}"
+        if p_key not in st.session_state: st.session_state[p_key] = current_remixes[i]['prompt']
+        p_val = live[p_key] = st.text_area(f"P{i}", value=current_remixes[i]['prompt'], height=100, key=p_key, label_visibility="collapsed", placeholder="Prompt")
+
+        # Verify：验证过的 prompt 在磁盘缓存里，重新打开 slide 时直接显示；🔄 换一个随机 seed 不经缓存重新生成
+        verifier = get_verifier()
+        v_col, new_col = st.columns([3, 1])
+        verify = v_col.button("Verify", key=f"v_{current_id}_{i}", use_container_width=True)
+        resample = new_col.button("🔄", key=f"vn_{current_id}_{i}", help="New sample (random seed, skips the cache)", use_container_width=True)
+        if resample: st.session_state[f"vs_{current_id}_{i}"] = random.randint(0, 9999)
+        request = card_request(current_id, i, p_val)
+        preview = None if resample else verifier.cached(request)
+        if (verify or resample) and preview is None:
+            try:
+                with st.spinner("Verifying..."): preview = verifier.get(request, fresh=resample)
+            except (OSError, ValueError) as e:
+                st.warning(f"Verify failed: {e}")
+        if preview is not None: st.image(preview, use_container_width=True)
+
 # ================= TAB 1: REMIX EDITOR =================
 with tab_main:
-    if 'data' not in st.session_state: st.session_state.data = []
-    if 'images' not in st.session_state: st.session_state.images = {}
-    if 'processed_results' not in st.session_state: st.session_state.processed_results = {}
+    projects = get_project_store()
+    if 'project_id' not in st.session_state:
+        # 刷新页面后按地址栏里的 ?project= 继续上次的项目
+        pid = st.query_params.get("project", "")
+        st.session_state.project_id = int(pid) if pid.isdigit() and projects.project(int(pid)) else None
+        if st.session_state.project_id is not None: st.session_state.current_idx = projects.first_unsaved(st.session_state.project_id)
     if 'current_idx' not in st.session_state: st.session_state.current_idx = 0
+    if 'export_builder' not in st.session_state: st.session_state.export_builder = ExportBuilder()
 
-    if not st.session_state.data:
+    if st.session_state.project_id is None:
         st.markdown("<br><br>", unsafe_allow_html=True)
         c1, c2, c3 = st.columns([1, 2, 1])
         with c2:
@@ -356,72 +403,55 @@ with tab_main:
                     if st.button("🚀 Load Slides", type="primary", use_container_width=True):
                         with st.spinner("Processing..."):
                             try:
-                                data, images = process_ppt_file(uploaded_ppt, start_id)
-                                if not data: st.error("No valid slides found.")
-                                else:
-                                    st.session_state.data = data
-                                    st.session_state.images = images
-                                    st.session_state.current_idx = 0
-                                    st.rerun()
+                                project_id = projects.create_project(uploaded_ppt, start_id, uploaded_ppt.name, get_deck_cache())
+                                if not projects.slide_count(project_id):
+                                    projects.delete_project(project_id)
+                                    st.error("No valid slides found.")
+                                else: open_project(project_id)
                             except ValueError as ve: st.error(str(ve))
                             except Exception as e: st.error(f"Error: {e}")
+                deck_stats = get_deck_cache().stats()
+                st.caption(f"Parse cache: {deck_stats['hits']} hits / {deck_stats['misses']} misses · {deck_stats['bytes'] / 1e6:.0f} MB on disk")
+
+            saved_projects = projects.projects()
+            if saved_projects:
+                with st.container(border=True):
+                    st.markdown("##### 📂 Resume a project")
+                    labels = {p['id']: f"{p['name'] or 'Untitled'} · {p['saved']} / {p['slides']} saved · start ID {p['start_id']}" for p in saved_projects}
+                    choice = st.selectbox("Project", list(labels), format_func=labels.get, label_visibility="collapsed")
+                    if st.button("Open", use_container_width=True): open_project(choice)
 
     else:
-        item = st.session_state.data[st.session_state.current_idx]
+        project_id = st.session_state.project_id
+        total = projects.slide_count(project_id)
+        item = projects.slide(project_id, st.session_state.current_idx)
         current_id = item['id']
-        img_name = item['image_filename']
+        load_working_set(projects, project_id, item)
 
         col_left, col_right = st.columns([1.2, 1.5], gap="medium")
 
         # === LEFT ===
         with col_left:
-            st.markdown(f"#### ID {current_id}")
-            if img_name in st.session_state.images:
-                b64_img = base64.b64encode(st.session_state.images[img_name]).decode()
-                st.markdown(f"""<div class="left-panel"><img src="data:image/png;base64,{b64_img}" /></div>""", unsafe_allow_html=True)
-            else:
-                st.error("Image missing")
+            image_panel(project_id, st.session_state.current_idx)
 
         # === RIGHT ===
         with col_right:
             # 1. Top Bar
             c_top1, c_top2 = st.columns([3, 1])
             with c_top1:
-                total = len(st.session_state.data)
-                done = len(st.session_state.processed_results)
+                done = projects.saved_count(project_id)
                 st.progress(done / total if total > 0 else 0)
                 st.caption(f"Progress: {done} / {total} (ID: {current_id})")
             
             with c_top2:
-                with st.popover("⚙️ Export"):
-                    if done >= 0:
-                        export_data = st.session_state.processed_results.copy()
-                        curr_main = st.session_state.get(f"m_{current_id}", "")
-                        curr_remixes = []
-                        session_key = f"remix_{current_id}"
-                        if session_key in st.session_state:
-                            raw_remixes = st.session_state[session_key]
-                            for idx in range(len(raw_remixes)):
-                                l_val = st.session_state.get(f"l_{current_id}_{idx}", raw_remixes[idx]['label'])
-                                p_val = st.session_state.get(f"p_{current_id}_{idx}", raw_remixes[idx]['prompt'])
-                                curr_remixes.append({"label": l_val, "prompt": p_val})
-                        
-                        export_data[f"{current_id}.json"] = {
-                            "id": current_id,
-                            "prompt": curr_main,
-                            "remixSuggestions": curr_remixes
-                        }
-                        
-                        zip_buffer = create_final_zip(export_data, st.session_state.images)
-                        st.download_button("⬇️ Download ZIP", data=zip_buffer.getvalue(), file_name="dataset.zip", mime="application/zip", type="primary", use_container_width=True)
+                export_panel(project_id, current_id)
+
 
+            if st.session_state.get("_dupes"): show_duplicates(*st.session_state.pop("_dupes"))
 
             # 2. Main Prompt (已移除上方的 st.markdown("---"))
             st.markdown("#### 📝 Main Prompt")
-            default_text = item['original_prompt_text']
-            if not default_text.strip().lower().startswith("create"):
-                default_text = "Create an image of " + default_text
-            main_prompt = st.text_area("main_hidden", value=default_text, height=80, key=f"m_{current_id}", label_visibility="collapsed")
+            main_prompt_panel(item)
 
             # Batch Paste
             with st.expander("📋 Paste Remix Text (Replace)", expanded=False):
@@ -437,36 +467,21 @@ with tab_main:
 
             # Remix Cards
             st.markdown("#### 🎨 Remix Suggestions")
-            if session_key not in st.session_state:
-                st.session_state[session_key] = [get_random_remix() for _ in range(3)]
-            current_remixes = st.session_state[session_key]
-
             r_cols = st.columns(3)
             for i, col in enumerate(r_cols):
                 with col:
-                    with st.container(border=True):
-                        # Title
-                        l_key = f"l_{current_id}_{i}"
-                        if l_key not in st.session_state: st.session_state[l_key] = current_remixes[i]['label']
-                        l_val = st.text_input(f"L{i}", value=current_remixes[i]['label'], key=l_key, label_visibility="collapsed", placeholder="Label")
-                        
-                        # Dice
-                        st.button("🎲", key=f"rnd_{current_id}_{i}", on_click=randomize_callback, args=(i, session_key, current_id), use_container_width=True)
-
-                        # Prompt
-                        p_key = f"p_{current_id}_{i}"
-                        if p_key not in st.session_state: st.session_state[p_key] = current_remixes[i]['prompt']
-                        p_val = st.text_area(f"P{i}", value=current_remixes[i]['prompt'], height=100, key=p_key, label_visibility="collapsed", placeholder="Prompt")
-
-                        # Verify
-                        if st.button("Verify", key=f"v_{current_id}_{i}", use_container_width=True):
-                            clean = urllib.parse.quote(p_val)
-                            seed = random.randint(0, 9999)
-                            url = f"https://image.pollinations.ai/prompt/{clean}?seed={seed}&width=400&height=400&nologo=true"
-                            st.session_state[f"poll_img_{current_id}_{i}"] = url
-                        
-                        if f"poll_img_{current_id}_{i}" in st.session_state:
-                            st.image(st.session_state[f"poll_img_{current_id}_{i}"], use_container_width=True)
+                    remix_card(current_id, i)
+
+            v_col1, v_col2 = st.columns(2)
+            if st.session_state.get("_verify_failed"):
+                failed, verified = st.session_state.pop("_verify_failed")
+                if failed: st.warning(f"{failed} of {verified} previews failed.")
+            if v_col1.button("⚡ Verify all cards", use_container_width=True):
+                verify_cards([(current_id, idx, prompt) for idx, prompt in enumerate(card_prompts(projects, project_id, current_id))])
+                st.rerun()
+            if v_col2.button("⚡ Verify all slides", use_container_width=True):
+                verify_cards([(item_id, idx, prompt) for item_id in projects.item_ids(project_id) for idx, prompt in enumerate(card_prompts(projects, project_id, item_id))])
+                st.rerun()
 
             # End scrollable
 
@@ -479,16 +494,17 @@ with tab_main:
                     st.rerun()
             with b_col2:
                 if st.button("💾 Save & Next", type="primary", use_container_width=True):
-                    final_json = { 
-                        "id": current_id, 
-                        "prompt": main_prompt, 
-                        "remixSuggestions": current_remixes
-                    }
-                    st.session_state.processed_results[f"{current_id}.json"] = final_json
-                    if st.session_state.current_idx < len(st.session_state.data) - 1:
+                    # 每次保存立即写进项目库 (离开 slide 后编辑框的状态不再保留在会话里，所以存编辑后的卡片)
+                    values = slide_values(st.session_state, current_id)
+                    projects.save_result(project_id, current_id, values["prompt"], values["remixSuggestions"])
+                    # 近似重复只提醒，不阻止保存；提醒显示在下一张 slide 上
+                    dupes = check_item(get_dedupe_index(project_id), project_source(project_id), values)
+                    if st.session_state.current_idx < total - 1:
+                        if dupes: st.session_state["_dupes"] = (current_id, dupes)
                         st.session_state.current_idx += 1
                         st.rerun()
                     else:
+                        if dupes: show_duplicates(current_id, dupes)
                         st.balloons()
                         st.success("All Done! Check Export.")
 
@@ -501,15 +517,43 @@ with tab_fix:
         with st.container(border=True):
             up_json = st.file_uploader("Upload dataset.json", type=["json"])
             new_start = st.number_input("New Start ID", value=1001, step=1)
+            only_range = st.toggle("Only renumber items N..M", value=False)
+            first = last = None
+            if only_range:
+                r1, r2 = st.columns(2)
+                first = r1.number_input("From item #", min_value=1, value=1, step=1)
+                last = r2.number_input("To item #", min_value=1, value=100, step=1)
             
             if up_json:
                 if st.button("🚀 Process & Renumber", type="primary", use_container_width=True):
-                    new_json_str, error = renumber_json_ids(up_json, new_start)
+                    # 逐个元素流式改写，写进临时文件，不在内存里展开整个 JSON
+                    out = spool_file()
+                    stats, error = renumber_json_file(up_json, out, new_start, first, last)
                     if error:
+                        out.close()
                         st.error(error)
                     else:
-                        st.success("IDs updated successfully!")
-                        st.download_button("⬇️ Download New JSON", data=new_json_str, file_name="dataset_renumbered.json", mime="application/json", type="primary", use_container_width=True)
+                        st.success(f"IDs updated successfully! ({stats['renumbered']} of {stats['items']} items renumbered)")
+                        st.download_button("⬇️ Download New JSON", data=as_reader(out), file_name="dataset_renumbered.json", mime="application/json", type="primary", use_container_width=True)
+
+        with st.container(border=True):
+            st.markdown("##### 🧩 Merge dataset ZIPs")
+            up_zips = st.file_uploader("Upload dataset.zip files (merged in this order)", type=["zip"], accept_multiple_files=True, key="merge_uploader")
+            merge_start = st.number_input("First ID", value=453, step=1, key="merge_start")
+            if up_zips:
+                if st.button("🧩 Merge & Renumber", type="primary", use_container_width=True):
+                    # 图片条目原样拷贝 (不重新压缩)，合并结果写进临时文件
+                    out = spool_file()
+                    try:
+                        stats = merge_dataset_zips(up_zips, out, merge_start)
+                    except (ValueError, zipfile.BadZipFile) as e:
+                        out.close()
+                        st.error(f"Error: {e}")
+                    else:
+                        st.success(f"Merged {stats['inputs']} ZIPs: {stats['items']} items (IDs {merge_start}-{merge_start + stats['items'] - 1}), {stats['images']} images")
+                        if stats["missing"] or stats["unreferenced"]:
+                            st.warning(f"{stats['missing']} items without an image, {stats['unreferenced']} images without an item (dropped)")
+                        st.download_button("⬇️ Download Merged ZIP", data=as_reader(out), file_name="dataset_merged.zip", mime="application/zip", type="primary", use_container_width=True)
 
 # ================= TAB 3: IMAGE EXTRACTOR =================
 with tab_extract:
@@ -520,13 +564,31 @@ with tab_extract:
         with st.container(border=True):
             ext_ppt = st.file_uploader("Upload Presentation (.pptx)", type=["pptx"], key="ext_uploader")
             ext_start = st.number_input("Start Filename ID", value=453, step=1, key="ext_start")
+            ext_normalizer = image_options_ui("extract")
             
             if ext_ppt:
                 if st.button("🚀 Extract & Zip", type="primary", use_container_width=True):
                     with st.spinner("Extracting..."):
-                        zip_buf, count = extract_images_from_ppt(ext_ppt, ext_start)
+                        # 压缩包直接写到临时文件，不在内存里保留第二份
+                        zip_buf, count = extract_images_from_ppt(ext_ppt, ext_start, fp=spool_file(), deck_cache=get_deck_cache(), normalizer=ext_normalizer)
                         if zip_buf:
                             st.success(f"Extracted {count} images!")
-                            st.download_button("⬇️ Download Images ZIP", data=zip_buf.getvalue(), file_name="images_extracted.zip", mime="application/zip", type="primary", use_container_width=True)
+                            st.download_button("⬇️ Download Images ZIP", data=as_reader(zip_buf), file_name="images_extracted.zip", mime="application/zip", type="primary", use_container_width=True)
                         else:
                             st.error(f"Error: {count}")
+
+# ================= DIAGNOSTICS =================
+# 隐藏的诊断面板 (URL 加 ?diagnostics=1)：各阶段的耗时/字节数，指标是整个服务进程共用的
+if st.query_params.get("diagnostics"):
+    with st.expander("🩺 Diagnostics", expanded=True):
+        recording = st.toggle("Record stage metrics", value=metrics.enabled(), key="diag_recording")
+        if recording != metrics.enabled(): metrics.enable(recording)
+        rows = metrics.REGISTRY.rows()
+        if rows: st.dataframe(rows, use_container_width=True, hide_index=True)
+        else: st.caption("No metrics recorded yet." if recording else "Recording is off (set REMIX_METRICS=1 to start with it on).")
+        d1, d2, d3 = st.columns(3)
+        d1.download_button("⬇️ Prometheus", data=metrics.REGISTRY.to_prometheus(), file_name="remix_metrics.prom", mime="text/plain", use_container_width=True)
+        d2.download_button("⬇️ JSON lines", data=metrics.REGISTRY.to_jsonl(source="app"), file_name="remix_metrics.jsonl", mime="application/x-ndjson", use_container_width=True)
+        if d3.button("Reset", use_container_width=True):
+            metrics.REGISTRY.reset()
+            st.rerun()
@@ -0,0 +1,78 @@
+"""Time the near-duplicate prompt index: build, per-prompt query and duplicate clusters, at growing sizes.
+
+Each size gets a synthetic dataset (see synthetic.py) where --dup-ratio of the items copy an
+earlier item's prompt with a word or two changed, and --custom-ratio of the remix cards are
+edited variants of a built-in remix. Build and cluster time should grow linearly with the item
+count and query time should stay flat; "pairwise" is the all-pairs comparison the index
+replaces, timed on the first --pairwise items and extrapolated quadratically.
+
+Usage: python benchmarks/dedupe_index.py [--items 10000,20000,40000] [--queries 500] [--threshold 0.8]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import WORDS, dataset_items  # noqa: E402
+
+from remix_core import DuplicateIndex, add_builtin_prompts, index_dataset_items, item_prompts  # noqa: E402
+
+def with_duplicates(items, dup_ratio, custom_ratio, seed=1):
+    # 一部分条目抄前面某个条目的 prompt 再改一两个词；一部分 remix 卡片是改过几个词的内置 prompt
+    rng = random.Random(seed)
+    for n, item in enumerate(items):
+        if n and rng.random() < dup_ratio:
+            words = items[rng.randrange(n)]["prompt"].split()
+            for _ in range(rng.randint(1, 2)): words[rng.randrange(len(words))] = rng.choice(WORDS)
+            item["prompt"] = " ".join(words)
+        for remix in item["remixSuggestions"]:
+            if rng.random() < custom_ratio: remix["prompt"] = remix["prompt"].rstrip(".") + ", " + rng.choice(WORDS) + "."
+    return items
+
+def pairwise_seconds(index, pairs):
+    # 所有两两组合都比较一次签名
+    sigs, _ = index.signatures([text for _, text in pairs])
+    started = time.perf_counter()
+    for n in range(1, len(sigs)): (sigs[:n] == sigs[n]).mean(axis=1)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", default="10000,20000,40000", help="comma-separated dataset sizes")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--dup-ratio", type=float, default=0.05)
+    parser.add_argument("--custom-ratio", type=float, default=0.1)
+    parser.add_argument("--pairwise", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'prompts':>8} {'build s':>8} {'cluster s':>9} {'clusters':>8} {'query p50 ms':>12} {'p90 ms':>7} {'pairwise s':>10}")
+    for count in [int(n) for n in args.items.split(",")]:
+        items = with_duplicates(dataset_items(count, seed=count), args.dup_ratio, args.custom_ratio, seed=count)
+        index = DuplicateIndex(threshold=args.threshold)
+        started = time.perf_counter()
+        add_builtin_prompts(index)
+        index_dataset_items(index, "dataset.json", items)
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        clusters = index.clusters()
+        cluster = time.perf_counter() - started
+        rng = random.Random(0)
+        times = []
+        for item in rng.sample(items, min(args.queries, len(items))):
+            started = time.perf_counter()
+            index.query(item["prompt"])
+            times.append(1000 * (time.perf_counter() - started))
+        pairs = [p for item in items[:args.pairwise] for p in item_prompts("dataset.json", item) if p[1]]
+        prompts = len(index)
+        pairwise = pairwise_seconds(index, pairs) * (prompts / max(len(pairs), 1)) ** 2
+        print(f"{count:>8} {prompts:>8} {build:>8.2f} {cluster:>9.2f} {len(clusters):>8} {statistics.median(times):>12.3f} "
+              f"{statistics.quantiles(times, n=10)[-1]:>7.3f} {pairwise:>10.1f}")
+
+if __name__ == "__main__":
+    main()
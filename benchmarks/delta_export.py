@@ -0,0 +1,83 @@
+"""Compare a full re-export with a delta export, and time merging the delta back in.
+
+Builds a synthetic deck (see synthetic.py), exports it once as the base dataset.zip, then edits
+--changed-ratio of the prompts and adds --new-items items (reusing existing images). It reports
+the time and size of a full export versus a delta export against the base ZIP and against its
+manifest.json (the base ZIP is read once for the hashes). It also times apply_delta writing a
+new file versus updating the base in place, which leaves unchanged members where they are.
+
+Usage: python benchmarks/delta_export.py [--slides 500] [--image-kb 200] [--changed-ratio 0.02] [--new-items 10]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import deck_spec, write_deck  # noqa: E402
+
+from remix_core import ExportBuilder, apply_delta, build_processed_results, process_ppt_file, read_manifest  # noqa: E402
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=500)
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--changed-ratio", type=float, default=0.02)
+    parser.add_argument("--new-items", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        deck = os.path.join(tmp_dir, "deck.pptx")
+        write_deck(deck, deck_spec(args.slides, image_kb=args.image_kb))
+        data, images = process_ppt_file(deck, 453)
+        processed = build_processed_results(data, seed=1)
+        base = os.path.join(tmp_dir, "base.zip")
+        with open(base, "wb") as f: ExportBuilder().write(f, processed, images)
+
+        # 改一部分 prompt，再加几个新条目 (用已有的图片)
+        rng = random.Random(1)
+        edited = {key: dict(item) for key, item in processed.items()}
+        for key in rng.sample(sorted(edited), int(len(edited) * args.changed_ratio)): edited[key]["prompt"] += " (edited)"
+        image_store = {name: images[name] for name in images}
+        last_id = max(int(item["id"]) for item in edited.values())
+        for n in range(1, args.new_items + 1):
+            edited[f"{last_id + n}.json"] = {"id": str(last_id + n), "prompt": f"New item {n}", "remixSuggestions": []}
+            image_store[f"{last_id + n}.png"] = image_store[rng.choice(sorted(image_store))]
+
+        print(f"{len(processed)} items, base {os.path.getsize(base) / 1e6:.1f} MB; {len(edited) - len(processed)} new, "
+              f"{int(len(processed) * args.changed_ratio)} edited")
+        print(f"{'step':<32} {'seconds':>8} {'MB':>8}")
+        full, seconds = timed(lambda: ExportBuilder().build(edited, image_store).getvalue())
+        print(f"{'full export':<32} {seconds:>8.3f} {len(full) / 1e6:>8.2f}")
+        manifest, seconds = timed(lambda: read_manifest(base))
+        manifest_bytes = json.dumps(manifest).encode("utf-8")
+        print(f"{'manifest from base ZIP':<32} {seconds:>8.3f} {len(manifest_bytes) / 1e6:>8.2f}")
+        # 第一次对着 ZIP 现算的 manifest 要生成图片条目比较 CRC；之后的 manifest 带着原始图片摘要，不用再生成
+        delta, seconds = timed(lambda: ExportBuilder().build_delta_file(edited, image_store, manifest).read())
+        print(f"{'delta export (vs ZIP)':<32} {seconds:>8.3f} {len(delta) / 1e6:>8.2f}")
+        for label, out in (("apply -> new file", os.path.join(tmp_dir, "merged.zip")), ("apply in place", None)):
+            target = base
+            if out is None:
+                target = os.path.join(tmp_dir, "inplace.zip")
+                shutil.copy(base, target)
+            stats, seconds = timed(lambda: apply_delta(target, io.BytesIO(delta), out))
+            print(f"{label:<32} {seconds:>8.3f} {stats['bytes_written'] / 1e6:>8.2f}")
+        next_base = read_manifest(io.BytesIO(delta))
+        edited[sorted(edited)[0]]["prompt"] += " again"
+        delta, seconds = timed(lambda: ExportBuilder().build_delta_file(edited, image_store, next_base).read())
+        print(f"{'next delta (vs delta manifest)':<32} {seconds:>8.3f} {len(delta) / 1e6:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Time one Remix Editor interaction as a full script rerun and as a fragment rerun.
+
+Creates a project from a synthetic deck (300 slides by default) in temporary stores and drives
+app.py with Streamlit's AppTest. Each interaction (typing into a remix card's prompt, or its 🎲
+button) is timed twice: "full" reruns the whole script, which is what every interaction did
+before the editor was split into fragments; "fragment" reruns only the fragment that owns the
+widget, the way the browser requests it. An app without fragments (e.g. an older app.py passed
+with --app) reports only the full rerun.
+
+Usage: python benchmarks/editor_rerun.py [--slides 300] [--image-kb 200] [--repeat 20] [--app app.py]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from urllib import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streamlit.runtime.scriptrunner import RerunData  # noqa: E402
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+from streamlit.testing.v1 import app_test  # noqa: E402
+from streamlit.testing.v1.element_tree import parse_tree_from_messages  # noqa: E402
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner, require_widgets_deltas  # noqa: E402
+from synthetic import deck_spec, write_deck  # noqa: E402
+
+from remix_core import DeckCache, ProjectStore  # noqa: E402
+
+class FragmentScriptRunner(LocalScriptRunner):
+    # AppTest 每次都整页重跑；这里和浏览器一样可以只重跑指定的 fragment，并记下最近一次的 runner 用来找 widget 所在的 fragment。
+    # AppTest 每次运行还会重新编译脚本，服务器上编译结果是缓存的，所以所有 runner 共用一个 ScriptCache
+    fragment_ids = []
+    last = None
+    script_cache = ScriptCache()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._script_cache = self.script_cache
+        FragmentScriptRunner.last = self
+
+    def run(self, widget_state=None, query_params=None, timeout=3, page_hash=""):
+        self.request_rerun(RerunData(widget_states=widget_state, query_string=parse.urlencode(query_params or {}, doseq=True),
+                                     page_script_hash=page_hash))
+        # 构造 runner 时已经排好了一次整页运行，fragment 请求会被合并进去，所以直接改排队的请求
+        if self.fragment_ids: self._requests._rerun_data = replace(self._requests._rerun_data, fragment_id_queue=list(self.fragment_ids))
+        try:
+            if not self._script_thread: self.start()
+            require_widgets_deltas(self, timeout)
+        finally:
+            self.join()
+        return parse_tree_from_messages(self.forward_msgs())
+
+def fragment_of(widget_id):
+    # 整页运行时 widget 所在的 fragment (不在 fragment 里时为 None)
+    for msg in FragmentScriptRunner.last.forward_msgs():
+        element = msg.delta.new_element if msg.HasField("delta") else None
+        if element is None or not element.WhichOneof("type"): continue
+        if getattr(getattr(element, element.WhichOneof("type")), "id", None) == widget_id: return msg.delta.fragment_id or None
+    return None
+
+def timed_run(at, fragment_id=None):
+    # 返回耗时；fragment 运行后的树只有那个 fragment，所以换回整页的树，后面的交互照常查找 widget
+    tree = at._tree
+    FragmentScriptRunner.fragment_ids = [fragment_id] if fragment_id else []
+    started = time.perf_counter()
+    at._run(tree.get_widget_states())
+    elapsed = time.perf_counter() - started
+    FragmentScriptRunner.fragment_ids = []
+    if at.exception: raise RuntimeError(at.exception[0].message)
+    if fragment_id: at._tree = tree
+    return elapsed
+
+def interactions(item_id):
+    # (名字, widget 类型, key, 修改 widget 的函数)；每次都重新查找 widget，整页运行后树是新的
+    yield "type in card prompt", "text_area", f"p_{item_id}_1", lambda w, n: w.set_value(f"Remake this image as a watercolor, take {n}.")
+    yield "🎲 card", "button", f"rnd_{item_id}_1", lambda w, n: w.click()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=300)
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("REMIX_PROJECT_DIR", "REMIX_DECK_CACHE", "REMIX_VERIFY_CACHE"):
+            os.environ[name] = os.path.join(tmp_dir, name.lower())
+        deck = os.path.join(tmp_dir, "deck.pptx")
+        write_deck(deck, deck_spec(args.slides, image_kb=args.image_kb))
+        with open(deck, "rb") as f:
+            project_id = ProjectStore(os.environ["REMIX_PROJECT_DIR"]).create_project(
+                f, 453, "bench", DeckCache(os.environ["REMIX_DECK_CACHE"]))
+
+        app_test.LocalScriptRunner = FragmentScriptRunner
+        at = app_test.AppTest.from_file(os.path.abspath(args.app), default_timeout=60)
+        at.query_params["project"] = str(project_id)
+        started = time.perf_counter()
+        at.run()
+        if at.exception: raise RuntimeError(at.exception[0].message)
+        print(f"{args.slides} slides, first run {time.perf_counter() - started:.3f}s")
+        item_id = at.session_state["_working_id"][1]
+
+        print(f"{'interaction':<22} {'mode':<9} {'median ms':>10} {'p90 ms':>8}")
+        for name, kind, key, change in interactions(item_id):
+            timed_run(at)
+            fragment_id = fragment_of(getattr(at, kind)(key=key).id)
+            for mode, fid in (("full", None), ("fragment", fragment_id)):
+                if mode == "fragment" and fid is None:
+                    print(f"{name:<22} {mode:<9} {'n/a':>10}")
+                    continue
+                times = []
+                for n in range(args.repeat):
+                    change(getattr(at, kind)(key=key), n)
+                    times.append(1000 * timed_run(at, fid))
+                p90 = statistics.quantiles(times, n=10)[-1] if len(times) > 1 else times[0]
+                print(f"{name:<22} {mode:<9} {statistics.median(times):10.1f} {p90:8.1f}")
+
+if __name__ == "__main__":
+    main()
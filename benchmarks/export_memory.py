@@ -0,0 +1,86 @@
+"""Compare peak Python memory of the export paths on a large synthetic deck.
+
+Builds a stored (uncompressed) zip of fake PNG media on disk, opens it with
+MediaArchive so images are references, then exports it three ways:
+the old in-memory BytesIO, a spooled temp file, and chunks written to /dev/null.
+The "download" mode also hands the spooled file to Streamlit's download_button
+conversion, which reads the whole archive into memory: in the app the peak is the
+archive size, only the CLI paths stay flat.
+
+Usage: python benchmarks/export_memory.py [--gb 2] [--image-mb 8] [--modes bytesio,spool,chunks,download]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remix_core import ExportBuilder, MediaArchive, build_processed_results  # noqa: E402
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+def write_media_zip(path, total_bytes, image_bytes):
+    # 每张图以 PNG 文件头开头 (auto 策略下直接存储)，内容按编号区分，避免被去重
+    count = max(1, total_bytes // image_bytes)
+    block = os.urandom(1 << 20)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for n in range(count):
+            with zf.open(f"ppt/media/image{n + 1}.png", "w", force_zip64=True) as member:
+                member.write(PNG_HEADER + n.to_bytes(8, "little"))
+                remaining = image_bytes - 16
+                while remaining > 0:
+                    chunk = block[:min(remaining, len(block))]
+                    member.write(chunk)
+                    remaining -= len(chunk)
+    return count
+
+def run(mode, builder, processed, storage):
+    started = time.perf_counter()
+    tracemalloc.start()
+    if mode == "bytesio":
+        size = len(builder.build(processed, storage).getvalue())
+    elif mode == "spool":
+        with builder.build_file(processed, storage) as f:
+            size = os.fstat(f.fileno()).st_size
+    elif mode == "download":
+        # st.download_button 收到文件对象时做的转换 (整个读成 bytes，存进 Streamlit 的媒体文件管理器)
+        from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+        with builder.build_file(processed, storage) as f:
+            size = len(convert_data_to_bytes_and_infer_mime(f, RuntimeError("unsupported"))[0])
+    else:
+        size = 0
+        with open(os.devnull, "wb") as sink:
+            for chunk in builder.iter_chunks(processed, storage):
+                sink.write(chunk)
+                size += len(chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return time.perf_counter() - started, peak, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gb", type=float, default=2.0, help="total image data")
+    parser.add_argument("--image-mb", type=float, default=8.0, help="size of each image")
+    parser.add_argument("--modes", default="bytesio,spool,chunks,download")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "media.zip")
+        count = write_media_zip(path, int(args.gb * (1 << 30)), int(args.image_mb * (1 << 20)))
+        print(f"{count} images x {args.image_mb:g} MB = {os.path.getsize(path) / 1e9:.2f} GB on disk")
+        archive = MediaArchive(path)
+        storage = {f"{n + 1}.png": archive.ref(f"ppt/media/image{n + 1}.png") for n in range(count)}
+        processed = build_processed_results([{"id": str(n + 1), "original_prompt_text": ""} for n in range(count)], seed=0)
+        # 不缓存图片条目，否则 ExportBuilder 会把压缩好的条目留在内存里
+        builder = ExportBuilder(cache_images=False)
+        print(f"{'mode':<8} {'seconds':>8} {'peak MB':>9} {'zip MB':>9}")
+        for mode in args.modes.split(","):
+            seconds, peak, size = run(mode, builder, processed, storage)
+            print(f"{mode:<8} {seconds:8.2f} {peak / 1e6:9.1f} {size / 1e6:9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Time the export image stage on synthetic photos: unchanged, then normalized on 1, N threads and N processes.
+
+Every image is a distinct noisy RGB photo (so nothing is deduplicated), saved as
+PNG, JPEG or TIFF in turn. Prints bytes in/out and wall time of each export stage.
+
+Usage: python benchmarks/image_normalize.py [--images 48] [--side 3000] [--format jpeg] [--max-side 1024] [--workers 8]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from remix_core import NORMALIZE_FORMATS, ExportBuilder, ImageNormalizer  # noqa: E402
+
+SOURCE_FORMATS = ("PNG", "JPEG", "TIFF")
+
+def make_images(count, side):
+    # 低分辨率噪声放大到 side，像照片一样压缩得动，又不会每张都一样
+    images = {}
+    for n in range(count):
+        small = Image.frombytes("RGB", (side // 16, side * 2 // 48), os.urandom(3 * (side // 16) * (side * 2 // 48)))
+        out = io.BytesIO()
+        small.resize((side, side * 2 // 3), Image.BILINEAR).save(out, SOURCE_FORMATS[n % len(SOURCE_FORMATS)])
+        images[f"{n + 1}.png"] = out.getvalue()
+    return images
+
+def run(label, images, processed, normalizer=None):
+    started = time.perf_counter()
+    with open(os.devnull, "wb") as sink:
+        stats = ExportBuilder(normalizer=normalizer).write(sink, processed, images)
+    elapsed = time.perf_counter() - started
+    stage, zipped = stats["stages"]["images"], stats["stages"]["zip"]
+    print(f"{label:<16} {elapsed:7.2f}s  images {stage['bytes_in'] / 1e6:7.1f} -> {stage['bytes_out'] / 1e6:6.1f} MB "
+          f"in {stage['seconds']:6.2f}s (cpu {stage['cpu_seconds']:6.2f}s)  zip {zipped['seconds']:5.2f}s  "
+          f"output {stats['bytes'] / 1e6:6.1f} MB")
+    if normalizer: normalizer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--side", type=int, default=3000, help="width of each source image")
+    parser.add_argument("--format", choices=NORMALIZE_FORMATS, default="jpeg")
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    images = make_images(args.images, args.side)
+    processed = {f"{n}.json": {"id": n, "prompt": "", "remixSuggestions": []} for n in range(1, args.images + 1)}
+    options = (args.format, args.quality, args.max_side)
+    run("unchanged", images, processed)
+    run("1 thread", images, processed, ImageNormalizer(*options, workers=1))
+    run(f"{args.workers} threads", images, processed, ImageNormalizer(*options, workers=args.workers))
+    run(f"{args.workers} processes", images, processed, ImageNormalizer(*options, workers=args.workers, processes=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Report per-slide parse time of the PPTX ingestion pass.
+
+Usage: python benchmarks/ingest_profile.py deck.pptx [more.pptx ...] [--top 10] [--cprofile]
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remix_core import iter_slides  # noqa: E402
+
+def percentile(sorted_values, fraction):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def profile_deck(path, load_blobs=True):
+    timings = []
+    with open(path, "rb") as f:
+        started = time.perf_counter()
+        records = iter_slides(f)
+        last = started
+        for record in records:
+            image_bytes = sum(len(p.blob) for p in record.pictures) if load_blobs else 0
+            now = time.perf_counter()
+            timings.append((now - last, record.index, len(record.pictures), image_bytes))
+            last = now
+    return time.perf_counter() - started, timings
+
+def report(path, total, timings, top):
+    # 第一张 slide 的耗时包含打开 pptx 的时间
+    durations = sorted(t[0] for t in timings)
+    image_bytes = sum(t[3] for t in timings)
+    print(f"\n{path}: {len(timings)} slides, {sum(t[2] for t in timings)} pictures, "
+          f"{image_bytes / 1e6:.1f} MB images, {total:.3f}s total")
+    if not durations: return
+    print(f"  per slide ms: mean {statistics.mean(durations) * 1e3:.2f}  p50 {percentile(durations, 0.5) * 1e3:.2f}  "
+          f"p95 {percentile(durations, 0.95) * 1e3:.2f}  max {durations[-1] * 1e3:.2f}")
+    print(f"  throughput: {len(timings) / total:.1f} slides/s, {image_bytes / 1e6 / total:.1f} MB/s")
+    print(f"  slowest {top}:")
+    for duration, index, pictures, size in sorted(timings, reverse=True)[:top]:
+        print(f"    slide {index + 1:>5}  {duration * 1e3:8.2f} ms  {pictures} pictures  {size / 1e3:.0f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("decks", nargs="+")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest slides to list")
+    parser.add_argument("--no-blobs", action="store_true", help="walk shapes only, don't read image data")
+    parser.add_argument("--cprofile", action="store_true", help="also print the hottest functions")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.cprofile else None
+    for path in args.decks:
+        if profiler: profiler.enable()
+        total, timings = profile_deck(path, not args.no_blobs)
+        if profiler: profiler.disable()
+        report(path, total, timings, args.top)
+    if profiler:
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measure lines/second of the remix text parser against the original implementation.
+
+The original backtracking parser is kept below as legacy_parse_bulk_remix_text;
+tests/test_remix.py checks that both give exactly the same {label, prompt} lists.
+
+Usage: python benchmarks/remix_parser.py [--lines 200000] [--legacy-lines 10000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remix_core import parse_bulk_remix_text  # noqa: E402
+
+def legacy_parse_bulk_remix_text(raw_text):
+    # 原来的实现，只作为对照
+    if not raw_text.strip(): return []
+    ACTION_KEYWORDS = ("create", "change", "recreate", "replace", "generate", "make", "transform", "add", "switch", "use", "apply", "convert", "turn")
+    lines = raw_text.split('\n')
+    parsed_items = []
+    processed_indices = set()
+    def clean_line_start(s): return re.sub(r'^[\d\.\-\*\s]+', '', s).strip()
+
+    for i, line in enumerate(lines):
+        clean_current = clean_line_start(line)
+        lower_current = clean_current.lower()
+        is_prompt_start = lower_current.startswith(ACTION_KEYWORDS)
+        inline_split = line.split(":", 1)
+        has_inline_title = len(inline_split) > 1 and clean_line_start(inline_split[1]).lower().startswith(ACTION_KEYWORDS)
+
+        if is_prompt_start or has_inline_title:
+            title = "Remix Option"
+            prompt_text = ""
+            if has_inline_title:
+                title = clean_line_start(inline_split[0])
+                prompt_text = clean_line_start(inline_split[1])
+                processed_indices.add(i)
+            else:
+                prompt_text = clean_current
+                processed_indices.add(i)
+                k = i - 1
+                while k >= 0:
+                    prev_line = lines[k].strip()
+                    if prev_line and k not in processed_indices:
+                        title = clean_line_start(prev_line)
+                        processed_indices.add(k)
+                        break
+                    k -= 1
+            j = i + 1
+            while j < len(lines):
+                next_line = lines[j].strip()
+                if not next_line: j+=1; continue
+                clean_next = clean_line_start(next_line)
+                if clean_next.lower().startswith(ACTION_KEYWORDS): break
+                if j + 1 < len(lines):
+                    clean_next_next = clean_line_start(lines[j+1])
+                    if clean_next_next.lower().startswith(ACTION_KEYWORDS): break
+                prompt_text += " " + next_line
+                processed_indices.add(j)
+                j += 1
+            parsed_items.append({"label": title, "prompt": prompt_text})
+    return parsed_items
+
+def transcript(n_lines, seed=1, bare=False):
+    # 模拟一份很长的对话记录：很多轮回答，夹着寒暄和编号列表。
+    # 注意 "Label:/Prompt:" 这种只有单行条目、没有动作词开头的行时，原来的规则会把后面所有行都接上去，
+    # 输出本身就是平方级的，所以这里每轮回答里都有动作词开头的行
+    # bare: 只有编号的 prompt、没有标题，原来的实现每行都要一直往回找标题
+    if bare: return "\n".join(f"{n}. Create variant {n} of this image." for n in range(1, n_lines + 1))
+    rng = random.Random(seed)
+    blocks = [
+        lambda n: [f"Style {n}", f"Create this picture as style number {n}, with rich detail."],
+        lambda n: [f"{n}. Variant {n}", f"   Make this image variant {n},", "   keeping the composition but shifting the mood."],
+        lambda n: [f"Option {n}: Change the lighting to golden hour.", f"Golden {n}", "Add warm rim light."],
+        lambda n: ["", "Sure, here are a few more ideas for you!", ""],
+    ]
+    lines, n = [], 0
+    while len(lines) < n_lines:
+        n += 1
+        lines += rng.choice(blocks)(n)
+    return "\n".join(lines[:n_lines])
+
+def measure(parse, text, repeat):
+    n_lines = text.count("\n") + 1
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = parse(text)
+        best = min(best, time.perf_counter() - started)
+    return n_lines / best, len(items), best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200_000, help="transcript size for the new parser")
+    parser.add_argument("--legacy-lines", type=int, default=10_000, help="transcript size for the original parser (it is quadratic)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for bare in (False, True):
+        print("bare numbered prompts:" if bare else "mixed transcript:")
+        for name, parse, n_lines in (("legacy", legacy_parse_bulk_remix_text, args.legacy_lines),
+                                     ("single-pass", parse_bulk_remix_text, args.legacy_lines),
+                                     ("single-pass", parse_bulk_remix_text, args.lines)):
+            rate, items, seconds = measure(parse, transcript(n_lines, bare=bare), args.repeat)
+            print(f"  {name:<12} {n_lines:>9} lines  {seconds:8.3f}s  {rate:12,.0f} lines/s  {items} items")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Benchmark suite for the hot paths, with machine-readable results and baseline comparison.
+
+Generates a synthetic deck, dataset.json and pasted remix text (see synthetic.py), then times
+process_ppt_file, extract_images_from_ppt, create_final_zip, renumber_json_ids,
+parse_bulk_remix_text, preview_data_uri and building the near-duplicate index (dedupe_index). Each case runs in a fresh process: wall and CPU
+time are the median of --repeat runs; peak memory is the tracemalloc peak of one extra
+untimed run (deterministic, Python allocations only) plus the process's max RSS for
+reference. Results are written as JSON; with --baseline, any case whose wall time, CPU
+time or peak allocation is worse by more than --threshold is flagged and the exit status is 1.
+
+Usage: python benchmarks/suite.py [--size small|medium|large] [--repeat 3] [-o results.json]
+                                  [--baseline baseline.json] [--threshold 0.15] [--cases a,b] [--work-dir dir]
+"""
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import deck_spec, remix_text, write_dataset, write_deck  # noqa: E402
+
+from remix_core import (  # noqa: E402
+    DuplicateIndex, add_builtin_prompts, build_processed_results, create_final_zip, extract_images_from_ppt, image_blob,
+    index_dataset_items, parse_bulk_remix_text, preview_data_uri, process_ppt_file, renumber_json_ids,
+)
+
+RESULTS_VERSION = 1
+
+SIZES = {
+    "small": {"slides": 60, "image_kb": 100, "json_items": 2000, "remix_items": 500},
+    "medium": {"slides": 400, "image_kb": 200, "json_items": 20000, "remix_items": 5000},
+    "large": {"slides": 2000, "image_kb": 300, "json_items": 100000, "remix_items": 20000},
+}
+
+# 比较时看的指标，以及低于多少的差异算噪声 (秒 / MB)
+METRICS = {"wall_s": 0.005, "cpu_s": 0.005, "peak_alloc_mb": 1.0}
+
+# ================= CASES =================
+# 每个 case: setup(inputs) 不计时，run(state) 计时并返回处理的条目数
+
+def setup_deck(inputs): return inputs["deck"]
+
+def run_process_ppt_file(deck):
+    data, _ = process_ppt_file(deck, 453)
+    return len(data)
+
+def run_extract_images_from_ppt(deck):
+    with open(os.devnull, "wb") as sink:
+        _, count = extract_images_from_ppt(deck, 453, fp=sink)
+    return count
+
+def setup_create_final_zip(inputs):
+    data, images = process_ppt_file(inputs["deck"], 453)
+    return build_processed_results(data, seed=1), images
+
+def run_create_final_zip(state):
+    processed, images = state
+    create_final_zip(processed, images)
+    return len(processed)
+
+def setup_renumber_json_ids(inputs): return inputs["dataset"]
+
+def run_renumber_json_ids(path):
+    with open(path, "rb") as f:
+        result, error = renumber_json_ids(f, 1001)
+    if error: raise ValueError(error)
+    return result.count('"id":')
+
+def setup_parse_bulk_remix_text(inputs):
+    with open(inputs["remix"], encoding="utf-8") as f:
+        return f.read()
+
+def run_parse_bulk_remix_text(text): return len(parse_bulk_remix_text(text))
+
+def setup_preview_data_uri(inputs):
+    _, images = process_ppt_file(inputs["deck"], 453)
+    return list({images.digest_of(name): bytes(image_blob(images[name])) for name in images}.values())
+
+def run_preview_data_uri(blobs):
+    for blob in blobs: preview_data_uri(blob)
+    return len(blobs)
+
+def setup_dedupe_index(inputs):
+    with open(inputs["dataset"], encoding="utf-8") as f:
+        return json.load(f)
+
+def run_dedupe_index(items):
+    index = DuplicateIndex()
+    add_builtin_prompts(index)
+    count = index_dataset_items(index, "dataset.json", items)
+    index.clusters()
+    return count
+
+CASES = {
+    "process_ppt_file": (setup_deck, run_process_ppt_file),
+    "extract_images_from_ppt": (setup_deck, run_extract_images_from_ppt),
+    "create_final_zip": (setup_create_final_zip, run_create_final_zip),
+    "renumber_json_ids": (setup_renumber_json_ids, run_renumber_json_ids),
+    "parse_bulk_remix_text": (setup_parse_bulk_remix_text, run_parse_bulk_remix_text),
+    "preview_data_uri": (setup_preview_data_uri, run_preview_data_uri),
+    "dedupe_index": (setup_dedupe_index, run_dedupe_index),
+}
+
+def max_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+def run_case(name, inputs, repeat):
+    # 在单独的子进程里运行：内存峰值只属于这个 case
+    setup, run = CASES[name]
+    state = setup(inputs)
+    walls, cpus, items = [], [], 0
+    for _ in range(repeat):
+        started, cpu_started = time.perf_counter(), time.process_time()
+        items = run(state)
+        walls.append(time.perf_counter() - started)
+        cpus.append(time.process_time() - cpu_started)
+    # tracemalloc 会拖慢运行，所以单独跑一次，不计时
+    tracemalloc.start()
+    run(state)
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    wall = statistics.median(walls)
+    return {"wall_s": wall, "wall_min_s": min(walls), "cpu_s": statistics.median(cpus), "peak_alloc_mb": peak_alloc / (1 << 20),
+            "peak_rss_mb": max_rss_mb(), "items": items, "items_per_s": items / wall if wall else None}
+
+# ================= INPUTS =================
+
+def make_inputs(work_dir, config):
+    # 文件名里带上配置的摘要，--work-dir 复用时配置不同就重新生成
+    tag = hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=6).hexdigest()
+    inputs = {kind: os.path.join(work_dir, f"{kind}-{tag}{ext}") for kind, ext in (("deck", ".pptx"), ("dataset", ".json"), ("remix", ".txt"))}
+    if not os.path.exists(inputs["deck"]):
+        write_deck(inputs["deck"] + ".part", deck_spec(config["slides"], image_kb=config["image_kb"], seed=config["seed"]))
+        os.replace(inputs["deck"] + ".part", inputs["deck"])
+    if not os.path.exists(inputs["dataset"]): write_dataset(inputs["dataset"], config["json_items"], seed=config["seed"])
+    if not os.path.exists(inputs["remix"]):
+        with open(inputs["remix"], "w", encoding="utf-8") as f: f.write(remix_text(config["remix_items"], config["seed"]))
+    return inputs
+
+# ================= COMPARE =================
+
+def compare(results, baseline, threshold):
+    # 返回 [(case, 指标, 基线, 本次, 比值, 状态)]；状态: "regression" / "improved" / "ok"
+    rows = []
+    for name, case in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old is None: continue
+        for metric, floor in METRICS.items():
+            before, after = old.get(metric), case.get(metric)
+            if before is None or after is None: continue
+            ratio = after / before if before > 0 else float("inf") if after > floor else 1.0
+            status = "ok"
+            if after - before > floor and ratio > 1 + threshold: status = "regression"
+            elif before - after > floor and ratio < 1 - threshold: status = "improved"
+            rows.append((name, metric, before, after, ratio, status))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--slides", type=int, help="override the preset's slide count")
+    parser.add_argument("--image-kb", type=int, help="override the preset's image size")
+    parser.add_argument("--json-items", type=int, help="override the preset's dataset.json item count")
+    parser.add_argument("--remix-items", type=int, help="override the preset's remix text item count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated subset of: " + ", ".join(CASES))
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown/growth that counts as a regression")
+    parser.add_argument("--work-dir", help="keep generated inputs here and reuse them (default: a temporary directory)")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.cases.split(",") if n.strip()]
+    unknown = [n for n in names if n not in CASES]
+    if unknown: parser.error(f"unknown cases: {', '.join(unknown)}")
+    config = dict(SIZES[args.size], seed=args.seed)
+    for key in ("slides", "image_kb", "json_items", "remix_items"):
+        if getattr(args, key) is not None: config[key] = getattr(args, key)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        started = time.perf_counter()
+        inputs = make_inputs(work_dir, config)
+        print(f"inputs ready in {time.perf_counter() - started:.1f}s ({os.path.getsize(inputs['deck']) / 1e6:.1f} MB deck)")
+        results = {"version": RESULTS_VERSION, "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "size": args.size, "config": config, "repeat": args.repeat}, "cases": {}}
+        context = multiprocessing.get_context("spawn")
+        print(f"{'case':<26} {'wall s':>8} {'cpu s':>8} {'alloc MB':>9} {'rss MB':>7} {'items/s':>10}")
+        for name in names:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                case = results["cases"][name] = executor.submit(run_case, name, inputs, args.repeat).result()
+            rate = f"{case['items_per_s']:10.0f}" if case["items_per_s"] else f"{'-':>10}"
+            print(f"{name:<26} {case['wall_s']:8.3f} {case['cpu_s']:8.3f} {case['peak_alloc_mb']:9.1f} {case['peak_rss_mb']:7.1f} {rate}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+    if not args.baseline: return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("config") != config:
+        print(f"warning: baseline was run with {baseline.get('meta', {}).get('config')}, not {config}", file=sys.stderr)
+    rows = compare(results, baseline, args.threshold)
+    print(f"\n{'case':<26} {'metric':<15} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name, metric, before, after, ratio, status in rows:
+        flag = {"regression": "  << REGRESSION", "improved": "  improved"}.get(status, "")
+        print(f"{name:<26} {metric:<15} {before:10.3f} {after:10.3f} {ratio:7.2f}{flag}")
+    regressions = [row for row in rows if row[5] == "regression"]
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Generate synthetic inputs for the benchmarks: decks, dataset.json files and pasted remix text.
+
+Decks are minimal OOXML packages (presentation, slides, relationships, media) written
+directly with zipfile; they contain exactly what remix_core reads but no masters or
+themes, so PowerPoint itself will not open them. Everything is seeded and reproducible.
+
+Usage: python benchmarks/synthetic.py deck out.pptx [--slides 500] [--image-kb 200] [--placeholder-ratio 0.3]
+       python benchmarks/synthetic.py dataset out.json [--items 5000]
+       python benchmarks/synthetic.py remix out.txt [--items 2000]
+"""
+import argparse
+import collections
+import io
+import json
+import os
+import random
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remix_core import REMIX_LIST_EN  # noqa: E402
+
+# slides: 张数；picture_ratio: 带图片的比例，其中 placeholder_ratio 放在图片占位符里；
+# unique_ratio: 不同图片的比例 (其余重复使用)；image_kb: 每张图大约的大小；text_chars: 每张 slide 的文字长度
+DeckSpec = collections.namedtuple("DeckSpec", "slides picture_ratio placeholder_ratio unique_ratio image_kb image_format text_chars seed")
+
+def deck_spec(slides=200, picture_ratio=0.9, placeholder_ratio=0.3, unique_ratio=0.8, image_kb=200, image_format="png",
+              text_chars=120, seed=1):
+    return DeckSpec(int(slides), float(picture_ratio), float(placeholder_ratio), float(unique_ratio), int(image_kb),
+                    image_format, int(text_chars), seed)
+
+NS_DECL = ('xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+           'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+           'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"')
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+RT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+WORDS = ("cat", "mat", "small", "red", "garden", "river", "morning", "light", "paper", "window", "quiet", "city",
+         "mountain", "blue", "old", "friend", "bicycle", "market", "lantern", "story")
+
+def sentence(rng, chars):
+    words = []
+    while sum(len(w) + 1 for w in words) < chars: words.append(rng.choice(WORDS))
+    return " ".join(words).capitalize()[:max(chars, 1)]
+
+def make_image(rng, kb, fmt):
+    # 半分辨率噪声放大一倍：PNG 和 JPEG 都大约 0.9 字节/像素，大小只是近似
+    side = max(16, int((kb * 1024 / 0.9) ** 0.5))
+    half = side // 2
+    small = Image.frombytes("RGB", (half, half), rng.randbytes(3 * half * half))
+    out = io.BytesIO()
+    small.resize((side, side), Image.NEAREST).save(out, "JPEG" if fmt == "jpeg" else "PNG", **({"quality": 90} if fmt == "jpeg" else {}))
+    return out.getvalue()
+
+def _rels(rels):
+    body = "".join(f'<Relationship Id="{rid}" Type="{RT}{rel_type}" Target="{target}"/>' for rid, rel_type, target in rels)
+    return f'{XML_HEAD}<Relationships xmlns="{REL_NS}">{body}</Relationships>'
+
+def _text_shape(shape_id, text):
+    return (f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="TextBox {shape_id}"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+            f'<p:spPr/><p:txBody><a:bodyPr/><a:p><a:r><a:t>{escape(text)}</a:t></a:r></a:p></p:txBody></p:sp>')
+
+def _picture_shape(shape_id, rid, placeholder):
+    nv_pr = '<p:nvPr><p:ph type="pic" idx="1"/></p:nvPr>' if placeholder else "<p:nvPr/>"
+    return (f'<p:pic><p:nvPicPr><p:cNvPr id="{shape_id}" name="Picture {shape_id}"/><p:cNvPicPr/>{nv_pr}</p:nvPicPr>'
+            f'<p:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></p:blipFill><p:spPr/></p:pic>')
+
+def write_deck(path, spec):
+    # 返回 {"slides", "pictures", "unique_images", "bytes"}
+    rng = random.Random(spec.seed)
+    ext = "jpeg" if spec.image_format == "jpeg" else "png"
+    media, slide_media = [], []
+    for n in range(spec.slides):
+        if rng.random() >= spec.picture_ratio:
+            slide_media.append(None)
+            continue
+        if not media or rng.random() < spec.unique_ratio:
+            media.append(make_image(rng, spec.image_kb, spec.image_format))
+            slide_media.append(len(media) - 1)
+        else:
+            slide_media.append(rng.randrange(len(media)))
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        overrides = "".join(f'<Override PartName="/ppt/slides/slide{n + 1}.xml" '
+                            f'ContentType="application/vnd.openxmlformats-officedocument.presentationml.slide+xml"/>'
+                            for n in range(spec.slides))
+        zf.writestr("[Content_Types].xml", (
+            f'{XML_HEAD}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            f'<Default Extension="xml" ContentType="application/xml"/><Default Extension="{ext}" ContentType="image/{ext}"/>'
+            '<Override PartName="/ppt/presentation.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml"/>{overrides}</Types>'))
+        zf.writestr("_rels/.rels", _rels([("rId1", "officeDocument", "ppt/presentation.xml")]))
+        slide_ids = "".join(f'<p:sldId id="{256 + n}" r:id="rId{n + 1}"/>' for n in range(spec.slides))
+        zf.writestr("ppt/presentation.xml", f'{XML_HEAD}<p:presentation {NS_DECL}><p:sldIdLst>{slide_ids}</p:sldIdLst></p:presentation>')
+        zf.writestr("ppt/_rels/presentation.xml.rels", _rels([(f"rId{n + 1}", "slide", f"slides/slide{n + 1}.xml") for n in range(spec.slides)]))
+        for n, blob in enumerate(media):
+            zf.writestr(f"ppt/media/image{n + 1}.{ext}", blob)
+        for n, media_index in enumerate(slide_media):
+            shapes = [_text_shape(2, sentence(rng, spec.text_chars)), _text_shape(3, sentence(rng, 4))]
+            rels = []
+            if media_index is not None:
+                shapes.append(_picture_shape(4, "rId2", rng.random() < spec.placeholder_ratio))
+                rels.append(("rId2", "image", f"../media/image{media_index + 1}.{ext}"))
+            zf.writestr(f"ppt/slides/slide{n + 1}.xml",
+                        f'{XML_HEAD}<p:sld {NS_DECL}><p:cSld><p:spTree>{"".join(shapes)}</p:spTree></p:cSld></p:sld>')
+            zf.writestr(f"ppt/slides/_rels/slide{n + 1}.xml.rels", _rels(rels))
+    pictures = sum(m is not None for m in slide_media)
+    return {"slides": spec.slides, "pictures": pictures, "unique_images": len(media), "bytes": os.path.getsize(path)}
+
+def dataset_items(count, text_chars=120, seed=1, start_id=1):
+    rng = random.Random(seed)
+    return [{"id": str(start_id + n), "prompt": sentence(rng, text_chars),
+             "remixSuggestions": [dict(rng.choice(REMIX_LIST_EN)) for _ in range(3)]} for n in range(count)]
+
+def write_dataset(path, count, text_chars=120, seed=1):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dataset_items(count, text_chars, seed), f, indent=4, ensure_ascii=False)
+    return {"items": count, "bytes": os.path.getsize(path)}
+
+def remix_text(count, seed=1):
+    # Copilot 风格的粘贴文本：编号标题、动作行、偶尔的空行和说明行
+    rng = random.Random(seed)
+    lines = []
+    for n in range(count):
+        remix = rng.choice(REMIX_LIST_EN)
+        lines.append(f"{n + 1}. {remix['label']}")
+        lines.append(remix["prompt"])
+        if rng.random() < 0.3: lines.append("")
+        if rng.random() < 0.1: lines.append("Here are a few more ideas:")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=("deck", "dataset", "remix"))
+    parser.add_argument("output")
+    parser.add_argument("--slides", type=int, default=200)
+    parser.add_argument("--picture-ratio", type=float, default=0.9)
+    parser.add_argument("--placeholder-ratio", type=float, default=0.3)
+    parser.add_argument("--unique-ratio", type=float, default=0.8)
+    parser.add_argument("--image-kb", type=int, default=200)
+    parser.add_argument("--image-format", choices=("png", "jpeg"), default="png")
+    parser.add_argument("--text-chars", type=int, default=120)
+    parser.add_argument("--items", type=int, default=5000, help="dataset items / remix suggestions")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.kind == "deck":
+        info = write_deck(args.output, deck_spec(args.slides, args.picture_ratio, args.placeholder_ratio, args.unique_ratio,
+                                                 args.image_kb, args.image_format, args.text_chars, args.seed))
+    elif args.kind == "dataset":
+        info = write_dataset(args.output, args.items, args.text_chars, args.seed)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f: f.write(remix_text(args.items, args.seed))
+        info = {"items": args.items, "bytes": os.path.getsize(args.output)}
+    print(f"{args.output}: {json.dumps(info)}")
+
+if __name__ == "__main__":
+    main()
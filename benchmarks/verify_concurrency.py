@@ -0,0 +1,39 @@
+"""Time Verify previews against the local stand-in service: one at a time, concurrent, then from the disk cache.
+
+Usage: python benchmarks/verify_concurrency.py [--prompts 60] [--delay 0.2] [--concurrency 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remix_core import HttpBackend, StandInServer, Verifier, VerifyCache, verify_request  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=60)
+    parser.add_argument("--delay", type=float, default=0.2, help="simulated generation time per image")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with StandInServer(delay=args.delay) as server, tempfile.TemporaryDirectory() as cache_dir:
+        requests = [verify_request(f"Create variant {n} of this image.", n) for n in range(args.prompts)]
+        sequential = Verifier(HttpBackend(server.url, max_connections=1))
+        started = time.perf_counter()
+        for request in requests:
+            sequential.get(request)
+        print(f"one at a time   {time.perf_counter() - started:7.2f}s")
+
+        verifier = Verifier(HttpBackend(server.url, max_connections=args.concurrency), VerifyCache(cache_dir), args.concurrency)
+        for label in ("concurrent", "disk cache"):
+            before = server.requests
+            started = time.perf_counter()
+            results = verifier.verify_all(requests)
+            failed = sum(isinstance(r, Exception) for r in results.values())
+            print(f"{label:<15} {time.perf_counter() - started:7.2f}s  {server.requests - before} requests  {failed} failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare dataset.zip build time and size across compression policies.
+
+Usage: python benchmarks/zip_policy.py --images 500 --side 256
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remix_core import create_final_zip  # noqa: E402
+
+POLICIES = [("deflate", 6), ("deflate", 1), ("auto", None), ("store", None)]
+
+def synthetic_png(side, rng):
+    # 带噪声的 RGB 图片，压缩特性接近真实照片
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    base = rng.randrange(256)
+    rows = b"".join(b"\x00" + bytes((base + rng.randrange(64)) & 0xFF for _ in range(side * 3)) for _ in range(side))
+    ihdr = struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+def synthetic_dataset(count, side, start_id=1, seed=0):
+    rng = random.Random(seed)
+    processed, images = {}, {}
+    for i in range(start_id, start_id + count):
+        processed[f"{i}.json"] = {
+            "id": str(i),
+            "prompt": f"Create an image of slide {i} " + "lorem ipsum " * rng.randrange(5, 30),
+            "remixSuggestions": [{"label": f"Label {k}", "prompt": f"Remake this image {k}"} for k in range(3)],
+        }
+        images[f"{i}.png"] = synthetic_png(side, rng)
+    return processed, images
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--side", type=int, default=256, help="synthetic image width/height in pixels")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    processed, images = synthetic_dataset(args.images, args.side)
+    raw = sum(len(b) for b in images.values())
+    print(f"{args.images} images, {raw / 1e6:.1f} MB of image data")
+    print(f"{'policy':<12}{'level':>6}{'best s':>10}{'MB':>10}{'ratio':>8}")
+    for policy, level in POLICIES:
+        best, size = None, 0
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            size = len(create_final_zip(processed, images, policy, level).getbuffer())
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{policy:<12}{level if level is not None else '-':>6}{best:>10.3f}{size / 1e6:>10.2f}{size / raw:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# Remix Studio 的核心逻辑 (不依赖 Streamlit)，界面 (app.py) 和命令行 (python -m remix_core) 共用
+
+from .convert import build_processed_results, convert_deck, extract_deck, load_remix_pool
+from .dataset import (
+    clean_export_item, dumps_dataset_item, iter_json_items, iter_renumbered_json, join_dataset_items, renumber_json_file, renumber_json_ids,
+)
+from .deckcache import DeckCache, upload_digest
+from .dedupe import (
+    DuplicateIndex, OverlayIndex, add_builtin_prompts, check_item, describe_key, index_dataset_items, is_builtin_prompt, item_prompts,
+    normalize_prompt,
+)
+from .delta import MANIFEST_NAME, apply_delta, diff_dataset_zips, manifest_digest, read_manifest, zip_manifest
+from .export import EXPORT_LAYOUTS, DatasetZipWriter, ExportBuilder, create_final_zip, extract_images_from_ppt
+from .ingest import ImageStore, MediaArchive, MediaRef, SlideRecord, image_blob, image_digest, image_size, iter_slides, process_ppt_file
+from .merge import DatasetMerger, merge_dataset_zips
+from .metrics import STAGES, MetricsRegistry
+from .parallel import DeckResult, convert_decks_parallel
+from .preview import PreviewCache, preview_data_uri
+from .projectstore import ProjectImages, ProjectStore
+from .remix import (
+    COPILOT_GEN_INSTRUCTION, REMIX_LIST_EN, default_main_prompt, get_random_remix, iter_bulk_remix_items, parse_bulk_remix_text,
+)
+from .transcode import NORMALIZE_FORMATS, ImageNormalizer, NormalizedImage, image_extension, normalize_image
+from .verify import HttpBackend, StandInServer, Verifier, VerifyCache, VerifyRequest, verify_request
+from .zipwriter import (
+    COMPRESSION_POLICIES, ChunkSink, ZipEntry, ZipStreamWriter, as_reader, compress_file, compress_type_for, detect_image_format,
+    iter_file_chunks, iter_raw_member, make_zip_entry, spool_file, write_spooled,
+)
@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+
+from . import metrics
+from .convert import convert_deck, extract_deck, load_remix_pool, output_path, write_atomic
+from .dataset import iter_json_items, renumber_json_file
+from .delta import apply_delta, diff_dataset_zips, read_manifest
+from .dedupe import DuplicateIndex, add_builtin_prompts, describe_key, index_dataset_items
+from .merge import merge_dataset_zips
+from .parallel import DeckResult, convert_decks_parallel
+from .remix import REMIX_LIST_EN
+from .transcode import NORMALIZE_FORMATS, ImageNormalizer
+from .verify import StandInServer
+from .zipwriter import COMPRESSION_POLICIES
+
+# ================= COMMAND LINE =================
+# python -m remix_core convert decks/*.pptx -o out/ --start-id 453
+
+def add_zip_options(parser):
+    parser.add_argument("--policy", choices=COMPRESSION_POLICIES, default="auto", help="compression policy for zip entries")
+    parser.add_argument("--compresslevel", type=int, default=None, help="deflate level 0-9")
+
+def add_image_options(parser):
+    parser.add_argument("--image-format", choices=NORMALIZE_FORMATS, default=None,
+                        help="detect each image's real format (keep) or transcode to this format; default writes images unchanged as .png")
+    parser.add_argument("--max-side", type=int, default=None, help="downscale images so the longest side is at most this many pixels")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP quality")
+    parser.add_argument("--image-workers", type=int, default=None, help="threads for image normalization (default: CPU count, at most 8)")
+
+def image_options(args):
+    # 没有指定 --image-format / --max-side 时不做图片处理 (与以前的输出相同)
+    if args.image_format is None and not args.max_side: return None
+    return (args.image_format or "keep", args.quality, args.max_side)
+
+def image_normalizer(args):
+    options = image_options(args)
+    return ImageNormalizer(*options, workers=args.image_workers) if options else None
+
+def add_metrics_options(parser):
+    parser.add_argument("--metrics", metavar="PATH", help="record per-stage timings and write them here when done")
+    parser.add_argument("--metrics-format", choices=("jsonl", "prom"), default=None,
+                        help="jsonl appends one line per stage; prom overwrites with Prometheus text (default: by extension)")
+
+def write_metrics(args):
+    fmt = args.metrics_format or ("prom" if args.metrics.endswith(".prom") else "jsonl")
+    if fmt == "prom":
+        text = metrics.REGISTRY.to_prometheus()
+        write_atomic(args.metrics, lambda f: f.write(text.encode("utf-8")))
+    else:
+        with open(args.metrics, "a", encoding="utf-8") as f:
+            f.write(metrics.REGISTRY.to_jsonl(command=args.command))
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="remix_core", description="Convert PPTX decks into Remix Studio datasets without the UI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert decks into dataset ZIPs (one per deck)")
+    convert.add_argument("decks", nargs="+", help=".pptx files")
+    convert.add_argument("-o", "--out-dir", required=True)
+    convert.add_argument("--start-id", type=int, default=453, help="ID of the first slide; later decks continue the numbering")
+    convert.add_argument("--prompts", help="remix prompts file (.json list of {label, prompt}, or pasted remix text); defaults to the built-in list")
+    convert.add_argument("--remixes", type=int, default=3, help="remix suggestions per item")
+    convert.add_argument("--seed", help="seed for picking remix suggestions (reproducible output)")
+    convert.add_argument("--layout", choices=("copies", "unique"), default="copies")
+    convert.add_argument("--workers", type=int, default=1, help="worker processes (>1 converts decks and slide ranges in parallel)")
+    convert.add_argument("--max-in-flight", type=int, default=None, help="slide ranges queued or buffered at once (default 2 x workers)")
+    convert.add_argument("--chunk-slides", type=int, default=200, help="split decks into ranges of this many slides")
+    add_zip_options(convert)
+    add_image_options(convert)
+    add_metrics_options(convert)
+
+    extract = commands.add_parser("extract", help="extract all pictures of each deck into an images ZIP")
+    extract.add_argument("decks", nargs="+", help=".pptx files")
+    extract.add_argument("-o", "--out-dir", required=True)
+    extract.add_argument("--start-id", type=int, default=453, help="filename ID of the first image; later decks continue the numbering")
+    add_zip_options(extract)
+    add_image_options(extract)
+    add_metrics_options(extract)
+
+    renumber = commands.add_parser("renumber", help="renumber the ids of a dataset.json")
+    renumber.add_argument("json_file")
+    renumber.add_argument("-o", "--output", required=True)
+    renumber.add_argument("--start", type=int, default=1001)
+    renumber.add_argument("--first", type=int, default=None, help="only renumber items from this position on (1-based)")
+    renumber.add_argument("--last", type=int, default=None, help="only renumber items up to this position (inclusive)")
+    add_metrics_options(renumber)
+
+    merge = commands.add_parser("merge", help="merge dataset ZIPs into one (or into shards) with contiguous IDs")
+    merge.add_argument("zips", nargs="+", help="dataset ZIPs (copies or unique layout), merged in this order")
+    merge.add_argument("-o", "--output", required=True, help="merged ZIP; shards are written as NAME-0001.zip, NAME-0002.zip, ...")
+    merge.add_argument("--start-id", type=int, default=453, help="ID of the first item; the rest are numbered contiguously")
+    merge.add_argument("--shard-items", type=int, default=None, help="start a new shard after this many items")
+    merge.add_argument("--shard-mb", type=float, default=None, help="start a new shard before a ZIP would exceed this size")
+    add_zip_options(merge)
+    add_metrics_options(merge)
+
+    diff = commands.add_parser("diff", help="write a delta ZIP with the items and images that are new or changed since a previous export")
+    diff.add_argument("base", help="previous dataset ZIP, delta ZIP or manifest.json")
+    diff.add_argument("new", help="current dataset ZIP")
+    diff.add_argument("-o", "--output", required=True)
+    add_zip_options(diff)
+    add_metrics_options(diff)
+
+    apply = commands.add_parser("apply", help="merge delta ZIPs (in order) into a dataset ZIP")
+    apply.add_argument("base", help="dataset ZIP (copies layout)")
+    apply.add_argument("deltas", nargs="+", help="delta ZIPs from diff or the Export popover")
+    target = apply.add_mutually_exclusive_group(required=True)
+    target.add_argument("-o", "--output", help="write the merged dataset here and leave the base unchanged")
+    target.add_argument("--in-place", action="store_true",
+                        help="update the base ZIP: unchanged members stay where they are and only the tail is rewritten (not crash-safe)")
+    apply.add_argument("--force", action="store_true", help="apply even if a delta was made against a different version of the base")
+    add_zip_options(apply)
+    add_metrics_options(apply)
+
+    manifest = commands.add_parser("manifest", help="write the content-hash manifest of a dataset ZIP (usable instead of the ZIP as a diff base)")
+    manifest.add_argument("zip")
+    manifest.add_argument("-o", "--output", required=True)
+
+    dedupe = commands.add_parser("dedupe", help="report clusters of near-duplicate prompts across datasets")
+    dedupe.add_argument("datasets", nargs="*", help="dataset.json files or dataset ZIPs")
+    dedupe.add_argument("--threshold", type=float, default=None, help="estimated Jaccard similarity of character 5-grams (default 0.8, or the saved index's)")
+    dedupe.add_argument("--index", metavar="PATH", help="start from this saved index (datasets given again replace their old prompts)")
+    dedupe.add_argument("--save-index", metavar="PATH", help="save the index (.npz) for later runs and for the editor (REMIX_DEDUPE_INDEX)")
+    dedupe.add_argument("--report", metavar="PATH", help="also write all clusters as JSON")
+    dedupe.add_argument("--show", type=int, default=20, help="clusters to print")
+    add_metrics_options(dedupe)
+
+    stand_in = commands.add_parser("stand-in", help="run a local stand-in for the Verify image service (set REMIX_VERIFY_URL to its URL)")
+    stand_in.add_argument("--host", default="127.0.0.1")
+    stand_in.add_argument("--port", type=int, default=8765)
+    stand_in.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    return parser
+
+def iter_sequential(args, out_paths, convert_one):
+    next_id = args.start_id
+    for deck, out_path in zip(args.decks, out_paths):
+        try:
+            count = convert_one(deck, out_path, next_id)
+        except (OSError, ValueError) as e:
+            yield DeckResult(deck, None, next_id, 0, 0, str(e))
+            continue
+        yield DeckResult(deck, out_path if count else None, next_id, count, os.path.getsize(deck), None)
+        next_id += count
+
+def run_batch(args, convert_one, unit, parallel=None):
+    os.makedirs(args.out_dir, exist_ok=True)
+    used = set()
+    out_paths = [output_path(args.out_dir, deck, used) for deck in args.decks]
+    started = time.perf_counter()
+    results = parallel(out_paths) if parallel else iter_sequential(args, out_paths, convert_one)
+    failures = total_count = total_bytes = 0
+    for result in results:
+        if result.error:
+            failures += 1
+            print(f"{result.deck}: Error: {result.error}", file=sys.stderr)
+        elif result.count:
+            print(f"{result.deck}: {result.count} {unit} (IDs {result.first_id}-{result.first_id + result.count - 1}) -> {result.out_path}")
+        else:
+            print(f"{result.deck}: no {unit} found, skipped")
+        total_count += result.count
+        total_bytes += result.input_bytes
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"{len(args.decks) - failures}/{len(args.decks)} decks converted in {elapsed:.1f}s "
+          f"({total_count / elapsed:.1f} {unit}/s, {total_bytes / 1e6 / elapsed:.1f} MB/s)")
+    return 1 if failures else 0
+
+def run_merge(args):
+    shard_bytes = int(args.shard_mb * 1e6) if args.shard_mb else None
+    try:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        stats = merge_dataset_zips(args.zips, args.output, args.start_id, args.shard_items, shard_bytes, args.policy, args.compresslevel)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    for shard in stats["shards"]:
+        ids = f"IDs {shard['first_id']}-{int(shard['first_id']) + shard['items'] - 1}" if shard["first_id"] else "no IDs"
+        print(f"{shard['path']}: {shard['items']} items ({ids}), {shard['images']} images, {shard['bytes'] / 1e6:.1f} MB")
+    if stats["missing"]: print(f"warning: {stats['missing']} items have no image", file=sys.stderr)
+    if stats["unreferenced"]: print(f"warning: {stats['unreferenced']} images without a dataset.json item were dropped", file=sys.stderr)
+    elapsed = max(stats["seconds"], 1e-9)
+    print(f"{stats['inputs']} ZIPs merged in {elapsed:.1f}s ({stats['items']} items, {stats['bytes_in'] / 1e6 / elapsed:.1f} MB/s)")
+    return 0
+
+def run_diff(args):
+    try:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        stats = write_atomic(args.output, lambda f: diff_dataset_zips(args.base, args.new, f, args.policy, args.compresslevel))
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.output}: {stats['changed']} of {stats['items']} items new or changed ({stats['images']} images), "
+          f"{stats['removed']} removed, {stats['bytes_out'] / 1e6:.1f} MB")
+    return 0
+
+def run_apply(args):
+    target = args.base if args.in_place else args.output
+    for n, delta in enumerate(args.deltas):
+        # 写到新文件时只有第一个增量从 base 拷贝，后面的直接改新文件
+        try:
+            if args.output and not n: os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+            stats = apply_delta(args.base if n == 0 else target, delta, None if args.in_place or n else target,
+                                args.policy, args.compresslevel, args.force)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"{delta}: Error: {e}", file=sys.stderr)
+            return 1
+        print(f"{delta}: {stats['changed']} items new or changed, {stats['removed']} removed, {stats['images']} images -> {target} "
+              f"({stats['items']} items, {stats['bytes_written'] / 1e6:.1f} MB written in {stats['seconds']:.1f}s)")
+    return 0
+
+def run_manifest(args):
+    try:
+        manifest = read_manifest(args.zip)
+        write_atomic(args.output, lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode("utf-8")))
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.output}: {len(manifest['items'])} items")
+    return 0
+
+def read_dataset_items(path, add):
+    # dataset.json 或 dataset.zip (读里面的 dataset.json)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf, zf.open("dataset.json") as f:
+            return add(iter_json_items(f))
+    with open(path, "rb") as f:
+        return add(iter_json_items(f))
+
+def run_dedupe(args):
+    started = time.perf_counter()
+    try:
+        if args.index:
+            with open(args.index, "rb") as f:
+                index = DuplicateIndex.load(f)
+        else:
+            index = DuplicateIndex(threshold=args.threshold or 0.8)
+            add_builtin_prompts(index)
+        for path in args.datasets:
+            count = read_dataset_items(path, lambda items: index_dataset_items(index, path, items))
+            print(f"{path}: {count} prompts indexed")
+        if args.save_index: write_atomic(args.save_index, index.save)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    # 只有内置 prompt 的簇不用报告
+    clusters = [c for c in index.clusters(args.threshold) if any(key[0] != "builtin" for key, _ in c)]
+    for n, cluster in enumerate(clusters[:args.show], 1):
+        builtin = [key[1] for key, _ in cluster if key[0] == "builtin"]
+        print(f"cluster {n}: {len(cluster)} prompts" + (f" (variants of built-in '{builtin[0]}')" if builtin else ""))
+        for key, text in cluster[:10]:
+            print(f"  {describe_key(key)}: {text[:100]}")
+        if len(cluster) > 10: print(f"  ... {len(cluster) - 10} more")
+    if args.report:
+        report = [{"size": len(c), "prompts": [{"key": list(key), "text": text} for key, text in c]} for c in clusters]
+        write_atomic(args.report, lambda f: f.write(json.dumps(report, indent=4, ensure_ascii=False).encode("utf-8")))
+    print(f"{len(index)} prompts, {len(clusters)} near-duplicate clusters ({sum(map(len, clusters))} prompts) "
+          f"at similarity >= {args.threshold or index.threshold} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not getattr(args, "metrics", None): return run(args)
+    metrics.enable()
+    try:
+        return run(args)
+    finally:
+        write_metrics(args)
+
+def run(args):
+    if args.command == "convert":
+        pool = load_remix_pool(args.prompts) if args.prompts else REMIX_LIST_EN
+        parallel = None
+        if args.workers > 1:
+            # 多进程时图片在各个子进程里处理
+            parallel = lambda out_paths: convert_decks_parallel(
+                args.decks, out_paths, args.start_id, pool, args.remixes, args.seed, args.policy, args.compresslevel,
+                args.layout, args.workers, args.max_in_flight, args.chunk_slides, image_options(args))
+            return run_batch(args, None, "slides", parallel)
+        normalizer = image_normalizer(args)
+        return run_batch(args, lambda deck, out_path, start_id: convert_deck(
+            deck, out_path, start_id, pool, args.remixes, args.seed, args.policy, args.compresslevel, args.layout, normalizer), "slides")
+    if args.command == "extract":
+        normalizer = image_normalizer(args)
+        return run_batch(args, lambda deck, out_path, start_id: extract_deck(
+            deck, out_path, start_id, args.policy, args.compresslevel, normalizer), "images")
+    if args.command == "merge":
+        return run_merge(args)
+    if args.command == "diff":
+        return run_diff(args)
+    if args.command == "apply":
+        return run_apply(args)
+    if args.command == "manifest":
+        return run_manifest(args)
+    if args.command == "dedupe":
+        return run_dedupe(args)
+    if args.command == "stand-in":
+        server = StandInServer(args.host, args.port, args.delay)
+        print(f"Serving stand-in previews at {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+    def renumber_into(out):
+        stats, error = renumber_json_file(f, out, args.start, args.first, args.last)
+        if error: raise ValueError(error)
+        return stats
+    try:
+        with open(args.json_file, "rb") as f:
+            stats = write_atomic(args.output, renumber_into)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{args.output}: {stats['renumbered']} of {stats['items']} ids renumbered")
+    return 0
@@ -0,0 +1,81 @@
+import json
+import os
+import random
+
+from .export import ExportBuilder, extract_images_from_ppt
+from .ingest import MediaArchive, process_ppt_file
+from .remix import REMIX_LIST_EN, default_main_prompt, get_random_remix, iter_bulk_remix_items
+
+# ================= BATCH CONVERSION =================
+# 不经过界面，把 pptx 直接转换成 dataset.zip (与编辑器里未修改直接导出的结果相同)
+
+def load_remix_pool(path):
+    # .json: [{"label": ..., "prompt": ...}]；其他文件按 "Paste Remix Text" 的格式解析
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            pool = [{"label": r["label"], "prompt": r["prompt"]} for r in json.load(f)]
+        else:
+            pool = list(iter_bulk_remix_items(f))
+    if not pool: raise ValueError(f"No remix prompts found in {path}")
+    return pool
+
+def item_rng(seed, item_id):
+    # 每个 ID 单独播种：结果只取决于 seed 和 ID，与处理顺序无关
+    return random if seed is None else random.Random(f"{seed}:{item_id}")
+
+def default_item(item_id, original_text, pool=REMIX_LIST_EN, remix_count=3, seed=None):
+    rng = item_rng(seed, item_id)
+    return {
+        "id": item_id,
+        "prompt": default_main_prompt(original_text),
+        "remixSuggestions": [get_random_remix(rng, pool) for _ in range(remix_count)],
+    }
+
+def build_processed_results(extracted_data, pool=REMIX_LIST_EN, remix_count=3, seed=None):
+    return {
+        f"{item['id']}.json": default_item(item["id"], item["original_prompt_text"], pool, remix_count, seed)
+        for item in extracted_data
+    }
+
+def output_path(out_dir, deck_path, used, suffix=".zip"):
+    stem = os.path.splitext(os.path.basename(deck_path))[0]
+    name, n = stem + suffix, 1
+    while name in used:
+        n += 1
+        name = f"{stem}-{n}{suffix}"
+    used.add(name)
+    return os.path.join(out_dir, name)
+
+def write_atomic(path, write, keep=None):
+    # 先写 .part 再改名，失败时不会留下不完整的文件；keep(write 的结果) 为假时不改名，直接删掉 .part
+    tmp_path = path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            result = write(f)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    if keep is not None and not keep(result):
+        os.remove(tmp_path)
+        return result
+    os.replace(tmp_path, path)
+    return result
+
+def convert_deck(deck_path, out_path, start_id, pool=REMIX_LIST_EN, remix_count=3, seed=None, policy="auto", compresslevel=None, layout="copies",
+                 normalizer=None):
+    # 图片引用都指向这个 archive，写完就关掉 (批量转换时不会攒下打开的文件和映射)
+    with MediaArchive(deck_path) as archive:
+        data, images = process_ppt_file(archive, start_id)
+        if data:
+            processed = build_processed_results(data, pool, remix_count, seed)
+            builder = ExportBuilder(policy, compresslevel, layout, cache_images=False, normalizer=normalizer)
+            write_atomic(out_path, lambda f: builder.write(f, processed, images))
+    return len(data)
+
+def extract_deck(deck_path, out_path, start_id, policy="auto", compresslevel=None, normalizer=None):
+    with MediaArchive(deck_path) as archive:
+        # 出错或没有图片时不生成输出文件
+        zip_buf, count = write_atomic(out_path, lambda f: extract_images_from_ppt(archive, start_id, policy, compresslevel, f, normalizer=normalizer),
+                                      keep=lambda result: result[0] is not None and result[1])
+    if zip_buf is None: raise ValueError(count)
+    return count
@@ -0,0 +1,149 @@
+import codecs
+import json
+import re
+
+from . import metrics
+
+# ================= DATASET JSON =================
+
+def clean_export_item(item):
+    return {
+        "id": item.get("id"),
+        "prompt": item.get("prompt"),
+        "remixSuggestions": [
+            {"label": r.get("label"), "prompt": r.get("prompt")} for r in item.get("remixSuggestions", [])
+        ]
+    }
+
+def dumps_dataset_item(clean_item):
+    # 与 json.dumps(list, indent=4) 中单个元素的输出完全一致 (字符串里的换行都已转义，可以直接替换)
+    return json.dumps(clean_item, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+
+def join_dataset_items(fragments):
+    if not fragments: return "[]"
+    return "[\n    " + ",\n    ".join(fragments) + "\n]"
+
+# ================= STREAMING RENUMBER =================
+# 顶层数组逐个元素解析、改写 id、再按 json.dumps(list, indent=4) 的格式输出，内存只和单个元素的大小有关
+
+JSON_CHUNK_SIZE = 1 << 20
+# 离缓冲区末尾这么近的值或错误可能是被截断的 (数字的小数/指数部分、true/false/null、\uXXXX 转义)，要多读一些再判断
+TRUNCATION_MARGIN = 8
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+class _JsonStream:
+    # 缓冲区里只保留还没解析的文本；offset 是缓冲区开头在整个文件里的字符位置
+    def __init__(self, fp, chunk_size=JSON_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf, self.pos, self.offset = "", 0, 0
+        self.eof = False
+        self._text_decoder = None
+        self._json_decoder = json.JSONDecoder()
+
+    def _more(self, size):
+        if self.eof: return False
+        # 第一次至少读 4 个字节，才能识别编码
+        data = self.fp.read(size if self._text_decoder else max(size, 4))
+        final = not data
+        if isinstance(data, bytes):
+            # 与 json.load 一样自动识别 utf-8 (含 BOM) / utf-16 / utf-32
+            if self._text_decoder is None:
+                encoding = json.detect_encoding(data) if data else "utf-8"
+                self._text_decoder = codecs.getincrementaldecoder(encoding)("surrogatepass")
+            data = self._text_decoder.decode(data, final)
+        if self.pos:
+            self.offset += self.pos
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += data
+        self.eof = final
+        return True
+
+    def peek(self):
+        # 跳过空白，返回下一个字符 (文件结束时返回 "")
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self._more(self.chunk_size): return ""
+
+    def error(self, msg, pos=None):
+        return ValueError(f"{msg}: char {self.offset + (self.pos if pos is None else pos)}")
+
+    def value(self):
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self.buf, self.pos)
+                # 数字可能被缓冲区截断 ("1.5e" 只解析出 1.5)，离末尾太近时读多一些重新解析
+                if end < len(self.buf) - TRUNCATION_MARGIN or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                # 只有错误在缓冲区末尾 (值被截断) 时才继续读；文件中间的语法错误马上报，不把整个文件读进内存
+                truncated = e.pos >= len(self.buf) - TRUNCATION_MARGIN or e.msg.startswith("Unterminated string")
+                if self.eof or not truncated: raise self.error(e.msg, e.pos) from None
+            self._more(size)
+            size *= 2
+
+def iter_json_items(json_file, chunk_size=JSON_CHUNK_SIZE):
+    # 逐个解析顶层数组的元素
+    stream = _JsonStream(json_file, chunk_size)
+    if stream.peek() != "[": raise ValueError("JSON root must be a list []")
+    stream.pos += 1
+    if stream.peek() == "]":
+        stream.pos += 1
+    else:
+        while True:
+            stream.peek()
+            yield stream.value()
+            delimiter = stream.peek()
+            stream.pos += 1
+            if delimiter == "]": break
+            if delimiter != ",": raise stream.error("Expecting ',' delimiter", stream.pos - 1)
+    if stream.peek(): raise stream.error("Extra data")
+
+def iter_renumbered_json(json_file, start_num, first=None, last=None, stats=None, chunk_size=JSON_CHUNK_SIZE):
+    # first/last: 只给第 first..last 个元素 (从 1 开始，含两端) 重新编号，其余元素的 id 保持不变
+    if (first is not None and first < 1) or (last is not None and last < 1): raise ValueError("Item numbers start at 1")
+    if first is not None and last is not None and first > last: raise ValueError(f"Range {first}..{last} is empty (first item is after the last)")
+    stats = {} if stats is None else stats
+    stats.update(items=0, renumbered=0)
+    counter = int(start_num)
+    separator = "[\n    "
+    for item in iter_json_items(json_file, chunk_size):
+        stats["items"] += 1
+        in_range = (first is None or stats["items"] >= first) and (last is None or stats["items"] <= last)
+        if in_range and 'id' in item:
+            item['id'] = str(counter)
+            counter += 1
+            stats["renumbered"] += 1
+        yield separator + dumps_dataset_item(item)
+        separator = ",\n    "
+    # 范围超出数组长度时报错 (调用方丢弃已经写出的内容)
+    end = max(first or 0, last or 0)
+    if end > stats["items"]: raise ValueError(f"Item #{end} is out of range (the list has {stats['items']} items)")
+    yield "[]" if not stats["items"] else "\n]"
+
+def renumber_json_ids(json_file, start_num, first=None, last=None):
+    stats = {}
+    try:
+        with metrics.span("renumber") as m:
+            result = "".join(iter_renumbered_json(json_file, start_num, first, last, stats))
+            m.add(bytes_out=len(result), items=stats["items"])
+        return result, None
+    except Exception as e:
+        return None, f"Error: {str(e)}"
+
+def renumber_json_file(json_file, out, start_num, first=None, last=None):
+    # 边读边写进二进制文件 out；返回 (统计, 错误)。出错时 out 里是不完整的内容，由调用方丢弃
+    stats = {}
+    try:
+        with metrics.span("renumber") as m:
+            for chunk in iter_renumbered_json(json_file, start_num, first, last, stats):
+                data = chunk.encode("utf-8", "surrogatepass")
+                out.write(data)
+                m.add(bytes_out=len(data))
+            m.add(items=stats["items"])
+    except Exception as e:
+        return None, f"Error: {str(e)}"
+    return stats, None
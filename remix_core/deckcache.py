@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import weakref
+
+from .diskcache import DiskLRU
+from .ingest import MediaArchive, MediaRef, SlideRecord, iter_slides
+
+# ================= PARSED DECK CACHE =================
+# 按上传内容的摘要缓存解析结果：{摘要}.pptx 是文件本身 (图片引用都指向它)，{摘要}.json 是每张 slide 的文字和图片成员名。
+# 结果与 start_id 无关 (ID 在 process_ppt_file 里按顺序分配)，所以换一个 start_id 重新加载也能命中
+
+CACHE_FORMAT = 1
+
+def upload_digest(uploaded_file, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""): h.update(chunk)
+    elif hasattr(uploaded_file, "getbuffer"):
+        # BytesIO (Streamlit 的 UploadedFile) 直接对内存计算，不拷贝
+        with uploaded_file.getbuffer() as view: h.update(view)
+    else:
+        uploaded_file.seek(0)
+        for chunk in iter(lambda: uploaded_file.read(chunk_size), b""): h.update(chunk)
+        uploaded_file.seek(0)
+    return h.hexdigest()
+
+def copy_upload(uploaded_file, out):
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as f: shutil.copyfileobj(f, out, 1 << 20)
+    else:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, out, 1 << 20)
+        uploaded_file.seek(0)
+
+class DeckCache:
+    def __init__(self, directory, max_bytes=2 << 30):
+        self._files = DiskLRU(directory, max_bytes)
+        self._lock = threading.Lock()
+        # 同一份缓存文件只映射一次，session 里的图片引用都用同一个 MediaArchive
+        self._archives = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def _archive(self, digest, path):
+        with self._lock:
+            archive = self._archives.get(digest)
+            if archive is None: archive = self._archives[digest] = MediaArchive(path)
+            return archive
+
+    def _load(self, digest, deck_path, index_path):
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format") != CACHE_FORMAT: raise ValueError("Unknown cache format")
+        archive = self._archive(digest, deck_path)
+        records = []
+        for i, slide in enumerate(index["slides"]):
+            pictures = [archive.ref(name, bytes.fromhex(d) if d else None) if name is not None else MediaRef(archive, None, 0)
+                        for name, d in slide["pictures"]]
+            records.append(SlideRecord(i, pictures[0] if pictures else None, slide["text"], pictures))
+        return records
+
+    def _save(self, digest, records):
+        index = {"format": CACHE_FORMAT, "slides": [
+            {"text": r.text, "pictures": [[p.name, p._digest.hex() if p._digest else None] for p in r.pictures]}
+            for r in records]}
+        self._files.write(f"{digest}.json", lambda f: f.write(json.dumps(index, ensure_ascii=False).encode("utf-8")))
+
+    def slides(self, uploaded_file, digest=None, deck_path=None):
+        # 返回 [SlideRecord]，与 iter_slides 的结果相同；digest: 调用方已经算好的 upload_digest
+        # deck_path: 调用方自己保存的同一份文件 (项目库里的 deck)，只缓存解析结果，不再复制一份
+        digest = digest or upload_digest(uploaded_file)
+        deck_path = deck_path or self._files.lookup(f"{digest}.pptx")
+        index_path = self._files.lookup(f"{digest}.json") if deck_path else None
+        if index_path:
+            try:
+                records = self._load(digest, deck_path, index_path)
+                with self._lock: self.hits += 1
+                return records
+            except (OSError, ValueError, KeyError):
+                pass # 缓存文件损坏，按未命中处理
+        with self._lock: self.misses += 1
+        if deck_path is None:
+            self._files.write(f"{digest}.pptx", lambda f: copy_upload(uploaded_file, f))
+            # 比整个缓存还大的文件不缓存，直接解析
+            if f"{digest}.pptx" not in self._files: return list(iter_slides(uploaded_file))
+            deck_path = self._files.path(f"{digest}.pptx")
+        try:
+            records = list(iter_slides(self._archive(digest, deck_path)))
+        except ValueError:
+            self._files.discard(f"{digest}.pptx")
+            raise
+        # 编辑器每张 slide 只用第一张图，它的摘要在加载时总要算，顺便存进缓存
+        for r in records:
+            if r.image is not None and r.image.name is not None: r.image.digest
+        self._save(digest, records)
+        return records
+
+    def stats(self):
+        files = self._files.stats()
+        with self._lock:
+            return {"files": files["entries"], "bytes": files["bytes"], "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,283 @@
+import json
+import re
+import threading
+
+import numpy as np
+
+from . import metrics
+from .remix import REMIX_LIST_EN
+
+# ================= NEAR-DUPLICATE INDEX =================
+# MinHash + LSH：每个 prompt 按字符 k-gram 取哈希，num_perm 个哈希函数各取最小值作为签名，
+# 两个签名相同位置相等的比例就是 Jaccard 相似度的估计。签名切成 bands 段，任意一段完全相同的才算候选，
+# 所以查询只看几个桶，不用和所有条目比较；建索引和找重复簇的开销都和条目数成线性关系。
+# 签名用 numpy 批量计算 (一批 prompt 的所有 k-gram 一起算，再按 prompt 分段取最小值)
+
+# 生成的 prompt 常带的固定开头，不算进相似度 (否则所有 "Create an image of ..." 都会很像)
+BOILERPLATE_PREFIXES = ("create an image of ", "remake this image ", "create this picture ")
+_NON_WORD = re.compile(r"[\W_]+")
+
+# 一批最多计算多少个 k-gram (num_perm x 这个数的 uint32 矩阵，128 x 65536 为 32 MB)
+SHINGLE_BATCH = 1 << 16
+
+def normalize_prompt(text):
+    text = _NON_WORD.sub(" ", (text or "").lower()).strip()
+    for prefix in BOILERPLATE_PREFIXES:
+        if text.startswith(prefix): return text[len(prefix):]
+    return text
+
+def shingle_hashes(docs, k=5):
+    # docs: 规范化后的 UTF-8 字节串。所有文本拼在一起按 k 字节滑动窗口一次算完哈希 (不跨文本)；比 k 短的文本补零算一个。
+    # 返回 (uint32 哈希，每个文本的 k-gram 数)
+    counts = np.array([max(len(d) - k + 1, 1) if d else 0 for d in docs], dtype=np.int64)
+    data = np.frombuffer(b"".join(d.ljust(k, b"\0") if d else d for d in docs), dtype=np.uint8).astype(np.uint64)
+    if not len(data): return np.empty(0, dtype=np.uint32), counts
+    # 以 257 为基数的多项式 (k <= 7 时不会溢出)，再乘一个奇数常数打散，取高 32 位
+    values = data[:len(data) - k + 1].copy()
+    for j in range(1, k): values += data[j:len(data) - k + 1 + j] * np.uint64(257 ** j)
+    # 每个文本的窗口起点：文本开头到 (长度 - k)；拼接后文本 i 的开头比它前面的窗口数多出 (k - 1) * i 个位置
+    lengths = counts[counts > 0]
+    starts = np.arange(counts.sum()) + np.repeat(np.arange(len(lengths)) * (k - 1), lengths)
+    return ((values[starts] * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)).astype(np.uint32), counts
+
+def lsh_bands(num_perm, threshold):
+    # 选能整除 num_perm 的段数：S 曲线的拐点 (1/b)^(1/r) 取不超过 threshold 的最大值 (宁可多几个候选再核对)
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda o: (1 / o[0]) ** (1 / o[1])) if below else options[-1]
+
+class DuplicateIndex:
+    # key: 任意可哈希、能存成 JSON 的值 (数据集里用 (来源, 条目 id, 字段))；同一个 key 再次加入时替换旧的文本
+    def __init__(self, num_perm=128, threshold=0.8, shingle=5, seed=1):
+        if not 1 <= shingle <= 7: raise ValueError("shingle must be 1-7")
+        self.num_perm, self.threshold, self.shingle, self.seed = num_perm, threshold, shingle, seed
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        # 哈希函数 h(x) = (a * x + b) mod 2^32，a 为奇数时是 32 位整数的一个排列
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint32) | np.uint32(1)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint32)
+        self._band_mix = rng.integers(1, 1 << 63, self.rows, dtype=np.uint64) | np.uint64(1)
+        self._sigs = np.empty((0, num_perm), dtype=np.uint32)
+        self._alive = np.empty(0, dtype=bool)
+        self.keys, self.texts = [], []
+        self._rows_of = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self): return len(self._rows_of)
+
+    def __contains__(self, key): return key in self._rows_of
+
+    def signatures(self, texts):
+        # 返回 (签名矩阵, 是否有内容)；没有文字的 prompt 签名无意义
+        docs = [normalize_prompt(t).encode("utf-8") for t in texts]
+        sigs = np.full((len(docs), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        start = 0
+        while start < len(docs):
+            end, total = start + 1, len(docs[start])
+            while end < len(docs) and total + len(docs[end]) <= SHINGLE_BATCH:
+                total += len(docs[end])
+                end += 1
+            values, counts = shingle_hashes(docs[start:end], self.shingle)
+            if len(values):
+                hashed = np.empty((self.num_perm, len(values)), dtype=np.uint32)
+                np.multiply(self._a[:, None], values[None, :], out=hashed)
+                hashed += self._b[:, None]
+                rows = np.flatnonzero(counts) + start
+                sigs[rows] = np.minimum.reduceat(hashed, np.cumsum(counts[counts > 0]) - counts[counts > 0], axis=1).T
+            start = end
+        return sigs, np.array([bool(d) for d in docs], dtype=bool)
+
+    def _band_keys(self, sigs):
+        # 每段 rows 个值合成一个 64 位整数作为桶的 key
+        bands = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        return (bands * self._band_mix).sum(axis=2).tolist()
+
+    def add_many(self, pairs):
+        # pairs: [(key, text)]；没有文字的 prompt 只会删掉同 key 的旧条目。返回加入的条数
+        pairs = list(pairs)
+        with metrics.span("dedupe_index") as m:
+            sigs, valid = self.signatures([text for _, text in pairs])
+            with self._lock:
+                for (key, _), ok in zip(pairs, valid):
+                    if not ok: self._discard(key)
+                pairs, sigs = [p for p, ok in zip(pairs, valid) if ok], sigs[valid]
+                self._reserve(len(self.keys) + len(pairs))
+                for row, ((key, text), sig, band_keys) in enumerate(zip(pairs, sigs, self._band_keys(sigs)), len(self.keys)):
+                    self._discard(key)
+                    self._sigs[row], self._alive[row] = sig, True
+                    self._rows_of[key] = row
+                    self.keys.append(key)
+                    self.texts.append(text)
+                    for buckets, band_key in zip(self._buckets, band_keys): buckets.setdefault(band_key, []).append(row)
+            m.add(items=len(pairs))
+        return len(pairs)
+
+    def _reserve(self, size):
+        # 签名矩阵按倍数扩容，逐条加入 (编辑器每次保存) 时不用每次复制整个矩阵
+        if size <= len(self._sigs): return
+        capacity = max(size, 2 * len(self._sigs), 1024)
+        sigs = np.empty((capacity, self.num_perm), dtype=np.uint32)
+        sigs[:len(self.keys)] = self._sigs[:len(self.keys)]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.keys)] = self._alive[:len(self.keys)]
+        self._sigs, self._alive = sigs, alive
+
+    def add(self, key, text): return self.add_many([(key, text)])
+
+    def _discard(self, key):
+        row = self._rows_of.pop(key, None)
+        if row is not None: self._alive[row] = False
+
+    def remove(self, key):
+        with self._lock: self._discard(key)
+
+    def keys_with_prefix(self, prefix):
+        # tuple key 开头是 prefix 的条目 (例如一个数据集条目的所有字段)
+        with self._lock: return [key for key in self._rows_of if isinstance(key, tuple) and key[:len(prefix)] == prefix]
+
+    def query(self, text, threshold=None, limit=10, exclude=None):
+        # 返回 [(相似度, key, 文本)]，按相似度从高到低；exclude(key) 为真的条目跳过
+        threshold = self.threshold if threshold is None else threshold
+        with metrics.span("dedupe_query") as m:
+            sigs, valid = self.signatures([text])
+            if not valid[0]: return []
+            with self._lock:
+                rows = {row for buckets, band_key in zip(self._buckets, self._band_keys(sigs)[0]) for row in buckets.get(band_key, ())}
+                rows = np.array(sorted(rows), dtype=np.int64)
+                rows = rows[self._alive[rows]] if len(rows) else rows
+                scores = (self._sigs[rows] == sigs[0]).mean(axis=1)
+                order = np.argsort(-scores, kind="stable")
+                hits = []
+                # 先按相似度排序再过滤 exclude，几万条完全相同的 prompt 落在同一个桶里时也只调用几次
+                for r, score in zip(rows[order].tolist(), scores[order].tolist()):
+                    if score < threshold or len(hits) >= limit: break
+                    if exclude is None or not exclude(self.keys[r]): hits.append((score, self.keys[r], self.texts[r]))
+            m.add(items=len(rows))
+        return hits
+
+    def clusters(self, threshold=None, min_size=2):
+        # 重复簇：[[(key, 文本), ...]]，大的在前。每个桶里的条目只和桶里第一个比较 (线性)，再用并查集连起来
+        threshold = self.threshold if threshold is None else threshold
+        with metrics.span("dedupe_cluster") as m, self._lock:
+            parent = list(range(len(self.keys)))
+            def find(x):
+                while parent[x] != x:
+                    parent[x] = parent[parent[x]]
+                    x = parent[x]
+                return x
+            for buckets in self._buckets:
+                for rows in buckets.values():
+                    if len(rows) < 2: continue
+                    rows = np.array(rows, dtype=np.int64)
+                    rows = rows[self._alive[rows]]
+                    if len(rows) < 2: continue
+                    scores = (self._sigs[rows[1:]] == self._sigs[rows[0]]).mean(axis=1)
+                    head = find(rows[0])
+                    for row in rows[1:][scores >= threshold].tolist():
+                        root = find(row)
+                        if root != head: parent[root] = head
+            groups = {}
+            for row in np.flatnonzero(self._alive[:len(self.keys)]).tolist(): groups.setdefault(find(row), []).append((self.keys[row], self.texts[row]))
+            m.add(items=len(groups))
+        return sorted((g for g in groups.values() if len(g) >= min_size), key=len, reverse=True)
+
+    def save(self, fp):
+        # 只保存还在用的条目 (npz，不需要 pickle)
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:len(self.keys)])
+            meta = {"num_perm": self.num_perm, "threshold": self.threshold, "shingle": self.shingle, "seed": self.seed,
+                    "keys": [self.keys[r] for r in rows.tolist()], "texts": [self.texts[r] for r in rows.tolist()]}
+            np.savez_compressed(fp, sigs=self._sigs[rows], meta=np.array(json.dumps(meta, ensure_ascii=False)))
+
+    @classmethod
+    def load(cls, fp):
+        with np.load(fp, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            index = cls(meta["num_perm"], meta["threshold"], meta["shingle"], meta["seed"])
+            sigs = data["sigs"]
+        # JSON 里元组变成了列表，换回元组才能当 key
+        keys = [tuple(k) if isinstance(k, list) else k for k in meta["keys"]]
+        index._sigs = sigs
+        index._alive = np.ones(len(keys), dtype=bool)
+        index.keys, index.texts = keys, meta["texts"]
+        index._rows_of = {key: row for row, key in enumerate(keys)}
+        for row, band_keys in enumerate(index._band_keys(sigs)):
+            for buckets, band_key in zip(index._buckets, band_keys): buckets.setdefault(band_key, []).append(row)
+        return index
+
+class OverlayIndex:
+    # 共用的索引 (base，只读) 加上自己的小索引：查询两个都查，加入/删除只改自己的。
+    # 编辑器里所有项目共用一份内置列表 (或 REMIX_DEDUPE_INDEX)，每个项目只多出自己的 prompt
+    def __init__(self, base):
+        self.base = base
+        self.own = DuplicateIndex(base.num_perm, base.threshold, base.shingle, base.seed)
+        self.threshold = base.threshold
+
+    def __len__(self): return len(self.base) + len(self.own)
+
+    def add_many(self, pairs): return self.own.add_many(pairs)
+
+    def add(self, key, text): return self.own.add(key, text)
+
+    def remove(self, key): self.own.remove(key)
+
+    def keys_with_prefix(self, prefix): return self.own.keys_with_prefix(prefix)
+
+    def query(self, text, threshold=None, limit=10, exclude=None):
+        # base 里和自己同 key 的条目以自己的为准
+        shadowed = lambda key: key in self.own or (exclude is not None and exclude(key))
+        hits = self.own.query(text, threshold, limit, exclude) + self.base.query(text, threshold, limit, shadowed)
+        return sorted(hits, key=lambda hit: -hit[0])[:limit]
+
+# ================= DATASETS =================
+# 从内置列表里抽出来的 remix 卡片本来就一模一样，不算重复；内置列表本身作为 ("builtin", 标题, "remix") 放进索引，
+# 这样改了几个字的内置 prompt 会和它归成一簇
+
+BUILTIN_PROMPTS = frozenset(normalize_prompt(r["prompt"]) for r in REMIX_LIST_EN)
+
+def is_builtin_prompt(text): return normalize_prompt(text) in BUILTIN_PROMPTS
+
+def item_prompts(source, item):
+    # 一个 dataset 条目的 [(key, 文本)]：主 prompt 和 remix prompt；内置原文的 remix 文本换成 ""，
+    # 加入索引时不会被收录 (同 key 的旧条目会被删掉)
+    item_id = str(item.get("id"))
+    pairs = [((source, item_id, "prompt"), item.get("prompt") or "")]
+    for n, remix in enumerate(item.get("remixSuggestions") or [], 1):
+        prompt = (remix.get("prompt") or "") if isinstance(remix, dict) else ""
+        pairs.append(((source, item_id, f"remix{n}"), "" if is_builtin_prompt(prompt) else prompt))
+    return pairs
+
+def add_builtin_prompts(index, pool=REMIX_LIST_EN):
+    return index.add_many((("builtin", r["label"], "remix"), r["prompt"]) for r in pool)
+
+def index_dataset_items(index, source, items, batch=2048):
+    # items: dataset.json 的条目 (可以是 iter_json_items 的生成器)；按批计算签名，返回加入的 prompt 数
+    added, pairs = 0, []
+    for item in items:
+        if isinstance(item, dict): pairs.extend(item_prompts(source, item))
+        if len(pairs) >= batch:
+            added += index.add_many(pairs)
+            pairs = []
+    return added + index.add_many(pairs)
+
+def check_item(index, source, item, threshold=None, limit=3):
+    # 编辑器保存时用：先查再把这个条目加入 (替换) 索引。返回有近似重复的字段 [(字段, [(相似度, key, 文本)])]，
+    # 同一个条目自己的 prompt 不算
+    own = (source, str(item.get("id")))
+    same_item = lambda key: isinstance(key, tuple) and key[:2] == own
+    pairs = item_prompts(source, item)
+    found = [(key[2], hits) for key, text in pairs for hits in [index.query(text, threshold, limit, same_item)] if hits]
+    # 这次没有的字段 (删掉的 remix 卡片) 也从索引里去掉
+    current = {key for key, _ in pairs}
+    for key in index.keys_with_prefix(own):
+        if key not in current: index.remove(key)
+    index.add_many(pairs)
+    return found
+
+def describe_key(key):
+    # ("a.json", "455", "remix2") -> "a.json #455 remix2"；内置条目显示标题
+    if isinstance(key, (list, tuple)) and len(key) == 3:
+        source, item_id, field = key
+        return f"built-in '{item_id}'" if source == "builtin" else f"{source} #{item_id} {field}"
+    return str(key)
@@ -0,0 +1,202 @@
+import collections
+import hashlib
+import json
+import os
+import time
+import zipfile
+import zlib
+
+from . import metrics
+from .dataset import clean_export_item, dumps_dataset_item, iter_json_items
+from .merge import image_index
+from .zipwriter import COPY_CHUNK_SIZE, ZipEntry, ZipStreamWriter, iter_raw_member, make_zip_entry, spool_file, write_spooled
+
+# ================= MANIFEST =================
+# manifest.json 记录整个数据集每个条目的内容哈希：{"version", "items": {id: {"hash", "image", "crc", "size", "source"}}}
+#   hash: 条目在 dataset.json 里那段 JSON 的 blake2b；image/crc/size: 图片条目的文件名、CRC-32 和原始大小 (没有图片时为 None)；
+#   source: 导出时原始图片的摘要 (加上转码参数)，下次导出时对得上就不用重新生成图片条目来比较
+# 增量包里还有 "base" (基准 manifest 的摘要)、"changed" (包里的条目 id) 和 "removed" (删掉的条目 id)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+DELTA_FIELDS = ("base", "changed", "removed")
+
+def fragment_hash(fragment):
+    return hashlib.blake2b(fragment.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+def source_key(digest, normalizer=None):
+    return digest.hex() if normalizer is None else digest.hex() + "/" + "-".join(map(str, normalizer.key))
+
+def manifest_digest(manifest):
+    # 只看内容 (不看 source 和增量字段)，从压缩包现算的 manifest 和导出时写的 manifest 结果相同
+    items = {item_id: [r.get("hash"), r.get("image"), r.get("crc"), r.get("size")] for item_id, r in manifest["items"].items()}
+    return hashlib.blake2b(json.dumps(items, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+def id_sort_key(item_id):
+    # 与导出时的排序一致 (按整数 id)，不是整数的 id 排在后面
+    item_id = str(item_id)
+    return (0, int(item_id), "") if item_id.lstrip("-").isdigit() else (1, 0, item_id)
+
+def check_member(zf, info):
+    # 解压一遍，zipfile 读到末尾时核对 CRC；图片条目之后都按原始数据拷贝，不会再校验
+    try:
+        with zf.open(info) as f:
+            while f.read(COPY_CHUNK_SIZE): pass
+    except (zipfile.BadZipFile, zlib.error) as e:
+        raise ValueError(f"{info.filename}: {e}")
+
+def image_changed(old, crc, size):
+    return old is None or old.get("crc") != crc or old.get("size") != size
+
+def zip_manifest(zf):
+    # dataset ZIP 的 manifest：有 manifest.json 时直接读 (增量包、应用过增量的压缩包)，否则按 dataset.json 和图片条目现算
+    if MANIFEST_NAME in zf.NameToInfo:
+        with zf.open(MANIFEST_NAME) as f:
+            return json.load(f)
+    if "dataset.json" not in zf.NameToInfo: raise ValueError("no dataset.json in the archive")
+    images, items = image_index(zf), {}
+    with zf.open("dataset.json") as f:
+        for item in iter_json_items(f):
+            if not isinstance(item, dict) or "id" not in item: continue
+            info = images.get(str(item["id"]))
+            items[str(item["id"])] = {"hash": fragment_hash(dumps_dataset_item(clean_export_item(item))), "image": info and info.filename,
+                                      "crc": info and info.CRC, "size": info and info.file_size}
+    return {"version": MANIFEST_VERSION, "items": items}
+
+def read_manifest(source):
+    # source: dataset ZIP 或 manifest.json (路径或二进制文件对象)
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            return zip_manifest(zf)
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+        manifest = json.load(source)
+    else:
+        with open(source, "rb") as f:
+            manifest = json.load(f)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("items"), dict): raise ValueError("not a dataset manifest")
+    return manifest
+
+def delta_manifest(items, base, changed):
+    # items: 结果数据集完整的 {id: 记录}；base: 基准 manifest
+    removed = sorted(set(base["items"]) - set(items), key=id_sort_key)
+    return {"version": MANIFEST_VERSION, "items": items, "base": manifest_digest(base), "changed": changed, "removed": removed}
+
+# ================= DIFF / APPLY =================
+
+def diff_dataset_zips(base, new, out, policy="auto", compresslevel=None, spool_dir=None):
+    # 比较两个 dataset ZIP，把 new 里新增或改动的条目和图片 (原样拷贝) 写成增量包 out (可写的文件对象)；返回统计
+    base = base if isinstance(base, dict) else read_manifest(base)
+    stats = {"items": 0, "changed": 0, "images": 0, "removed": 0, "bytes_out": 0}
+    with metrics.span("zip_delta") as m, zipfile.ZipFile(new) as zf, spool_file(spool_dir) as spool:
+        if "dataset.json" not in zf.NameToInfo: raise ValueError("no dataset.json in the new archive")
+        writer, images, records, changed = ZipStreamWriter(out), image_index(zf), {}, []
+        with zf.open("dataset.json") as f:
+            for item in iter_json_items(f):
+                if not isinstance(item, dict) or "id" not in item: continue
+                item_id, fragment = str(item["id"]), dumps_dataset_item(clean_export_item(item))
+                info, old = images.get(str(item["id"])), base["items"].get(str(item["id"]))
+                record = records[item_id] = {"hash": fragment_hash(fragment), "image": None, "crc": None, "size": None}
+                stats["items"] += 1
+                new_image = info is not None and image_changed(old, info.CRC, info.file_size)
+                if info is not None:
+                    record.update(image=old["image"] if not new_image else f"images/{item_id}{os.path.splitext(info.filename)[1]}",
+                                  crc=info.CRC, size=info.file_size)
+                if new_image:
+                    writer.write_chunks(ZipEntry(record["image"], info.compress_type, info.CRC, info.file_size, None, info.date_time),
+                                        info.compress_size, iter_raw_member(zf.fp, info))
+                    stats["images"] += 1
+                if new_image or old is None or old.get("hash") != record["hash"] or (info is None and old.get("image")):
+                    spool.write((",\n    " if changed else "[\n    ").encode("utf-8") + fragment.encode("utf-8", "surrogatepass"))
+                    changed.append(item_id)
+        spool.write(b"\n]" if changed else b"[]")
+        write_spooled(writer, "dataset.json", spool, zipfile.ZIP_STORED if policy == "store" else zipfile.ZIP_DEFLATED, compresslevel, spool_dir)
+        manifest = delta_manifest(records, base, changed)
+        writer.write_entry(make_zip_entry(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False), compresslevel=compresslevel))
+        writer.close()
+        stats.update(changed=len(changed), removed=len(manifest["removed"]), bytes_out=writer.offset)
+        m.add(bytes_out=writer.offset, items=len(changed))
+    return stats
+
+def merged_items(base_items, replacements, removed, new_ids):
+    # base_items: 基准 dataset.json 的条目 (按 id 排好序)；replacements: {id: 增量包里的条目}；new_ids: 基准里没有的 id，按 id 顺序插进去
+    pending = collections.deque(sorted(new_ids, key=id_sort_key))
+    for item in base_items:
+        item_id = str(item.get("id")) if isinstance(item, dict) else None
+        while pending and item_id is not None and id_sort_key(pending[0]) < id_sort_key(item_id): yield replacements[pending.popleft()]
+        if item_id in removed: continue
+        yield replacements.get(item_id, item)
+    for item_id in pending: yield replacements[item_id]
+
+def apply_delta(base, delta, out=None, policy="auto", compresslevel=None, force=False, spool_dir=None):
+    # base: "copies" 布局的 dataset ZIP 路径；delta: 增量包 (路径或文件对象)。
+    # out=None 时直接改 base：保留的条目原地不动，只截掉文件末尾不再需要的部分 (旧 dataset.json、manifest.json、中央目录)，
+    #   在后面追加新条目和新的中央目录；被替换的图片如果不在末尾会留下空洞。中途出错 base 会损坏，需要保留原文件时传 out。
+    # out: 新文件路径；保留的条目按原始数据拷贝 (不解压、不重新压缩)。返回统计
+    started = time.perf_counter()
+    stats = {"items": 0, "changed": 0, "removed": 0, "images": 0, "kept": 0, "bytes_written": 0}
+    with metrics.span("zip_apply") as m, zipfile.ZipFile(delta) as dz, zipfile.ZipFile(base) as bz, spool_file(spool_dir) as spool:
+        manifest = zip_manifest(dz)
+        if not all(field in manifest for field in DELTA_FIELDS): raise ValueError("not a delta export (manifest.json has no changes)")
+        if "images.json" in bz.NameToInfo: raise ValueError("base uses the unique layout; rewrite it with `python -m remix_core merge` first")
+        base_manifest = zip_manifest(bz)
+        if not force and manifest["base"] != manifest_digest(base_manifest):
+            raise ValueError("the delta was made against a different version of this dataset (force to apply anyway)")
+        with dz.open("dataset.json") as f:
+            replacements = {str(item["id"]): item for item in iter_json_items(f) if isinstance(item, dict) and "id" in item}
+        removed = set(manifest["removed"])
+        delta_images = {item_id: info for item_id, info in image_index(dz).items() if item_id in replacements}
+        # 写之前先核对增量包里的图片 (原地修改时中途出错 base 就坏了)
+        for item_id, info in delta_images.items():
+            record = manifest["items"].get(item_id) or {}
+            if (record.get("crc"), record.get("size")) != (info.CRC, info.file_size): raise ValueError(f"{info.filename}: does not match manifest.json")
+            check_member(dz, info)
+        # 要丢掉的基准条目：被替换或删掉的图片、dataset.json 和 manifest.json
+        drop = {"dataset.json", MANIFEST_NAME}
+        for item_id in set(replacements) | removed:
+            old = base_manifest["items"].get(item_id)
+            record = manifest["items"].get(item_id) or {}
+            if old and old.get("image") and (item_id in removed or item_id in delta_images or not record.get("image")): drop.add(old["image"])
+        # 新的 dataset.json 先写进临时文件 (原地修改时旧的 dataset.json 可能在要截掉的部分里)
+        with bz.open("dataset.json") as f:
+            separator = b"[\n    "
+            for item in merged_items(iter_json_items(f), replacements, removed, set(replacements) - set(base_manifest["items"])):
+                spool.write(separator + dumps_dataset_item(item).encode("utf-8", "surrogatepass"))
+                separator = b",\n    "
+                stats["items"] += 1
+            spool.write(b"[]" if stats["items"] == 0 else b"\n]")
+        kept = sorted((info for info in bz.infolist() if info.filename not in drop), key=lambda info: info.header_offset)
+        result = {key: value for key, value in manifest.items() if key not in DELTA_FIELDS}
+        if out is None:
+            # 从最后一个保留条目后面的第一个条目 (或中央目录) 开始覆盖
+            last = kept[-1].header_offset if kept else -1
+            append_at = min((info.header_offset for info in bz.infolist() if info.header_offset > last), default=bz.start_dir)
+            fp = open(base, "r+b")
+            fp.seek(append_at)
+            writer = ZipStreamWriter(fp, append_at)
+            for info in kept: writer.keep_member(info)
+        else:
+            fp = open(out + ".part", "wb")
+            writer = ZipStreamWriter(fp)
+            for info in kept:
+                writer.write_chunks(ZipEntry(info.filename, info.compress_type, info.CRC, info.file_size, None, info.date_time),
+                                    info.compress_size, iter_raw_member(bz.fp, info))
+        start = writer.offset if out is None else 0
+        try:
+            for item_id, info in sorted(delta_images.items(), key=lambda kv: id_sort_key(kv[0])):
+                writer.write_chunks(ZipEntry(info.filename, info.compress_type, info.CRC, info.file_size, None, info.date_time),
+                                    info.compress_size, iter_raw_member(dz.fp, info))
+            write_spooled(writer, "dataset.json", spool, zipfile.ZIP_STORED if policy == "store" else zipfile.ZIP_DEFLATED, compresslevel, spool_dir)
+            writer.write_entry(make_zip_entry(MANIFEST_NAME, json.dumps(result, ensure_ascii=False), compresslevel=compresslevel))
+            writer.close()
+            fp.truncate()
+        except BaseException:
+            fp.close()
+            if out is not None and os.path.exists(out + ".part"): os.remove(out + ".part")
+            raise
+        fp.close()
+        if out is not None: os.replace(out + ".part", out)
+        stats.update(changed=len(manifest["changed"]), removed=len(removed), images=len(delta_images), kept=len(kept),
+                     bytes_written=writer.offset - start, seconds=time.perf_counter() - started)
+        m.add(bytes_out=stats["bytes_written"], items=stats["changed"])
+    return stats
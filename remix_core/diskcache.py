@@ -0,0 +1,102 @@
+import collections
+import os
+import threading
+
+# ================= DISK LRU =================
+# 目录里的文件按最近使用排序 ({目录}/{key 前两位}/{key})，总大小超过 max_bytes 时删最久没用的。
+# 最近使用时间记在文件的 mtime 上，重启后按 mtime 恢复顺序
+
+class DiskLRU:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for sub in os.scandir(directory):
+            if not sub.is_dir(): continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".part"): continue
+                st = entry.stat()
+                found.append((st.st_mtime, entry.name, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        # max_bytes 可能比上次小
+        self._evict()
+
+    def _evict(self):
+        evicted = []
+        with self._lock:
+            while self._bytes > self.max_bytes:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def lookup(self, key):
+        # 命中时返回文件路径，并把它标记为最近使用
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock: self.hits += 1
+        return path
+
+    def write(self, key, write):
+        # write(f) 写入临时文件，成功后改名并登记；返回 write 的返回值
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                result = write(f)
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes:
+            os.remove(tmp_path)
+            return result
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+        self._evict()
+        return result
+
+    def discard(self, key):
+        with self._lock:
+            self._bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,412 @@
+import collections
+import hashlib
+import io
+import json
+import threading
+import time
+
+from . import metrics
+from .dataset import clean_export_item, dumps_dataset_item, join_dataset_items
+from .delta import MANIFEST_NAME, delta_manifest, fragment_hash, image_changed, source_key
+from .ingest import ImageStore, MediaRef, image_blob, image_digest, iter_slides
+from .transcode import image_extension
+from .zipwriter import ChunkSink, ZipStreamWriter, as_reader, compress_type_for, make_zip_entry, spool_file
+
+# ================= EXPORT =================
+
+EXPORT_LAYOUTS = ("copies", "unique")
+
+def new_stage():
+    # 每个导出阶段的统计：条目数、进出字节数、主线程上的耗时 (cpu_seconds: 池里处理图片的耗时合计)
+    return {"items": 0, "cached": 0, "unchanged": 0, "transcoded": 0, "failed": 0,
+            "bytes_in": 0, "bytes_out": 0, "seconds": 0.0, "cpu_seconds": 0.0}
+
+class ExportBuilder:
+    # 增量导出引擎：按内容缓存每个 JSON 片段和图片条目，只重建变化的部分
+    # layout="copies": 每个 ID 一个 images/{id}.png (相同图片只压缩一次)
+    # layout="unique": 每张不同的图片只写一次 images/{digest}.png，另附 images.json (ID -> 图片)
+    # 图片条目按最近使用保留，合计不超过 cache_bytes 字节；cache_images=False 时不缓存，导出时内存只和单个条目有关
+    # normalizer (ImageNormalizer): 图片先识别格式/转码/缩小，文件扩展名跟着真实格式走；不设时原样写成 .png
+    def __init__(self, policy="auto", compresslevel=None, layout="copies", cache_images=True, normalizer=None, cache_bytes=64 << 20):
+        if layout not in EXPORT_LAYOUTS: raise ValueError(f"Unknown export layout: {layout}")
+        self.policy = policy
+        self.compresslevel = compresslevel
+        self.layout = layout
+        self.cache_images = cache_images
+        self.cache_bytes = cache_bytes
+        self.normalizer = normalizer
+        self._lock = threading.Lock()
+        self._fragments = {}
+        self._images = collections.OrderedDict()
+        self._image_bytes = 0
+        self._digests = {}
+        self._json_entries = {}
+        self.last_stats = None
+
+    def _digest(self, image_storage, name):
+        if isinstance(image_storage, ImageStore): return image_storage.digest_of(name)
+        blob = image_storage[name]
+        if isinstance(blob, MediaRef): return blob.digest
+        # bytes 不可变，同一个对象只算一次哈希 (保存引用，避免 id 被复用)
+        cached = self._digests.get(id(blob))
+        if cached is not None and cached[0] is blob: return cached[1]
+        digest = image_digest(blob)
+        self._digests[id(blob)] = (blob, digest)
+        return digest
+
+    def _entry(self, name, data, stage=None):
+        started = time.perf_counter()
+        entry = make_zip_entry(name, data, compress_type_for(data, self.policy), self.compresslevel)
+        if stage is not None:
+            stage["items"] += 1
+            stage["bytes_in"] += entry.size
+            stage["bytes_out"] += len(entry.payload)
+            stage["seconds"] += time.perf_counter() - started
+        return entry
+
+    def _cache_image(self, key, cached):
+        size = len(cached[0].payload)
+        if not self.cache_images or size > self.cache_bytes: return
+        self._images[key] = cached
+        self._image_bytes += size
+        while self._image_bytes > self.cache_bytes:
+            _, (evicted, _) = self._images.popitem(last=False)
+            self._image_bytes -= len(evicted.payload)
+
+    def _drop_image(self, key):
+        cached = self._images.pop(key, None)
+        if cached is not None: self._image_bytes -= len(cached[0].payload)
+
+    def _json_entry(self, name, json_str, json_entries, stage=None):
+        json_digest = hashlib.blake2b(json_str.encode("utf-8"), digest_size=16).digest()
+        cached = self._json_entries.get(name)
+        hit = cached is not None and cached[0] == json_digest
+        if not hit: cached = (json_digest, self._entry(name, json_str.encode("utf-8"), stage))
+        json_entries[name] = cached
+        return cached[1], hit
+
+    def _layout(self, layout):
+        if layout is not None and layout not in EXPORT_LAYOUTS: raise ValueError(f"Unknown export layout: {layout}")
+        return layout or self.layout
+
+    def _unlocked(self, steps):
+        # steps 每一步交出一批字节块；只在推进 steps 时持有锁，yield 时不持有：
+        # 下载被取消、生成器被丢在一边时，同一个 session 的下一次导出不会被锁住
+        while True:
+            with self._lock:
+                chunks = next(steps, None)
+            if chunks is None: return
+            yield from chunks
+
+    def iter_chunks(self, processed_jsons, image_storage, layout=None, normalizer=None):
+        # 流式导出：逐个条目生成压缩包的字节块，任何时候内存里最多只有一个条目
+        return self._unlocked(self._build_steps(processed_jsons, image_storage, self._layout(layout), normalizer or self.normalizer))
+
+    def _build_steps(self, processed_jsons, image_storage, layout, normalizer):
+        started = time.perf_counter()
+        stats = {"entries": 0, "cached": 0, "bytes": 0, "cached_bytes": 0, "unique_images": 0, "duplicate_bytes": 0,
+                 "stages": {"images": new_stage(), "zip": new_stage()}}
+        sink = ChunkSink()
+        writer = ZipStreamWriter(sink)
+        with metrics.span("zip_build") as m:
+            for entry in self._iter_entries(processed_jsons, image_storage, layout, normalizer, stats):
+                writer.write_entry(entry)
+                yield sink.drain()
+            writer.close()
+            m.add(stats["bytes"], writer.offset, stats["entries"])
+        stats["seconds"] = time.perf_counter() - started
+        self.last_stats = stats
+        yield sink.drain()
+
+    def write(self, fp, processed_jsons, image_storage, layout=None, normalizer=None):
+        for chunk in self.iter_chunks(processed_jsons, image_storage, layout, normalizer):
+            fp.write(chunk)
+        return self.last_stats
+
+    def build(self, processed_jsons, image_storage, layout=None, normalizer=None):
+        zip_buffer = io.BytesIO()
+        self.write(zip_buffer, processed_jsons, image_storage, layout, normalizer)
+        return zip_buffer
+
+    def build_file(self, processed_jsons, image_storage, layout=None, spool_dir=None, normalizer=None):
+        # 写到临时文件，返回从头开始读的文件对象。构建时内存只和单个条目有关；
+        # 交给 st.download_button 后 Streamlit 仍会把整个文件读进内存 (只是不再多一份 BytesIO)
+        spool = spool_file(spool_dir)
+        try:
+            self.write(spool, processed_jsons, image_storage, layout, normalizer)
+        except BaseException:
+            spool.close()
+            raise
+        return as_reader(spool)
+
+    def iter_delta_chunks(self, processed_jsons, image_storage, base, normalizer=None):
+        # 增量导出 ("copies" 布局)：base 是上次导出的 manifest (read_manifest)，只写新增或改动的条目和图片，
+        # 外加记录整个数据集的 manifest.json；用 apply_delta 合并进上次的压缩包
+        return self._unlocked(self._delta_steps(processed_jsons, image_storage, base, normalizer or self.normalizer))
+
+    def _delta_steps(self, processed_jsons, image_storage, base, normalizer):
+        started = time.perf_counter()
+        stats = {"entries": 0, "cached": 0, "bytes": 0, "cached_bytes": 0, "unique_images": 0, "duplicate_bytes": 0,
+                 "changed": 0, "removed": 0, "stages": {"images": new_stage(), "zip": new_stage()}}
+        sink = ChunkSink()
+        writer = ZipStreamWriter(sink)
+        with metrics.span("zip_build") as m:
+            for entry in self._iter_delta_entries(processed_jsons, image_storage, base, normalizer, stats):
+                writer.write_entry(entry)
+                stats["entries"] += 1
+                stats["bytes"] += entry.size
+                yield sink.drain()
+            writer.close()
+            m.add(stats["bytes"], writer.offset, stats["entries"])
+        stats["seconds"] = time.perf_counter() - started
+        self.last_stats = stats
+        yield sink.drain()
+
+    def build_delta_file(self, processed_jsons, image_storage, base, spool_dir=None, normalizer=None):
+        spool = spool_file(spool_dir)
+        try:
+            for chunk in self.iter_delta_chunks(processed_jsons, image_storage, base, normalizer): spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        return as_reader(spool)
+
+    def _iter_delta_entries(self, processed_jsons, image_storage, base, normalizer, stats):
+        fragments, records, ordered, changed = {}, {}, [], []
+        image_stage, zip_stage = stats["stages"]["images"], stats["stages"]["zip"]
+        for key in sorted(processed_jsons.keys(), key=lambda x: int(processed_jsons[x]['id'])):
+            item = processed_jsons[key]
+            item_id = str(item.get("id"))
+            fragment, _ = self._fragment(item, fragments)
+            record = records[item_id] = {"hash": fragment_hash(fragment), "image": None, "crc": None, "size": None}
+            old = base["items"].get(item_id)
+            is_changed = old is None or old.get("hash") != record["hash"]
+            target_img_name = f"{item_id}.png"
+            if target_img_name in image_storage:
+                digest = self._digest(image_storage, target_img_name)
+                record["source"] = source_key(digest, normalizer)
+                if old is not None and old.get("image") and old.get("source") == record["source"]:
+                    # 原始图片和转码参数都没变，不用生成图片条目
+                    record.update(image=old["image"], crc=old["crc"], size=old["size"])
+                else:
+                    cached = self._images.get((digest, normalizer.key) if normalizer else digest)
+                    if cached is None:
+                        image = image_storage[target_img_name]
+                        data, ext = self._image_data(image, normalizer.iter_normalized([(digest, image)]) if normalizer else None, image_stage)
+                        cached = (self._entry("", data, zip_stage), ext)
+                    else:
+                        stats["cached"] += 1
+                        stats["cached_bytes"] += cached[0].size
+                    entry, ext = cached
+                    if image_changed(old, entry.crc, entry.size):
+                        record.update(image=f"images/{item_id}.{ext}", crc=entry.crc, size=entry.size)
+                        is_changed = True
+                        yield entry._replace(name=record["image"])
+                    else:
+                        record.update(image=old["image"], crc=entry.crc, size=entry.size)
+            elif old is not None and old.get("image"):
+                is_changed = True
+            if is_changed:
+                ordered.append(fragment)
+                changed.append(item_id)
+        manifest = delta_manifest(records, base, changed)
+        stats["changed"], stats["removed"] = len(changed), len(manifest["removed"])
+        yield self._entry("dataset.json", join_dataset_items(ordered).encode("utf-8"), zip_stage)
+        yield self._entry(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False).encode("utf-8"), zip_stage)
+
+    def _image_data(self, image, normalized, stage):
+        # 返回 (写入的数据, 扩展名)；normalized: 预先排进池里的结果 (按顺序取)，None 表示当场处理
+        started = time.perf_counter()
+        if normalized is None:
+            data = image_blob(image)
+            stage["items"] += 1
+            stage["bytes_in"] += len(data)
+            stage["bytes_out"] += len(data)
+            stage["seconds"] += time.perf_counter() - started
+            return data, "png"
+        _, result, hit = next(normalized)
+        stage["items"] += 1
+        stage["bytes_in"] += result.bytes_in
+        stage["bytes_out"] += len(result.data)
+        stage[result.status] += 1
+        if hit: stage["cached"] += 1
+        else: stage["cpu_seconds"] += result.seconds
+        stage["seconds"] += time.perf_counter() - started
+        return result.data, image_extension(result.format)
+
+    def _fragment(self, item, fragments):
+        # 返回 (条目的 JSON 片段, 生成用的秒数，缓存命中时为 None)
+        clean_item = clean_export_item(item)
+        frag_key = (clean_item["id"], clean_item["prompt"], tuple((r["label"], r["prompt"]) for r in clean_item["remixSuggestions"]))
+        fragment = fragments.get(frag_key) or self._fragments.get(frag_key)
+        seconds = None
+        if fragment is None:
+            json_started = time.perf_counter()
+            fragment = dumps_dataset_item(clean_item)
+            seconds = time.perf_counter() - json_started
+        fragments[frag_key] = fragment
+        return fragment, seconds
+
+    def _iter_entries(self, processed_jsons, image_storage, layout, normalizer, stats):
+        fragments, used, json_entries, ordered, manifest, seen = {}, set(), {}, [], {}, {}
+
+        def account(entry, hit):
+            stats["entries"] += 1
+            stats["bytes"] += entry.size
+            if hit:
+                stats["cached"] += 1
+                stats["cached_bytes"] += entry.size
+
+        # 图片条目按 (摘要, 处理参数) 缓存，换了转码参数不会用到旧条目
+        def entry_key(digest): return (digest, normalizer.key) if normalizer else digest
+
+        plan, json_seconds, json_items = [], 0.0, 0
+        sorted_keys = sorted(processed_jsons.keys(), key=lambda x: int(processed_jsons[x]['id']))
+        for key in sorted_keys:
+            item = processed_jsons[key]
+            fragment, seconds = self._fragment(item, fragments)
+            if seconds is not None:
+                json_seconds += seconds
+                json_items += 1
+            ordered.append(fragment)
+
+            target_img_name = f"{item.get('id')}.png"
+            if target_img_name not in image_storage: continue
+            plan.append((str(item.get("id")), target_img_name, self._digest(image_storage, target_img_name)))
+
+        # 缓存里没有的图片按导出顺序排进 normalizer 的池子，写前面的条目时后面的图片已经在处理了
+        queued = {}
+        for _, target_img_name, digest in plan:
+            if digest not in queued and self._images.get(entry_key(digest)) is None: queued[digest] = target_img_name
+        normalized = normalizer.iter_normalized((d, image_storage[name]) for d, name in list(queued.items())) if normalizer else None
+
+        image_stage, zip_stage = stats["stages"]["images"], stats["stages"]["zip"]
+        for item_id, target_img_name, digest in plan:
+            if digest in seen:
+                # 同一张图片在本次导出里已经出现过
+                stats["duplicate_bytes"] += seen[digest][1]
+                if layout == "unique":
+                    manifest[item_id] = seen[digest][0]
+                    continue
+            else:
+                stats["unique_images"] += 1
+            # 只有上次导出留下的条目才算缓存命中；本次导出里重复的图片直接复用，不算命中
+            key = entry_key(digest)
+            cached = self._images.get(key)
+            hit = cached is not None and key not in used
+            if cached is None:
+                image = image_storage[target_img_name]
+                if normalizer is None: source = None
+                elif queued.pop(digest, None) is not None: source = normalized
+                else: source = normalizer.iter_normalized([(digest, image)]) # 没缓存 (或已经挤出缓存) 的重复图片
+                data, ext = self._image_data(image, source, image_stage)
+                cached = (self._entry("", data, zip_stage), ext)
+                self._cache_image(key, cached)
+            else:
+                self._images.move_to_end(key)
+            used.add(key)
+            entry, ext = cached
+            arcname = f"images/{digest.hex()}.{ext}" if layout == "unique" else f"images/{item_id}.{ext}"
+            entry = entry._replace(name=arcname)
+            seen.setdefault(digest, (arcname, entry.size))
+            manifest[item_id] = arcname
+            account(entry, hit)
+            yield entry
+
+        json_started = time.perf_counter()
+        json_docs = [("dataset.json", join_dataset_items(ordered))]
+        if layout == "unique":
+            json_docs.append(("images.json", json.dumps(manifest, indent=4, ensure_ascii=False)))
+        metrics.record("json_dump", json_seconds + time.perf_counter() - json_started,
+                       bytes_out=sum(len(json_str) for _, json_str in json_docs), items=json_items)
+        for name, json_str in json_docs:
+            entry, hit = self._json_entry(name, json_str, json_entries, zip_stage)
+            account(entry, hit)
+            yield entry
+
+        # 只保留本次用到的条目，缓存大小跟着当前数据集走
+        self._fragments, self._json_entries = fragments, json_entries
+        for key in [key for key in self._images if key not in used]: self._drop_image(key)
+        self._digests = {key: value for key, value in self._digests.items() if value[1] in seen}
+
+class DatasetZipWriter:
+    # 按 ID 顺序逐条写 dataset.zip：图片条目 (已经压缩好) 一到就写进文件，内存里只保留 JSON 片段
+    def __init__(self, fp, layout="copies", policy="auto", compresslevel=None):
+        if layout not in EXPORT_LAYOUTS: raise ValueError(f"Unknown export layout: {layout}")
+        self.layout = layout
+        self.policy = policy
+        self.compresslevel = compresslevel
+        self._writer = ZipStreamWriter(fp)
+        self._fragments = []
+        self._manifest = {}
+        self._written = {}
+        # 与 ExportBuilder 的 zip_build 指标口径相同：写入的条目数和未压缩字节数
+        self.entries = self.bytes_in = 0
+
+    def _write(self, entry):
+        self._writer.write_entry(entry)
+        self.entries += 1
+        self.bytes_in += entry.size
+
+    def add(self, item, entry=None, digest=None, ext="png"):
+        self._fragments.append(dumps_dataset_item(clean_export_item(item)))
+        if entry is None: return
+        item_id = str(item.get("id"))
+        if self.layout == "copies":
+            self._write(entry._replace(name=f"images/{item_id}.{ext}"))
+            return
+        arcname = self._written.get(digest)
+        if arcname is None:
+            arcname = self._written[digest] = f"images/{digest.hex()}.{ext}"
+            self._write(entry._replace(name=arcname))
+        self._manifest[item_id] = arcname
+
+    @property
+    def offset(self):
+        return self._writer.offset
+
+    def close(self):
+        with metrics.span("json_dump") as m:
+            json_docs = [("dataset.json", join_dataset_items(self._fragments))]
+            if self.layout == "unique":
+                json_docs.append(("images.json", json.dumps(self._manifest, indent=4, ensure_ascii=False)))
+            m.add(bytes_out=sum(len(json_str) for _, json_str in json_docs), items=len(self._fragments))
+        for name, json_str in json_docs:
+            data = json_str.encode("utf-8")
+            self._write(make_zip_entry(name, data, compress_type_for(data, self.policy), self.compresslevel))
+        self._writer.close()
+
+def create_final_zip(processed_jsons, image_storage, policy="auto", compresslevel=None, layout="copies", normalizer=None):
+    return ExportBuilder(policy, compresslevel, layout, normalizer=normalizer).build(processed_jsons, image_storage)
+
+def extract_images_from_ppt(uploaded_file, start_id, policy="auto", compresslevel=None, fp=None, deck_cache=None, normalizer=None):
+    # fp: 写入的目标文件 (默认写进内存里的 BytesIO)；图片逐张读取、写入
+    zip_buffer = io.BytesIO() if fp is None else fp
+    writer = ZipStreamWriter(zip_buffer)
+    current_id = int(start_id)
+    count = 0
+    with metrics.span("zip_build") as m:
+        try:
+            records = deck_cache.slides(uploaded_file) if deck_cache else iter_slides(uploaded_file)
+            pictures = (picture for record in records for picture in record.pictures if picture.name is not None)
+            if normalizer is None:
+                images = (("png", picture.blob) for picture in pictures)
+            else:
+                images = ((image_extension(result.format), result.data)
+                          for _, result, _ in normalizer.iter_normalized((picture.digest, picture) for picture in pictures))
+            for ext, img_bytes in images:
+                img_name = f"{current_id}.{ext}"
+                writer.write_entry(make_zip_entry(img_name, img_bytes, compress_type_for(img_bytes, policy), compresslevel))
+                m.add(bytes_in=len(img_bytes))
+                current_id += 1
+                count += 1
+        except ValueError as e:
+            # 出错时不再返回目标文件，这里关掉 (调用方传进来的临时文件随之删除)
+            zip_buffer.close()
+            return None, str(e)
+        except BaseException:
+            zip_buffer.close()
+            raise
+        writer.close()
+        m.add(bytes_out=writer.offset, items=count)
+    return zip_buffer, count
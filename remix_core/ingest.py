@@ -0,0 +1,344 @@
+import collections
+import collections.abc
+import hashlib
+import io
+import mmap
+import os
+import posixpath
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+
+from . import metrics
+
+# ================= PPTX INGESTION =================
+# 编辑器和图片提取器共用：只打开一次文件，每个 shape 只访问一次
+# 直接读取 pptx 的 zip 结构和 XML：图片只记录 ppt/media/* 成员的引用，用到时才从映射的文件里读出来
+
+NS_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+NS_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+NS_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+
+# 和 python-pptx 一样，只把 spTree 的直接子元素当作 shape
+SHAPE_TAGS = {NS_P + "sp", NS_P + "grpSp", NS_P + "graphicFrame", NS_P + "cxnSp", NS_P + "pic", NS_P + "contentPart"}
+
+SlideRecord = collections.namedtuple("SlideRecord", "index image text pictures")
+
+class MediaRef:
+    # 只记录 zip 成员名，同一个 media part 在一个 MediaArchive 里只有一个 MediaRef
+    __slots__ = ("archive", "name", "size", "_digest")
+
+    def __init__(self, archive, name, size):
+        self.archive = archive
+        self.name = name
+        self.size = size
+        self._digest = None
+
+    @property
+    def blob(self):
+        if self.name is None: raise ValueError("Picture has no embedded image")
+        return self.archive.read(self.name)
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.blake2b(self.blob, digest_size=16).digest()
+        return self._digest
+
+    def iter_chunks(self, chunk_size=1 << 20):
+        if self.name is None: raise ValueError("Picture has no embedded image")
+        return self.archive.iter_chunks(self.name, chunk_size)
+
+# session 里的图片既可能是 bytes，也可能是 MediaRef
+def image_blob(image):
+    return image.blob if isinstance(image, MediaRef) else image
+
+def image_digest(image):
+    return image.digest if isinstance(image, MediaRef) else hashlib.blake2b(image, digest_size=16).digest()
+
+def image_size(image):
+    return image.size if isinstance(image, MediaRef) else len(image)
+
+class MediaArchive:
+    def __init__(self, fileobj, spool_dir=None, cache_bytes=64 << 20):
+        self._lock = threading.Lock()
+        self._refs = {}
+        self._decompressed = collections.OrderedDict()
+        self._cached_bytes = 0
+        self.cache_bytes = cache_bytes
+        self._file = self._own_file(fileobj, spool_dir)
+        self._map = self._zip = None
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size == 0: raise ValueError("File is not a valid .pptx file.")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._zip = zipfile.ZipFile(self._file)
+        except zipfile.BadZipFile:
+            self.close()
+            raise ValueError("File is not a valid .pptx file.")
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        # 关掉 zip、映射和文件 (复制的 fd 或临时文件)；之后这个 archive 的 MediaRef 都不能再读
+        with self._lock:
+            self._decompressed.clear()
+            self._cached_bytes = 0
+            if self._zip is not None: self._zip.close()
+            if self._map is not None:
+                try:
+                    self._map.close()
+                except BufferError:
+                    pass # 还有直接切出去的图片数据引用着映射，它们释放后由 GC 关掉
+            self._file.close()
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+    @staticmethod
+    def _own_file(fileobj, spool_dir):
+        if isinstance(fileobj, (str, os.PathLike)): return open(fileobj, "rb")
+        try:
+            return open(os.dup(fileobj.fileno()), "rb")
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # 上传的文件在内存里 (BytesIO)：先落盘到临时文件，之后图片都从磁盘映射读取
+            spool = tempfile.TemporaryFile(dir=spool_dir)
+            fileobj.seek(0)
+            shutil.copyfileobj(fileobj, spool, 1 << 20)
+            spool.flush()
+            return spool
+
+    def ref(self, name, digest=None):
+        # digest: 已知的内容摘要 (来自解析缓存)，省得再读一遍图片
+        ref = self._refs.get(name)
+        if ref is None:
+            ref = self._refs[name] = MediaRef(self, name, self._zip.getinfo(name).file_size)
+        if digest is not None and ref._digest is None: ref._digest = digest
+        return ref
+
+    def _read_member(self, name):
+        # 成员损坏 (CRC 不对、压缩数据有错) 和其他读取错误一样报 ValueError，调用方只跳过这一个文件
+        try:
+            return self._zip.read(name)
+        except (zipfile.BadZipFile, zlib.error) as e:
+            raise ValueError(f"Error reading PPT: {name}: {e}")
+
+    def read_part(self, name):
+        with self._lock:
+            return self._read_member(name)
+
+    def _span(self, info):
+        name_len, extra_len = struct.unpack_from("<HH", self._map, info.header_offset + 26)
+        start = info.header_offset + 30 + name_len + extra_len
+        return memoryview(self._map)[start:start + info.compress_size]
+
+    def read(self, name):
+        info = self._zip.getinfo(name)
+        if info.compress_type == zipfile.ZIP_STORED:
+            # 未压缩的成员直接返回映射内存的切片，不做任何拷贝
+            return self._span(info)
+        with self._lock:
+            data = self._decompressed.get(name)
+            if data is not None:
+                self._decompressed.move_to_end(name)
+                return data
+            with metrics.span("image_extract") as m:
+                data = self._read_member(name)
+                m.add(info.compress_size, len(data), 1)
+            if len(data) <= self.cache_bytes:
+                self._decompressed[name] = data
+                self._cached_bytes += len(data)
+                while self._cached_bytes > self.cache_bytes:
+                    _, evicted = self._decompressed.popitem(last=False)
+                    self._cached_bytes -= len(evicted)
+            return data
+
+    def iter_chunks(self, name, chunk_size=1 << 20):
+        # 流式读取：每次只解压一小块，不需要把整张图片放进内存
+        info = self._zip.getinfo(name)
+        span = self._span(info)
+        if info.compress_type == zipfile.ZIP_STORED:
+            for pos in range(0, len(span), chunk_size):
+                yield span[pos:pos + chunk_size]
+            return
+        if info.compress_type != zipfile.ZIP_DEFLATED:
+            yield self.read(name)
+            return
+        decompressor = zlib.decompressobj(-15)
+        try:
+            for pos in range(0, len(span), chunk_size):
+                data = decompressor.decompress(span[pos:pos + chunk_size])
+                if data: yield data
+            data = decompressor.flush()
+        except zlib.error as e:
+            raise ValueError(f"Error reading PPT: {name}: {e}")
+        if data: yield data
+
+def _read_rels(archive, part_name):
+    rels_name = posixpath.join(posixpath.dirname(part_name), "_rels", posixpath.basename(part_name) + ".rels")
+    try:
+        root = ET.fromstring(archive.read_part(rels_name))
+    except KeyError:
+        return {}
+    base = posixpath.dirname(part_name)
+    rels = {}
+    for rel in root.iter(NS_REL + "Relationship"):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            rels[rel.get("Id")] = (rel.get("Type"), None)
+            continue
+        path = target[1:] if target.startswith("/") else posixpath.join(base, target)
+        rels[rel.get("Id")] = (rel.get("Type"), posixpath.normpath(path))
+    return rels
+
+def _slide_parts(archive):
+    pkg_rels = _read_rels(archive, "")
+    main = next((target for rel_type, target in pkg_rels.values() if rel_type == RT_OFFICE_DOCUMENT), None)
+    if main is None: raise ValueError("File is not a valid .pptx file.")
+    prs_rels = _read_rels(archive, main)
+    root = ET.fromstring(archive.read_part(main))
+    id_list = root.find(NS_P + "sldIdLst")
+    if id_list is None: return []
+    return [prs_rels[sld.get(NS_R + "id")][1] for sld in id_list.iter(NS_P + "sldId")]
+
+def _text_body_text(tx_body):
+    # 与 python-pptx 的 TextFrame.text 相同：段落用 \n 连接，软回车 (a:br) 记为 \v
+    paragraphs = []
+    for p in tx_body.iterfind(NS_A + "p"):
+        parts = []
+        for child in p:
+            if child.tag == NS_A + "br":
+                parts.append("\v")
+            elif child.tag in (NS_A + "r", NS_A + "fld"):
+                t = child.find(NS_A + "t")
+                parts.append((t.text or "") if t is not None else "")
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+def _picture_ref(archive, pic, rels):
+    nv_pr = pic.find(f"{NS_P}nvPicPr/{NS_P}nvPr")
+    if nv_pr is not None and nv_pr.find(NS_P + "ph") is None and nv_pr.find(NS_A + "videoFile") is not None:
+        return None # 视频的封面图不算图片
+    blip = pic.find(f"{NS_P}blipFill/{NS_A}blip")
+    target = rels.get(blip.get(NS_R + "embed")) if blip is not None else None
+    if target is None or target[1] is None: return MediaRef(archive, None, 0)
+    try:
+        return archive.ref(target[1])
+    except KeyError:
+        return MediaRef(archive, None, 0)
+
+def open_presentation(uploaded_file, spool_dir=None):
+    # 返回 (archive, slide 列表)；archive 是这里新打开的 (uploaded_file 不是 MediaArchive) 时由调用方关闭
+    archive = None
+    try:
+        with metrics.span("pptx_open") as m:
+            archive = uploaded_file if isinstance(uploaded_file, MediaArchive) else MediaArchive(uploaded_file, spool_dir)
+            slide_parts = _slide_parts(archive)
+            m.add(bytes_in=archive.size, items=len(slide_parts))
+        return archive, slide_parts
+    except BaseException as e:
+        if archive is not None and archive is not uploaded_file: archive.close()
+        if isinstance(e, ValueError) or not isinstance(e, Exception): raise
+        raise ValueError(f"Error reading PPT: {str(e)}")
+
+def count_slides(uploaded_file, spool_dir=None):
+    archive, slide_parts = open_presentation(uploaded_file, spool_dir)
+    if archive is not uploaded_file: archive.close()
+    return len(slide_parts)
+
+def iter_slides(uploaded_file, spool_dir=None, start=0, stop=None):
+    # start/stop 只处理一段 slide (并行转换大文件时按段分给不同进程)
+    archive, slide_parts = open_presentation(uploaded_file, spool_dir)
+    for index, part_name in enumerate(slide_parts[start:stop], start):
+        with metrics.span("slide_walk") as m:
+            try:
+                xml = archive.read_part(part_name)
+                root = ET.fromstring(xml)
+                rels = _read_rels(archive, part_name)
+            except Exception as e:
+                raise ValueError(f"Error reading PPT: {str(e)}")
+            sp_tree = root.find(f"{NS_P}cSld/{NS_P}spTree")
+            pictures = []
+            text = ""
+            for shape in (sp_tree if sp_tree is not None else ()):
+                if shape.tag not in SHAPE_TAGS: continue
+                # 普通图片和图片占位符都是 p:pic
+                if shape.tag == NS_P + "pic":
+                    ref = _picture_ref(archive, shape, rels)
+                    if ref is not None: pictures.append(ref)
+                elif shape.tag == NS_P + "sp":
+                    tx_body = shape.find(NS_P + "txBody")
+                    shape_text = _text_body_text(tx_body).strip() if tx_body is not None else ""
+                    # 只有当文字长度足够，且比当前已提取的文字更长时才更新
+                    if len(shape_text) > 5 and len(shape_text) > len(text):
+                        text = shape_text
+            m.add(bytes_in=len(xml), items=1)
+        yield SlideRecord(index, pictures[0] if pictures else None, text, pictures)
+
+class ImageStore(collections.abc.Mapping):
+    # 按内容寻址的图片仓库：文件名 -> 摘要 -> 图片，内容相同的图片只保存一份 (跨 slide、跨上传)
+    def __init__(self):
+        self._names = {}
+        self._blobs = {}
+        self._counts = collections.Counter()
+
+    def add(self, name, image):
+        digest = image_digest(image)
+        self.discard(name)
+        self._blobs.setdefault(digest, image)
+        self._names[name] = digest
+        self._counts[digest] += 1
+        return digest
+
+    def discard(self, name):
+        digest = self._names.pop(name, None)
+        if digest is None: return
+        self._counts[digest] -= 1
+        if not self._counts[digest]:
+            del self._counts[digest]
+            del self._blobs[digest]
+
+    def digest_of(self, name):
+        return self._names[name]
+
+    def __getitem__(self, name):
+        return self._blobs[self._names[name]]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def stats(self):
+        sizes = {digest: image_size(image) for digest, image in self._blobs.items()}
+        total = sum(sizes[digest] for digest in self._names.values())
+        stored = sum(sizes.values())
+        return {"images": len(self._names), "unique": len(self._blobs), "bytes": total,
+                "stored_bytes": stored, "saved_bytes": total - stored}
+
+def process_ppt_file(uploaded_file, start_id, image_store=None, deck_cache=None):
+    # deck_cache: DeckCache，同样内容的文件再次上传时直接用缓存的解析结果
+    current_id = int(start_id)
+    extracted_data = []
+    image_storage = ImageStore() if image_store is None else image_store
+
+    for record in (deck_cache.slides(uploaded_file) if deck_cache else iter_slides(uploaded_file)):
+        # 每个 Slide 只取第一张图 (普通图片或图片占位符)；没有嵌入图片数据的跳过
+        if record.image is None or record.image.name is None: continue
+        img_name = f"{current_id}.png"
+        # 只保存 zip 成员的引用，图片数据用到时才读取
+        image_storage.add(img_name, record.image)
+        # 只有当确实找到了图片时，才算作有效 Slide
+        extracted_data.append({"id": str(current_id), "original_prompt_text": record.text, "image_filename": img_name})
+        current_id += 1
+
+    return extracted_data, image_storage
@@ -0,0 +1,157 @@
+import json
+import os
+import time
+import zipfile
+
+from . import metrics
+from .dataset import dumps_dataset_item, iter_json_items
+from .zipwriter import ZipEntry, ZipStreamWriter, compress_type_for, iter_raw_member, make_zip_entry, spool_file, write_spooled
+
+# ================= MERGE / SHARD =================
+# 把多个 dataset.zip 按顺序合并：ID 从 start_id 起连续重新编号，图片跟着改名成 images/{新 ID}.{扩展名}。
+# 图片条目按压缩后的原始数据拷贝 (不解压、不重新压缩)；dataset.json 逐个元素解析后先写进临时文件，
+# 所以内存只和单个元素、单个数据块有关，与数据集总大小无关。输出总是 "copies" 布局 (每个 ID 一张图)
+
+# 中央目录里每个条目大约占的字节数 (估算切片大小用)
+CENTRAL_ENTRY_BYTES = 46 + 32
+
+def image_index(zf):
+    # {旧 ID: ZipInfo}："unique" 布局按 images.json 查，"copies" 布局按 images/{id}.{ext} 的文件名查
+    if "images.json" in zf.NameToInfo:
+        with zf.open("images.json") as f:
+            manifest = json.load(f)
+        return {str(item_id): zf.getinfo(arcname) for item_id, arcname in manifest.items() if arcname in zf.NameToInfo}
+    return {os.path.splitext(info.filename[len("images/"):])[0]: info for info in zf.infolist()
+            if info.filename.startswith("images/") and not info.is_dir()}
+
+class DatasetMerger:
+    # out: 输出路径，或可写的文件对象 (不能切片)。切片时输出 name-0001.zip, name-0002.zip ...
+    # shard_items: 每片最多几个条目；shard_bytes: 每片大约不超过多少字节 (单个条目不拆开，所以超大的条目会单独成片)
+    # policy/compresslevel 只用于 dataset.json 和少数不能原样拷贝 (非 stored/deflate) 的条目
+    def __init__(self, out, start_id=453, shard_items=None, shard_bytes=None, policy="auto", compresslevel=None, spool_dir=None):
+        self.to_path = isinstance(out, (str, os.PathLike))
+        self.sharded = bool(shard_items or shard_bytes)
+        if self.sharded and not self.to_path: raise ValueError("Sharded output needs a file path")
+        self.out = os.fspath(out) if self.to_path else out
+        self.next_id = int(start_id)
+        self.shard_items = shard_items
+        self.shard_bytes = shard_bytes
+        self.policy = policy
+        self.compresslevel = compresslevel
+        self.spool_dir = spool_dir
+        self.shards = []
+        self.stats = {"inputs": 0, "items": 0, "images": 0, "missing": 0, "unreferenced": 0, "recompressed": 0,
+                      "bytes_in": 0, "bytes_out": 0}
+        self._shard = None
+        self._started = time.perf_counter()
+
+    def shard_path(self, index):
+        if not self.sharded: return self.out
+        stem, ext = os.path.splitext(self.out)
+        return f"{stem}-{index + 1:04d}{ext or '.zip'}"
+
+    def _open_shard(self):
+        path = self.shard_path(len(self.shards)) if self.to_path else None
+        fp = open(path + ".part", "wb") if path else self.out
+        self._shard = {"fp": fp, "writer": ZipStreamWriter(fp), "json": spool_file(self.spool_dir), "json_bytes": 0}
+        self.shards.append({"path": path, "first_id": None, "items": 0, "images": 0, "bytes": 0})
+
+    def _close_shard(self):
+        shard, info = self._shard, self.shards[-1]
+        writer, spool = shard["writer"], shard["json"]
+        try:
+            spool.write(b"\n]" if info["items"] else b"[]")
+            compress_type = zipfile.ZIP_STORED if self.policy == "store" else zipfile.ZIP_DEFLATED
+            write_spooled(writer, "dataset.json", spool, compress_type, self.compresslevel, self.spool_dir)
+            writer.close()
+        finally:
+            spool.close()
+        self._shard = None
+        info["bytes"] = writer.offset
+        self.stats["bytes_out"] += writer.offset
+        if info["path"]:
+            shard["fp"].close()
+            os.replace(info["path"] + ".part", info["path"])
+
+    def _shard_for(self, csize):
+        # 当前切片放不下这个条目时换下一片
+        info = self.shards[-1] if self._shard is not None else None
+        if info is not None and self.sharded and info["items"]:
+            estimate = self._shard["writer"].offset + self._shard["json_bytes"] + (info["items"] + info["images"] + 2) * CENTRAL_ENTRY_BYTES
+            if (self.shard_items and info["items"] >= self.shard_items) or (self.shard_bytes and estimate + csize > self.shard_bytes):
+                self._close_shard()
+        if self._shard is None: self._open_shard()
+        return self._shard
+
+    def _copy_image(self, zf, writer, info, item_id):
+        name = f"images/{item_id}{os.path.splitext(info.filename)[1] or '.png'}"
+        if info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            entry = ZipEntry(name, info.compress_type, info.CRC, info.file_size, None, info.date_time)
+            writer.write_chunks(entry, info.compress_size, iter_raw_member(zf.fp, info))
+        else:
+            # bzip2/lzma 等条目解压后按 policy 重新压缩 (我们写出的压缩包只用 stored/deflate)
+            data = zf.read(info)
+            writer.write_entry(make_zip_entry(name, data, compress_type_for(data, self.policy), self.compresslevel, info.date_time))
+            self.stats["recompressed"] += 1
+        self.stats["bytes_in"] += info.compress_size
+
+    def add(self, source):
+        # source: dataset.zip 的路径或文件对象；返回合并进来的条目数
+        count, bytes_in = 0, self.stats["bytes_in"]
+        with metrics.span("zip_merge") as m, zipfile.ZipFile(source) as zf:
+            if "dataset.json" not in zf.NameToInfo: raise ValueError(f"{getattr(source, 'name', source)}: no dataset.json")
+            images, used = image_index(zf), set()
+            with zf.open("dataset.json") as f:
+                for item in iter_json_items(f):
+                    info = images.get(str(item["id"])) if isinstance(item, dict) and "id" in item else None
+                    shard = self._shard_for(info.compress_size if info else 0)
+                    if isinstance(item, dict) and "id" in item:
+                        item["id"] = str(self.next_id)
+                        self.next_id += 1
+                        if self.shards[-1]["first_id"] is None: self.shards[-1]["first_id"] = item["id"]
+                    if info is not None:
+                        self._copy_image(zf, shard["writer"], info, item["id"])
+                        used.add(info.filename)
+                        self.shards[-1]["images"] += 1
+                        self.stats["images"] += 1
+                    elif isinstance(item, dict) and "id" in item:
+                        self.stats["missing"] += 1
+                    data = (("[\n    " if not self.shards[-1]["items"] else ",\n    ") + dumps_dataset_item(item)).encode("utf-8", "surrogatepass")
+                    shard["json"].write(data)
+                    shard["json_bytes"] += len(data)
+                    self.shards[-1]["items"] += 1
+                    count += 1
+            # 没有条目引用的图片不会写进输出
+            self.stats["unreferenced"] += len({info.filename for info in images.values()} - used)
+            self.stats["bytes_in"] += zf.getinfo("dataset.json").compress_size
+            m.add(bytes_in=self.stats["bytes_in"] - bytes_in, items=count)
+        self.stats["inputs"] += 1
+        self.stats["items"] += count
+        return count
+
+    def close(self):
+        # 返回统计；shards: [{"path", "first_id", "items", "images", "bytes"}]
+        if self._shard is None and not self.shards: self._open_shard()
+        if self._shard is not None: self._close_shard()
+        self.stats["shards"] = self.shards
+        self.stats["seconds"] = time.perf_counter() - self._started
+        return self.stats
+
+    def abort(self):
+        # 出错时丢弃还没写完的切片 (已经完成的切片保留)
+        shard, self._shard = self._shard, None
+        if shard is None: return
+        shard["json"].close()
+        if self.shards[-1]["path"]:
+            shard["fp"].close()
+            if os.path.exists(self.shards[-1]["path"] + ".part"): os.remove(self.shards[-1]["path"] + ".part")
+        self.shards.pop()
+
+def merge_dataset_zips(sources, out, start_id=453, shard_items=None, shard_bytes=None, policy="auto", compresslevel=None, spool_dir=None):
+    merger = DatasetMerger(out, start_id, shard_items, shard_bytes, policy, compresslevel, spool_dir)
+    try:
+        for source in sources: merger.add(source)
+        return merger.close()
+    except BaseException:
+        merger.abort()
+        raise
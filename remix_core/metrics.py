@@ -0,0 +1,152 @@
+import bisect
+import copy
+import json
+import os
+import threading
+import time
+
+# ================= METRICS =================
+# 进程内的指标表：每个阶段 (打开 pptx、逐张解析 slide、读图片、生成 zip、合并 zip、增量包、生成 JSON、重新编号、生成缩略图、查重...)
+# 记录次数、耗时 (含直方图)、进出字节数和条目数 (slide 数、图片数、JSON 条目数)。
+# 默认关闭 (设置 REMIX_METRICS=1 或调用 enable() 打开)；关闭时 span() 返回共用的空对象，开销只有一次函数调用
+
+STAGES = ("pptx_open", "slide_walk", "image_extract", "image_normalize", "zip_build", "zip_merge", "zip_delta", "zip_apply", "json_dump",
+          "renumber", "preview_encode", "dedupe_index", "dedupe_query", "dedupe_cluster")
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+def _new_stage(buckets):
+    return {"count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes_in": 0, "bytes_out": 0, "items": 0,
+            "buckets": [0] * len(buckets)}
+
+class MetricsRegistry:
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.started = time.time()
+
+    def record(self, stage, seconds, bytes_in=0, bytes_out=0, items=0, error=False):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None: entry = self._stages[stage] = _new_stage(self.buckets)
+            entry["count"] += 1
+            entry["errors"] += bool(error)
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["items"] += items
+            if index < len(self.buckets): entry["buckets"][index] += 1
+
+    def snapshot(self):
+        # {阶段: {...}}；buckets 是每个区间 (不累计) 的次数，超过最后一个上限的只算进 count
+        with self._lock:
+            return copy.deepcopy(self._stages)
+
+    def merge(self, snapshot):
+        # 合并子进程的 snapshot (并行批量转换时每个 worker 单独记录)
+        with self._lock:
+            for stage, other in snapshot.items():
+                entry = self._stages.get(stage)
+                if entry is None: entry = self._stages[stage] = _new_stage(self.buckets)
+                for key in ("count", "errors", "seconds", "bytes_in", "bytes_out", "items"): entry[key] += other[key]
+                entry["max_seconds"] = max(entry["max_seconds"], other["max_seconds"])
+                entry["buckets"] = [a + b for a, b in zip(entry["buckets"], other["buckets"])]
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self.started = time.time()
+
+    def rows(self):
+        # 按 STAGES 的顺序 (其他阶段排在后面)，界面上的表格用
+        snapshot = self.snapshot()
+        order = {stage: n for n, stage in enumerate(STAGES)}
+        return [dict(stage=stage, count=s["count"], errors=s["errors"], seconds=round(s["seconds"], 4),
+                     avg_ms=round(1000 * s["seconds"] / s["count"], 3) if s["count"] else 0.0,
+                     max_ms=round(1000 * s["max_seconds"], 3), bytes_in=s["bytes_in"], bytes_out=s["bytes_out"], items=s["items"])
+                for stage, s in sorted(snapshot.items(), key=lambda kv: (order.get(kv[0], len(order)), kv[0]))]
+
+    def to_prometheus(self, prefix="remix"):
+        # Prometheus 文本格式 (可以交给 node_exporter 的 textfile collector)
+        snapshot = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.", f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, s in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, s["buckets"]):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {s["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {s["seconds"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        for key, help_text in (("errors", "Failed calls"), ("bytes_in", "Bytes read"), ("bytes_out", "Bytes written"),
+                               ("items", "Slides, images or JSON items handled")):
+            lines += [f"# HELP {prefix}_stage_{key}_total {help_text} per pipeline stage.", f"# TYPE {prefix}_stage_{key}_total counter"]
+            lines += [f'{prefix}_stage_{key}_total{{stage="{stage}"}} {s[key]}' for stage, s in sorted(snapshot.items())]
+        return "\n".join(lines) + "\n"
+
+    def to_jsonl(self, **fields):
+        # 每个阶段一行 JSON；fields (例如 command=...) 写进每一行
+        now = time.time()
+        return "".join(json.dumps(dict(fields, ts=round(now, 3), since=round(self.started, 3), stage=stage, **s), ensure_ascii=False) + "\n"
+                       for stage, s in sorted(self.snapshot().items()))
+
+class Span:
+    __slots__ = ("registry", "stage", "bytes_in", "bytes_out", "items", "_started")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self.bytes_in = self.bytes_out = self.items = 0
+
+    def add(self, bytes_in=0, bytes_out=0, items=0):
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.items += items
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 生成器提前关闭 (GeneratorExit) 不算出错
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        self.registry.record(self.stage, time.perf_counter() - self._started, self.bytes_in, self.bytes_out, self.items, error)
+
+class _NullSpan:
+    __slots__ = ()
+
+    def add(self, bytes_in=0, bytes_out=0, items=0): pass
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb): pass
+
+NULL_SPAN = _NullSpan()
+
+REGISTRY = MetricsRegistry()
+_enabled = os.environ.get("REMIX_METRICS", "") not in ("", "0")
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+def enabled():
+    return _enabled
+
+def span(stage):
+    # with span("zip_build") as m: ...; m.add(bytes_out=n, items=k)
+    return Span(REGISTRY, stage) if _enabled else NULL_SPAN
+
+def record(stage, seconds, bytes_in=0, bytes_out=0, items=0):
+    # 调用方自己累计好的耗时 (例如只在缓存未命中时才计时的循环)
+    if _enabled: REGISTRY.record(stage, seconds, bytes_in, bytes_out, items)
+
+def collect(fn, *args):
+    # 在子进程里运行 fn 并返回 (结果, 这次调用的指标)，主进程用 REGISTRY.merge 合并
+    enable()
+    REGISTRY.reset()
+    result = fn(*args)
+    return result, REGISTRY.snapshot()
@@ -0,0 +1,115 @@
+import collections
+import concurrent.futures
+import os
+import zipfile
+import zlib
+
+from . import metrics
+from .convert import default_item
+from .export import DatasetZipWriter
+from .ingest import MediaArchive, count_slides, iter_slides
+from .remix import REMIX_LIST_EN
+from .transcode import image_extension, normalize_image
+from .zipwriter import compress_type_for, make_zip_entry
+
+# ================= PARALLEL BATCH CONVERSION =================
+# 子进程负责解析 slide、读取并压缩图片；主进程按提交顺序收结果、分配 ID、写文件。
+# 所以 ID 分配和顺序转换完全一样 (start_id + 有效 slide 的累计数)，与子进程完成的先后无关。
+
+DeckResult = collections.namedtuple("DeckResult", "deck out_path first_id count input_bytes error")
+
+def prepare_slides(deck_path, start, stop, policy="auto", compresslevel=None, image_options=None):
+    # 在子进程里运行，返回 [(文字, 图片摘要, 压缩好的条目, 扩展名)]；条目的文件名由主进程按 ID 决定
+    # image_options: (格式, 质量, 最长边)，传给 normalize_image；None 时图片原样写成 .png
+    slides, entries = [], {}
+    with MediaArchive(deck_path) as archive:
+        for record in iter_slides(archive, start=start, stop=stop):
+            # 与 process_ppt_file 相同：每个 Slide 只取第一张图，没有嵌入图片数据的跳过
+            if record.image is None or record.image.name is None: continue
+            digest = record.image.digest
+            cached = entries.get(digest)
+            if cached is None:
+                blob, ext = bytes(record.image.blob), "png"
+                if image_options is not None:
+                    result = normalize_image(blob, *image_options)
+                    blob, ext = result.data, image_extension(result.format)
+                cached = entries[digest] = (make_zip_entry("", blob, compress_type_for(blob, policy), compresslevel), ext)
+            slides.append((record.text, digest) + cached)
+    return slides
+
+def plan_units(decks, chunk_slides):
+    # 大文件按 chunk_slides 切成几段；打不开的文件记下错误
+    units, errors = [], {}
+    for deck_index, deck in enumerate(decks):
+        try:
+            total = count_slides(deck)
+        except (OSError, ValueError) as e:
+            errors[deck_index] = str(e)
+            continue
+        ranges = [(start, min(start + chunk_slides, total)) for start in range(0, total, chunk_slides)] or [(0, 0)]
+        units += [(deck_index, start, stop, n == len(ranges) - 1) for n, (start, stop) in enumerate(ranges)]
+    return units, errors
+
+def convert_decks_parallel(decks, out_paths, start_id, pool=REMIX_LIST_EN, remix_count=3, seed=None, policy="auto",
+                           compresslevel=None, layout="copies", workers=None, max_in_flight=None, chunk_slides=200, image_options=None):
+    # 生成器：按输入顺序逐个返回 DeckResult。max_in_flight 限制同时提交 (含已完成但还没写入) 的段数，控制内存
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    units, errors = plan_units(decks, chunk_slides)
+    next_id = int(start_id)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        unit_iter = iter(units)
+        collect_metrics = metrics.enabled()
+
+        def fill():
+            while len(pending) < max_in_flight:
+                unit = next(unit_iter, None)
+                if unit is None: return
+                deck_index, start, stop, _ = unit
+                args = (prepare_slides, decks[deck_index], start, stop, policy, compresslevel, image_options)
+                # 打开指标时子进程把这一段的指标一起返回
+                future = executor.submit(metrics.collect, *args) if collect_metrics else executor.submit(*args)
+                pending.append((unit, future))
+
+        for deck_index, deck in enumerate(decks):
+            if deck_index in errors:
+                yield DeckResult(deck, None, next_id, 0, 0, errors[deck_index])
+                continue
+            out_path = out_paths[deck_index]
+            tmp_path = out_path + ".part"
+            first_id, count, error = next_id, 0, None
+            try:
+                # 与 convert_deck 一样记进 zip_build (子进程里的解析和压缩各自记在自己的阶段)
+                with metrics.span("zip_build") as m, open(tmp_path, "wb") as f:
+                    writer = DatasetZipWriter(f, layout, policy, compresslevel)
+                    while True:
+                        fill()
+                        (_, _, _, is_last), future = pending.popleft()
+                        try:
+                            slides = future.result()
+                            if collect_metrics:
+                                slides, snapshot = slides
+                                metrics.REGISTRY.merge(snapshot)
+                        except (OSError, ValueError, zipfile.BadZipFile, zlib.error) as e:
+                            # 这个文件出错后仍要收完它剩下的段，下一个文件从自己的第一段开始
+                            error = error or str(e)
+                            slides = []
+                        if error is None:
+                            for text, digest, entry, ext in slides:
+                                item_id = str(first_id + count)
+                                writer.add(default_item(item_id, text, pool, remix_count, seed), entry, digest, ext)
+                                count += 1
+                        if is_last: break
+                    if error is None and count:
+                        writer.close()
+                        m.add(writer.bytes_in, writer.offset, writer.entries)
+                if error is None and count:
+                    os.replace(tmp_path, out_path)
+                    next_id += count
+                else:
+                    count = 0
+            finally:
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+            yield DeckResult(deck, out_path if count else None, first_id, count, os.path.getsize(deck), error)
@@ -0,0 +1,103 @@
+import base64
+import collections
+import concurrent.futures
+import io
+import threading
+
+try:
+    from PIL import Image
+except ImportError: # 没有 Pillow 时直接显示原图
+    Image = None
+
+from . import metrics
+from .ingest import image_blob
+
+# ================= IMAGE PREVIEWS =================
+# 左侧面板只需要显示尺寸的缩略图：每张图片只缩放、编码一次，编码后的 data URI 按 LRU 缓存 (有内存上限)
+
+BROWSER_FORMATS = {"PNG", "JPEG", "GIF", "WEBP"}
+
+def make_preview(blob, max_side=1280, quality=85):
+    if Image is None: return "image/png", bytes(blob)
+    try:
+        img = Image.open(io.BytesIO(blob))
+        fmt = img.format
+        if max(img.size) <= max_side and fmt in BROWSER_FORMATS:
+            return Image.MIME[fmt], bytes(blob)
+        img.draft("RGB", (max_side, max_side)) # JPEG 可以在解码时直接缩小
+        img.thumbnail((max_side, max_side))
+        out = io.BytesIO()
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(out, "PNG", optimize=False)
+            return "image/png", out.getvalue()
+        img.convert("RGB").save(out, "JPEG", quality=quality)
+        return "image/jpeg", out.getvalue()
+    except Exception:
+        return "image/png", bytes(blob) # 无法解码的格式 (EMF 等) 原样交给浏览器
+
+def preview_data_uri(blob, max_side=1280, quality=85):
+    with metrics.span("preview_encode") as m:
+        mime, data = make_preview(blob, max_side, quality)
+        uri = f"data:{mime};base64,{base64.b64encode(data).decode()}"
+        m.add(len(blob), len(uri), 1)
+    return uri
+
+class PreviewCache:
+    def __init__(self, max_side=1280, quality=85, max_bytes=128 << 20):
+        self.max_side = max_side
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._uris = collections.OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, digest, uri):
+        with self._lock:
+            self._pending.pop(digest, None)
+            if digest in self._uris or len(uri) > self.max_bytes: return
+            self._uris[digest] = uri
+            self._bytes += len(uri)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._uris.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _render(self, digest, image):
+        try:
+            uri = preview_data_uri(image_blob(image), self.max_side, self.quality)
+        except Exception:
+            with self._lock: self._pending.pop(digest, None)
+            raise
+        self._store(digest, uri)
+        return uri
+
+    def get(self, digest, image):
+        with self._lock:
+            uri = self._uris.get(digest)
+            if uri is not None:
+                self._uris.move_to_end(digest)
+                self.hits += 1
+                return uri
+            self.misses += 1
+            pending = self._pending.get(digest)
+        if pending is not None:
+            # 后台预取已经在做这张图了，等它完成即可
+            try:
+                return pending.result()
+            except Exception:
+                pass
+        return self._render(digest, image)
+
+    def prefetch(self, items):
+        # items: [(digest, image)]，在后台线程里提前生成相邻 slide 的缩略图
+        for digest, image in items:
+            with self._lock:
+                if digest in self._uris or digest in self._pending: continue
+                self._pending[digest] = self._executor.submit(self._render, digest, image)
+
+    def stats(self):
+        with self._lock:
+            return {"previews": len(self._uris), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
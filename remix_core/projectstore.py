@@ -0,0 +1,267 @@
+import collections
+import collections.abc
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+from .deckcache import copy_upload, upload_digest
+from .ingest import MediaArchive, image_size, iter_slides
+
+# ================= PROJECT STORE =================
+# 编辑进度保存在 SQLite (WAL 模式，多个会话可以同时读写) 里，界面只保留当前 slide 的控件状态。
+# pptx 文件按内容摘要保存在 {目录}/decks/ 下，图片只记录 zip 成员名和摘要，用到时才从文件里读
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    deck_digest TEXT NOT NULL,
+    start_id INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slides (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    original_text TEXT NOT NULL,
+    image_member TEXT NOT NULL,
+    image_digest BLOB NOT NULL,
+    PRIMARY KEY (project_id, position)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS slides_item ON slides (project_id, item_id);
+CREATE TABLE IF NOT EXISTS results (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    item_id TEXT NOT NULL,
+    prompt TEXT,
+    remixes TEXT NOT NULL,
+    saved INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (project_id, item_id)
+);
+"""
+
+class _ThreadGuard:
+    # 放进 threading.local：线程结束时随之释放，触发 weakref.finalize 关掉这个线程的连接
+    pass
+
+class ProjectStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, "projects.db")
+        self._deck_dir = os.path.join(directory, "decks")
+        os.makedirs(self._deck_dir, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._archives = weakref.WeakValueDictionary()
+        # 正在创建的项目用到的 deck (还没写进数据库)，删除项目时不能把它们的文件删掉
+        self._creating = collections.Counter()
+        self._finalizers = set()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # 每个线程 (Streamlit 的每个会话) 一个连接，线程结束时关掉；close() 关掉所有线程的连接
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn, self._local.guard = conn, _ThreadGuard()
+            with self._lock:
+                self._finalizers = {f for f in self._finalizers if f.alive}
+                self._finalizers.add(weakref.finalize(self._local.guard, conn.close))
+        return conn
+
+    def close(self):
+        with self._lock:
+            finalizers, self._finalizers = self._finalizers, set()
+            archives = list(self._archives.values())
+            self._archives.clear()
+        for finalize in finalizers: finalize()
+        for archive in archives: archive.close()
+        self._local = threading.local()
+
+    def deck_path(self, digest):
+        return os.path.join(self._deck_dir, f"{digest}.pptx")
+
+    def _archive(self, digest):
+        with self._lock:
+            archive = self._archives.get(digest)
+            if archive is None: archive = self._archives[digest] = MediaArchive(self.deck_path(digest))
+            return archive
+
+    def _release_deck(self, digest):
+        # 没有项目 (也没有正在创建的项目) 再用到的 deck 文件删掉
+        with self._lock:
+            if self._creating[digest]: return
+            if self._conn().execute("SELECT 1 FROM projects WHERE deck_digest = ? LIMIT 1", (digest,)).fetchone(): return
+            archive = self._archives.pop(digest, None)
+            if archive is not None: archive.close()
+            path = self.deck_path(digest)
+            if os.path.exists(path): os.remove(path)
+
+    def create_project(self, uploaded_file, start_id, name="", deck_cache=None):
+        # 与 process_ppt_file 相同的规则：只保留有图片的 slide，ID 从 start_id 开始连续编号
+        digest = upload_digest(uploaded_file)
+        with self._lock: self._creating[digest] += 1
+        try:
+            return self._create_project(uploaded_file, digest, start_id, name, deck_cache)
+        finally:
+            with self._lock:
+                self._creating[digest] -= 1
+                if not self._creating[digest]: del self._creating[digest]
+            # 创建失败时删掉刚复制的文件 (成功时新项目已经引用它)
+            self._release_deck(digest)
+
+    def _create_project(self, uploaded_file, digest, start_id, name, deck_cache):
+        path = self.deck_path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.part"
+            try:
+                with open(tmp_path, "wb") as f:
+                    copy_upload(uploaded_file, f)
+            except BaseException:
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, path)
+        # 解析缓存直接读这里的文件，只缓存解析结果
+        records = deck_cache.slides(path, digest, path) if deck_cache else iter_slides(self._archive(digest))
+        rows, current_id = [], int(start_id)
+        for record in records:
+            if record.image is None or record.image.name is None: continue
+            rows.append((len(rows), str(current_id), record.text, record.image.name, record.image.digest))
+            current_id += 1
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            project_id = conn.execute(
+                "INSERT INTO projects (name, deck_digest, start_id, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (name, digest, int(start_id), now, now)).lastrowid
+            conn.executemany(
+                "INSERT INTO slides (project_id, position, item_id, original_text, image_member, image_digest) VALUES (?, ?, ?, ?, ?, ?)",
+                [(project_id,) + row for row in rows])
+        return project_id
+
+    def delete_project(self, project_id):
+        conn = self._conn()
+        row = conn.execute("SELECT deck_digest FROM projects WHERE id = ?", (project_id,)).fetchone()
+        with conn:
+            conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        if row is not None: self._release_deck(row[0])
+
+    def projects(self):
+        return [dict(row) for row in self._conn().execute(
+            "SELECT p.id, p.name, p.start_id, p.updated, "
+            "(SELECT COUNT(*) FROM slides s WHERE s.project_id = p.id) AS slides, "
+            "(SELECT COUNT(*) FROM results r WHERE r.project_id = p.id AND r.saved) AS saved "
+            "FROM projects p ORDER BY p.updated DESC")]
+
+    def project(self, project_id):
+        row = self._conn().execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return dict(row) if row else None
+
+    def slide_count(self, project_id):
+        return self._conn().execute("SELECT COUNT(*) FROM slides WHERE project_id = ?", (project_id,)).fetchone()[0]
+
+    def slide(self, project_id, position):
+        # 与 process_ppt_file 返回的条目格式相同
+        row = self._conn().execute(
+            "SELECT item_id, original_text FROM slides WHERE project_id = ? AND position = ?", (project_id, position)).fetchone()
+        if row is None: raise IndexError(position)
+        return {"id": row["item_id"], "original_prompt_text": row["original_text"], "image_filename": f"{row['item_id']}.png"}
+
+    def item_ids(self, project_id):
+        return [row[0] for row in self._conn().execute(
+            "SELECT item_id FROM slides WHERE project_id = ? ORDER BY position", (project_id,))]
+
+    def images(self, project_id):
+        return ProjectImages(self, project_id)
+
+    def card_state(self, project_id, item_id):
+        # 该 slide 已保存或草稿中的 prompt 和 remix 卡片；没有时返回 None
+        row = self._conn().execute(
+            "SELECT prompt, remixes, saved FROM results WHERE project_id = ? AND item_id = ?", (project_id, item_id)).fetchone()
+        if row is None: return None
+        return {"prompt": row["prompt"], "remixSuggestions": json.loads(row["remixes"]), "saved": bool(row["saved"])}
+
+    def save_draft(self, project_id, item_id, remixes):
+        # 第一次打开 slide 时抽到的卡片，已经有记录时不覆盖
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO results (project_id, item_id, prompt, remixes, saved, updated) VALUES (?, ?, NULL, ?, 0, ?) "
+                "ON CONFLICT (project_id, item_id) DO NOTHING",
+                (project_id, item_id, json.dumps(remixes, ensure_ascii=False), time.time()))
+
+    def save_result(self, project_id, item_id, prompt, remixes):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO results (project_id, item_id, prompt, remixes, saved, updated) VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (project_id, item_id) DO UPDATE SET prompt = excluded.prompt, remixes = excluded.remixes, "
+                "saved = 1, updated = excluded.updated",
+                (project_id, item_id, prompt, json.dumps(remixes, ensure_ascii=False), now))
+            conn.execute("UPDATE projects SET updated = ? WHERE id = ?", (now, project_id))
+
+    def first_unsaved(self, project_id):
+        # 继续编辑时从第一张还没保存的 slide 开始 (全部保存过时停在最后一张)
+        row = self._conn().execute(
+            "SELECT MIN(s.position), (SELECT MAX(position) FROM slides WHERE project_id = ?) FROM slides s "
+            "LEFT JOIN results r ON r.project_id = s.project_id AND r.item_id = s.item_id AND r.saved "
+            "WHERE s.project_id = ? AND r.item_id IS NULL", (project_id, project_id)).fetchone()
+        return row[0] if row[0] is not None else max(row[1] or 0, 0)
+
+    def saved_count(self, project_id):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM results WHERE project_id = ? AND saved", (project_id,)).fetchone()[0]
+
+    def processed(self, project_id):
+        # 已保存的结果，格式与编辑器里的 processed_results 相同 ({"453.json": {...}})
+        rows = self._conn().execute(
+            "SELECT r.item_id, r.prompt, r.remixes FROM results r JOIN slides s USING (project_id, item_id) "
+            "WHERE r.project_id = ? AND r.saved ORDER BY s.position", (project_id,))
+        return {f"{row['item_id']}.json": {"id": row["item_id"], "prompt": row["prompt"], "remixSuggestions": json.loads(row["remixes"])}
+                for row in rows}
+
+class ProjectImages(collections.abc.Mapping):
+    # 文件名 ("453.png") -> MediaRef，按需从数据库查；接口与 ImageStore 相同，可以直接交给 ExportBuilder
+    def __init__(self, store, project_id):
+        self._store = store
+        self._project_id = project_id
+        self._digest = store.project(project_id)["deck_digest"]
+
+    def _row(self, name):
+        item_id = name[:-4] if name.endswith(".png") else None
+        row = self._store._conn().execute(
+            "SELECT image_member, image_digest FROM slides WHERE project_id = ? AND item_id = ?", (self._project_id, item_id)).fetchone()
+        if row is None: raise KeyError(name)
+        return row
+
+    def digest_of(self, name):
+        return self._row(name)["image_digest"]
+
+    def __getitem__(self, name):
+        row = self._row(name)
+        return self._store._archive(self._digest).ref(row["image_member"], row["image_digest"])
+
+    def __iter__(self):
+        return (f"{item_id}.png" for item_id in self._store.item_ids(self._project_id))
+
+    def __len__(self):
+        return self._store.slide_count(self._project_id)
+
+    def stats(self):
+        archive = self._store._archive(self._digest)
+        rows = self._store._conn().execute(
+            "SELECT image_member, image_digest FROM slides WHERE project_id = ?", (self._project_id,)).fetchall()
+        sizes = {row["image_digest"]: image_size(archive.ref(row["image_member"])) for row in rows}
+        total = sum(sizes[row["image_digest"]] for row in rows)
+        stored = sum(sizes.values())
+        return {"images": len(rows), "unique": len(sizes), "bytes": total, "stored_bytes": stored, "saved_bytes": total - stored}
@@ -0,0 +1,105 @@
+import random
+import re
+
+# ================= REMIX PROMPTS =================
+
+REMIX_LIST_EN = [
+    {"label": "Want a wider view?", "prompt": "Create an expanded image with extended space."},
+    {"label": "Want to zoom in?", "prompt": "Create a micro-detail close-up variant of this image."},
+    {"label": "Try paper cut style?", "prompt": "Remake this image in a modern paper cut style with layered colors and soft shadows."},
+    {"label": "Make this embroidery style?", "prompt": "Remake this image in a textile embroidery style with visible stitched threads."},
+    {"label": "Change to Pixel Art", "prompt": "Create this picture as a retro pixel art, with nostalgic detail and game shading."},
+    {"label": "Apply Glitch Effect", "prompt": "Remake this image as a glitch digital art, with pixel splits and cyberpunk noise."},
+    {"label": "Change to Watercolor", "prompt": "Create this picture as a watercolor painting."},
+    {"label": "Change to Impressionism", "prompt": "Create this picture as an Impressionist painting, with loose brushwork, luminous color, and fleeting light."},
+    {"label": "Draw with colored pencil?", "prompt": "Remake this image as a colored pencil drawing."},
+    {"label": "Try fine-line style?", "prompt": "Remake this image as a Chinese Gongbi painting with precise outlines, soft washes, and detailed forms."},
+    {"label": "Try Chinese paper cut style?", "prompt": "Remake this image as a Chinese paper cut, with red silhouettes, cultural motifs, and symmetrical patterns."},
+    {"label": "Try Ukiyo-e style?", "prompt": "Remake this image as a Japanese Ukiyo-e, with woodblock texture, flat colors, and flowing lines."},
+    {"label": "Make this a portrait?", "prompt": "Remake this image as a photo portrait, with natural light, and shallow depth."},
+    {"label": "Make this stained glass?", "prompt": "Remake this image as a stained glass design with colorful panes, bold outlines, and glowing light."},
+    {"label": "Try silkscreen style?", "prompt": "Remake this image as a silkscreen print."},
+    {"label": "Make this anime?", "prompt": "Remake this image as an anime illustration with expressive light and a dynamic layout."},
+    {"label": "Add sepia tone?", "prompt": "Remake this image as a sepia-toned memory with aged paper texture."},
+    {"label": "Make this pop art?", "prompt": "Remake this image as a high-saturation pop art, with bold blocks and hues."},
+    {"label": "Make this a gradient mesh?", "prompt": "Remake this image as a gradient mesh, blending colors seamlessly across the composition."},
+    {"label": "Make this a 3D figure?", "prompt": "Remake this image as a photorealistic 3D render of a collectible figure, made of real materials like resin or plastic with cinematic lighting, studio backdrop, and ultra-fine modeling detail."},
+    {"label": "Try duotone colors?", "prompt": "Remake this image as a duotone image."},
+    {"label": "Make this monochrome?", "prompt": "Remake this image as a monochrome image."},
+    {"label": "Add neon lighting?", "prompt": "Remake this image as a neon-lit scene with vibrant color contrasts."},
+    {"label": "Make this mechanical?", "prompt": "Create a mechanical version of the subject with exposed gears, metallic joints, and precise components."},
+    {"label": "Make this crystal?", "prompt": "Remake this image to be in an iridescent fantasy realm with the subject as translucent glass or crystal, glowing and refracted."}
+]
+
+COPILOT_GEN_INSTRUCTION = """A remix prompt consists of a short, 2–5-word title and an instruction.
+Please write 5 remix prompts for me based on the uploaded image.
+Format:
+Label: [Title]
+Prompt: [Instruction]"""
+
+def get_random_remix(rng=random, pool=REMIX_LIST_EN): return rng.choice(pool)
+
+# ================= BULK REMIX TEXT =================
+# 单次扫描的状态机：每行只清理、判断一次，只需要往后看一行
+
+ACTION_KEYWORDS = ("create", "change", "recreate", "replace", "generate", "make", "transform", "add", "switch", "use", "apply", "convert", "turn")
+_LINE_START = re.compile(r'^[\d\.\-\*\s]+')
+
+def clean_line_start(s): return _LINE_START.sub('', s, 1).strip()
+
+def _is_action(clean_text): return clean_text.lower().startswith(ACTION_KEYWORDS)
+
+def iter_bulk_remix_items(lines):
+    # lines: 任意行的可迭代对象 (可以是打开的文件)，逐条产出 {"label", "prompt"}
+    # 规则与原来逐行回溯的实现完全一致：
+    #   以动作词开头的行是 prompt，标题取前面最近的、还没被用掉的非空行；
+    #   "标题: 动作词..." 是单行的条目；
+    #   之后的行接在 prompt 后面，直到遇到动作词开头的行或它的前一行 (空行跳过)。
+    #   续行本身也可以是单行条目，这时后面的续行会同时接到几个条目上，所以续行共用一个列表
+    titles = []        # 还没被用掉的非空行 (清理后的文字)，栈顶是最近的一行
+    open_items = []    # [标题, prompt, 从 tail 的哪个位置开始接]
+    tail = []
+
+    def close():
+        for title, prompt_text, start in open_items:
+            yield {"label": title, "prompt": prompt_text + "".join(tail[start:])}
+        open_items.clear()
+        tail.clear()
+
+    def step(line, clean_current, next_clean):
+        stripped = line.strip()
+        is_prompt_start = _is_action(clean_current)
+        used = False
+        if open_items and stripped:
+            if is_prompt_start or (next_clean is not None and _is_action(next_clean)):
+                yield from close()
+            else:
+                tail.append(" " + stripped)
+                used = True
+        inline_split = line.split(":", 1)
+        inline_prompt = clean_line_start(inline_split[1]) if len(inline_split) > 1 else ""
+        if _is_action(inline_prompt):
+            open_items.append([clean_line_start(inline_split[0]), inline_prompt, len(tail)])
+            used = True
+        elif is_prompt_start:
+            open_items.append([titles.pop() if titles else "Remix Option", clean_current, len(tail)])
+            used = True
+        if stripped and not used: titles.append(clean_current)
+
+    pending = None
+    for line in lines:
+        if line.endswith("\n"): line = line[:-1]
+        clean_next = clean_line_start(line)
+        if pending is not None: yield from step(*pending, clean_next)
+        pending = (line, clean_next)
+    if pending is not None: yield from step(*pending, None)
+    yield from close()
+
+def parse_bulk_remix_text(raw_text):
+    if not raw_text.strip(): return []
+    return list(iter_bulk_remix_items(raw_text.split('\n')))
+
+def default_main_prompt(original_text):
+    if not original_text.strip().lower().startswith("create"):
+        return "Create an image of " + original_text
+    return original_text
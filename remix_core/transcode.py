@@ -0,0 +1,173 @@
+import collections
+import concurrent.futures
+import io
+import os
+import threading
+import time
+
+try:
+    from PIL import Image
+except ImportError: # 没有 Pillow 时只识别格式、改正扩展名，不转码
+    Image = None
+
+from . import metrics
+from .ingest import image_blob
+from .zipwriter import detect_image_format
+
+# ================= IMAGE NORMALIZATION =================
+# 导出前的图片处理：按文件头识别真实格式 (扩展名跟着格式走)，可选转成统一格式并缩小到 max_side 以内。
+# 在线程池或进程池里并行处理，结果按图片摘要缓存 (有内存上限)
+
+NORMALIZE_FORMATS = ("keep", "png", "jpeg", "webp")
+
+IMAGE_EXTENSIONS = {"png": "png", "jpeg": "jpg", "gif": "gif", "bmp": "bmp", "tiff": "tif", "webp": "webp", "emf": "emf", "wmf": "wmf"}
+
+# Pillow 能写出的格式 (EMF/WMF 之类只能原样保留)
+PIL_FORMATS = {"png": "PNG", "jpeg": "JPEG", "gif": "GIF", "bmp": "BMP", "tiff": "TIFF", "webp": "WEBP"}
+
+# status: "unchanged" 原样保留，"transcoded" 转码或缩小过，"failed" 需要处理但解码/编码失败 (保留原图)
+NormalizedImage = collections.namedtuple("NormalizedImage", "data format status bytes_in seconds")
+
+def image_extension(fmt):
+    return IMAGE_EXTENSIONS.get(fmt, "bin")
+
+def _encode(img, fmt, quality):
+    out = io.BytesIO()
+    if fmt == "jpeg":
+        if img.mode in ("RGBA", "LA", "P"):
+            # JPEG 没有透明通道，透明部分铺白底
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        img.convert("RGB").save(out, "JPEG", quality=quality, optimize=True)
+    elif fmt == "webp":
+        img.save(out, "WEBP", quality=quality, method=4)
+    elif fmt == "gif":
+        img.save(out, "GIF")
+    elif fmt == "bmp" or fmt == "tiff":
+        img.save(out, PIL_FORMATS[fmt])
+    else:
+        if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA", "I", "I;16"): img = img.convert("RGBA")
+        img.save(out, "PNG", optimize=False)
+    return out.getvalue()
+
+def normalize_image(blob, fmt="keep", quality=90, max_side=None):
+    # 返回 NormalizedImage；格式已经符合、尺寸也不超过 max_side 的图片原样返回
+    started = time.perf_counter()
+    source = detect_image_format(blob)
+    data, result, status = blob, source, "unchanged"
+    want = source if fmt == "keep" else fmt
+    if Image is None and want != source:
+        status = "failed"
+    elif Image is not None and (want != source or max_side):
+        try:
+            img = Image.open(io.BytesIO(blob))
+            source = source or (img.format or "").lower() or None
+            want = source if fmt == "keep" else fmt
+            too_big = bool(max_side) and max(img.size) > max_side
+            if (want != source or too_big) and want in PIL_FORMATS:
+                if too_big:
+                    img.draft("RGB" if want == "jpeg" else None, (max_side, max_side)) # JPEG 可以在解码时直接缩小
+                    img.thumbnail((max_side, max_side), Image.LANCZOS)
+                data, result, status = _encode(img, want, quality), want, "transcoded"
+            elif want != source or too_big:
+                status = "failed"
+        except Exception:
+            status = "failed" # 无法解码的格式 (EMF 等) 保留原图
+        result = source if status == "failed" else result
+    seconds = time.perf_counter() - started
+    metrics.record("image_normalize", seconds, len(blob), len(data), 1)
+    return NormalizedImage(bytes(data), result, status, len(blob), seconds)
+
+def _normalize_job(image, fmt, quality, max_side):
+    return normalize_image(image_blob(image), fmt, quality, max_side)
+
+class ImageNormalizer:
+    # fmt: "keep" (只改正扩展名，需要时按原格式缩小) 或目标格式；max_side: 最长边上限 (None 不缩放)
+    # processes=True 用进程池 (图片先在主进程里读出来再交给子进程)，默认线程池 (Pillow 编解码时会释放 GIL)
+    def __init__(self, fmt="keep", quality=90, max_side=None, workers=None, processes=False, cache_bytes=256 << 20):
+        if fmt not in NORMALIZE_FORMATS: raise ValueError(f"Unknown image format: {fmt}")
+        self.fmt = fmt
+        self.quality = int(quality)
+        self.max_side = int(max_side) if max_side else None
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.processes = processes
+        self.cache_bytes = cache_bytes
+        self.key = (fmt, self.quality, self.max_side)
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._bytes = 0
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="normalize")
+            return self._executor
+
+    def _lookup(self, digest):
+        with self._lock:
+            result = self._cache.get(digest)
+            if result is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(digest)
+            self.hits += 1
+            return result
+
+    def _store(self, digest, result):
+        with self._lock:
+            if digest in self._cache or len(result.data) > self.cache_bytes: return
+            self._cache[digest] = result
+            self._bytes += len(result.data)
+            while self._bytes > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._bytes -= len(evicted.data)
+
+    def _submit(self, image):
+        if self.processes: image = bytes(image_blob(image))
+        return self._pool().submit(_normalize_job, image, self.fmt, self.quality, self.max_side)
+
+    def normalize(self, digest, image):
+        result = self._lookup(digest)
+        if result is None:
+            result = _normalize_job(image, self.fmt, self.quality, self.max_side)
+            self._store(digest, result)
+        return result
+
+    def iter_normalized(self, items, lookahead=None):
+        # items: [(digest, image)]，按输入顺序返回 (digest, NormalizedImage, 是否来自缓存)；
+        # 同时在池里处理的图片不超过 lookahead 张 (默认 2 x workers)，内存只和这几张图有关
+        lookahead = max(1, lookahead or 2 * self.workers)
+        pending = collections.deque()
+        items = iter(items)
+        while True:
+            while len(pending) < lookahead:
+                item = next(items, None)
+                if item is None: break
+                digest, image = item
+                result = self._lookup(digest)
+                pending.append((digest, result, None if result is not None else self._submit(image)))
+            if not pending: return
+            digest, result, future = pending.popleft()
+            if future is not None:
+                result = future.result()
+                self._store(digest, result)
+                # 子进程里记录的指标不会回到主进程，在这里补上
+                if self.processes: metrics.record("image_normalize", result.seconds, result.bytes_in, len(result.data), 1)
+            yield digest, result, future is None
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._cache), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None: executor.shutdown()
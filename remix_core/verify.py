@@ -0,0 +1,209 @@
+import asyncio
+import collections
+import hashlib
+import http.client
+import http.server
+import queue
+import struct
+import threading
+import urllib.parse
+import zlib
+
+from .diskcache import DiskLRU
+
+# ================= VERIFY PREVIEWS =================
+# "Verify" 用文生图服务把 remix prompt 画出来看看效果。
+# backend 只需要提供 fetch(request) -> 图片 bytes (阻塞调用，出错时抛 OSError / ValueError)；
+# Verifier 负责磁盘缓存和并发请求。
+
+POLLINATIONS_URL = "https://image.pollinations.ai/prompt/"
+
+VerifyRequest = collections.namedtuple("VerifyRequest", "prompt seed width height")
+
+def verify_request(prompt, seed, width=400, height=400):
+    return VerifyRequest(prompt, int(seed), int(width), int(height))
+
+def request_key(request):
+    raw = f"{request.prompt}\0{request.seed}\0{request.width}x{request.height}".encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+class HttpBackend:
+    # GET {base_url}{prompt}?seed=..&width=..&height=..；同一个 host 的 keep-alive 连接放在连接池里复用，
+    # 同时打开的连接数不超过 max_connections
+    def __init__(self, base_url=POLLINATIONS_URL, max_connections=8, timeout=60, max_redirects=3):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle = collections.defaultdict(queue.LifoQueue)
+
+    def url(self, request):
+        query = urllib.parse.urlencode({"seed": request.seed, "width": request.width, "height": request.height, "nologo": "true"})
+        return f"{self.base_url}{urllib.parse.quote(request.prompt, safe='')}?{query}"
+
+    def _connect(self, parts):
+        cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        return cls(parts.netloc, timeout=self.timeout)
+
+    def _get(self, url):
+        parts = urllib.parse.urlsplit(url)
+        host = (parts.scheme, parts.netloc)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        for attempt in range(2):
+            try:
+                conn, reused = (self._idle[host].get_nowait(), True) if attempt == 0 else (self._connect(parts), False)
+            except queue.Empty:
+                conn, reused = self._connect(parts), False
+            try:
+                conn.request("GET", path, headers={"User-Agent": "remix-studio"})
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # 连接池里的空闲连接可能已经被服务器关掉了，换一个新连接重试一次
+                if reused: continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if response.will_close: conn.close()
+            else: self._idle[host].put(conn)
+            return response, body
+
+    def fetch(self, request):
+        url = self.url(request)
+        with self._slots:
+            for _ in range(self.max_redirects + 1):
+                response, body = self._get(url)
+                if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                    url = urllib.parse.urljoin(url, response.getheader("Location"))
+                    continue
+                if response.status != 200: raise OSError(f"Verify service returned HTTP {response.status}")
+                if not response.getheader("Content-Type", "").startswith("image/"):
+                    raise ValueError(f"Verify service returned {response.getheader('Content-Type')!r}, not an image")
+                return body
+        raise OSError("Too many redirects from verify service")
+
+class VerifyCache:
+    # 磁盘缓存，按最近使用淘汰 (见 DiskLRU)
+    def __init__(self, directory, max_bytes=256 << 20):
+        self._files = DiskLRU(directory, max_bytes)
+
+    def get(self, request):
+        path = self._files.lookup(request_key(request))
+        if path is None: return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, request, data):
+        self._files.write(request_key(request), lambda f: f.write(data))
+
+    def stats(self):
+        return self._files.stats()
+
+class Verifier:
+    def __init__(self, backend, cache=None, concurrency=8):
+        self.backend = backend
+        self.cache = cache
+        self.concurrency = concurrency
+
+    def cached(self, request):
+        return self.cache.get(request) if self.cache else None
+
+    def get(self, request, fresh=False):
+        # fresh: 不读缓存，重新请求 (结果仍然写进缓存)
+        data = None if fresh else self.cached(request)
+        if data is None:
+            data = self.backend.fetch(request)
+            if self.cache: self.cache.put(request, data)
+        return data
+
+    async def _verify_all(self, requests, on_done):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = {}
+
+        async def one(request):
+            async with semaphore:
+                try:
+                    results[request] = await asyncio.to_thread(self.get, request)
+                except (OSError, ValueError) as e:
+                    results[request] = e
+            if on_done: on_done(request, results[request])
+
+        await asyncio.gather(*(one(r) for r in dict.fromkeys(requests)))
+        return results
+
+    def verify_all(self, requests, on_done=None):
+        # 并发请求一批预览，返回 {request: 图片 bytes 或异常}；on_done(request, result) 在每个请求完成时调用
+        return asyncio.run(self._verify_all(requests, on_done))
+
+# ================= LOCAL STAND-IN SERVICE =================
+# 本地替身服务：按 prompt/seed 生成纯色 PNG，接口与 pollinations 相同，开发和压测时不用访问外网
+
+def stand_in_png(prompt, seed, width, height):
+    color = hashlib.blake2b(f"{prompt}\0{seed}".encode("utf-8", "surrogatepass"), digest_size=3).digest()
+    raw = (b"\x00" + color * width) * height
+    def chunk(tag, data): return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+class StandInServer:
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parts = urllib.parse.urlsplit(self.path)
+                prompt = urllib.parse.unquote(parts.path.rsplit("/", 1)[-1])
+                query = urllib.parse.parse_qs(parts.query)
+                try:
+                    seed = int(query.get("seed", ["0"])[0])
+                    width = min(2048, int(query.get("width", ["400"])[0]))
+                    height = min(2048, int(query.get("height", ["400"])[0]))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                with server._lock: server.requests += 1
+                if server.delay: threading.Event().wait(server.delay)
+                body = stand_in_png(prompt, seed, width, height)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass
+
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/prompt/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="verify-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self): return self.start()
+
+    def __exit__(self, *exc): self.stop()
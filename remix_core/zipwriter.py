@@ -0,0 +1,199 @@
+import collections
+import os
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+
+# ================= ZIP HELPERS =================
+# 条目在写入前就已经压缩好 (crc/大小已知)，所以缓存下来的条目可以原样写进新的压缩包，不用重新压缩
+
+ZipEntry = collections.namedtuple("ZipEntry", "name compress_type crc size payload date_time")
+
+ZIP64_LIMIT = 0xFFFFFFFF
+
+def make_zip_entry(name, data, compress_type=zipfile.ZIP_DEFLATED, compresslevel=None, date_time=None):
+    if isinstance(data, str): data = data.encode("utf-8")
+    crc = zlib.crc32(data)
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(-1 if compresslevel is None else compresslevel, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        payload = data
+    return ZipEntry(name, compress_type, crc, len(data), payload, date_time or time.localtime()[:6])
+
+# 按文件头识别图片格式；已经压缩过的格式再 deflate 基本没有收益，只浪费 CPU
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"\xd7\xcd\xc6\x9a", "wmf"),
+)
+COMPRESSED_IMAGE_FORMATS = {"png", "jpeg", "gif", "webp"}
+COMPRESSION_POLICIES = ("auto", "deflate", "store")
+
+def detect_image_format(blob):
+    head = bytes(blob[:44])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP": return "webp"
+    if head[:4] == b"\x01\x00\x00\x00" and head[40:44] == b" EMF": return "emf"
+    for signature, fmt in IMAGE_SIGNATURES:
+        if head.startswith(signature): return fmt
+    return None
+
+def compress_type_for(data, policy="auto"):
+    if policy not in COMPRESSION_POLICIES: raise ValueError(f"Unknown compression policy: {policy}")
+    if policy == "store": return zipfile.ZIP_STORED
+    if policy == "auto" and detect_image_format(data) in COMPRESSED_IMAGE_FORMATS: return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def _dos_datetime(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+class ZipStreamWriter:
+    # 只需要 fp.write()，不需要 seek，所以也可以写到不可回退的流里
+    # offset: fp 当前位置在压缩包里的偏移 (接在已有条目后面追加时用)
+    def __init__(self, fp, offset=0):
+        self.fp = fp
+        self.offset = offset
+        self._central = []
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.offset += len(data)
+
+    def _write_header(self, entry, csize):
+        name = entry.name.encode("utf-8")
+        flags = 0 if name.isascii() else 0x800
+        dostime, dosdate = _dos_datetime(entry.date_time)
+        usize = entry.size
+        zip64 = csize >= ZIP64_LIMIT or usize >= ZIP64_LIMIT
+        extra = struct.pack("<HHQQ", 1, 16, usize, csize) if zip64 else b""
+        header = struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, 45 if zip64 else 20, flags, entry.compress_type, dostime, dosdate,
+            entry.crc, ZIP64_LIMIT if zip64 else csize, ZIP64_LIMIT if zip64 else usize, len(name), len(extra))
+        # 中央目录只记元数据，不保留条目内容
+        self._central.append((name, flags, entry.compress_type, entry.crc, dostime, dosdate, csize, usize, self.offset))
+        self._write(header + name + extra)
+
+    def keep_member(self, info):
+        # 已经在文件里 (offset 之前) 的条目 (zipfile.ZipInfo)，只登记到中央目录，不重新写
+        dostime, dosdate = _dos_datetime(info.date_time)
+        self._central.append((info.filename.encode("utf-8"), info.flag_bits, info.compress_type, info.CRC, dostime, dosdate,
+                              info.compress_size, info.file_size, info.header_offset))
+
+    def write_entry(self, entry):
+        self._write_header(entry, len(entry.payload))
+        self._write(entry.payload)
+
+    def write_chunks(self, entry, csize, chunks):
+        # 压缩好的数据分块写入 (例如从别的压缩包原样拷贝的条目)：csize 是压缩后的总长度，entry.payload 不用
+        self._write_header(entry, csize)
+        written = 0
+        for chunk in chunks:
+            self._write(chunk)
+            written += len(chunk)
+        if written != csize: raise ValueError(f"{entry.name}: wrote {written} bytes, expected {csize}")
+
+    def close(self):
+        cd_start = self.offset
+        for name, flags, compress_type, crc, dostime, dosdate, csize, usize, offset in self._central:
+            fields = [v for v in (usize, csize, offset) if v >= ZIP64_LIMIT]
+            extra = struct.pack("<HH%dQ" % len(fields), 1, 8 * len(fields), *fields) if fields else b""
+            self._write(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014b50, (3 << 8) | 45, 45 if fields else 20, flags, compress_type,
+                dostime, dosdate, crc, min(csize, ZIP64_LIMIT), min(usize, ZIP64_LIMIT), len(name), len(extra),
+                0, 0, 0, 0o600 << 16, min(offset, ZIP64_LIMIT)) + name + extra)
+        cd_size = self.offset - cd_start
+        count = len(self._central)
+        if count > 0xFFFF or cd_start >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            eocd64 = self.offset
+            self._write(struct.pack("<IQHHIIQQQQ", 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_start))
+            self._write(struct.pack("<IIQI", 0x07064b50, 0, eocd64, 1))
+        self._write(struct.pack(
+            "<IHHHHIIH", 0x06054b50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(cd_size, ZIP64_LIMIT), min(cd_start, ZIP64_LIMIT), 0))
+
+# ================= RAW COPY =================
+# 合并压缩包时条目按压缩后的原始数据拷贝，不解压也不重新压缩；内存只和 chunk_size 有关
+
+COPY_CHUNK_SIZE = 1 << 20
+
+def iter_raw_member(fp, info, chunk_size=COPY_CHUNK_SIZE):
+    # info: zipfile.ZipInfo；每次读之前都先 seek，和同一个文件上打开的 ZipFile.open() 交替读取也没问题
+    if info.flag_bits & 0x1: raise ValueError(f"{info.filename}: encrypted entries are not supported")
+    fp.seek(info.header_offset)
+    header = fp.read(30)
+    if len(header) < 30 or header[:4] != b"PK\x03\x04": raise zipfile.BadZipFile(f"{info.filename}: bad local file header")
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    position, remaining = info.header_offset + 30 + name_len + extra_len, info.compress_size
+    while remaining:
+        fp.seek(position)
+        chunk = fp.read(min(chunk_size, remaining))
+        if not chunk: raise zipfile.BadZipFile(f"{info.filename}: truncated entry")
+        position += len(chunk)
+        remaining -= len(chunk)
+        yield chunk
+
+def compress_file(src, dst, compress_type=zipfile.ZIP_DEFLATED, compresslevel=None, chunk_size=COPY_CHUNK_SIZE):
+    # 从 src 的当前位置读到结尾，压缩后写进 dst；返回 (crc, 原始大小, 压缩后大小)
+    compressor = None
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(-1 if compresslevel is None else compresslevel, zlib.DEFLATED, -15)
+    crc = size = csize = 0
+    while True:
+        data = src.read(chunk_size)
+        if not data: break
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+        out = compressor.compress(data) if compressor else data
+        dst.write(out)
+        csize += len(out)
+    if compressor:
+        out = compressor.flush()
+        dst.write(out)
+        csize += len(out)
+    return crc, size, csize
+
+def write_spooled(writer, name, spool, compress_type=zipfile.ZIP_DEFLATED, compresslevel=None, spool_dir=None):
+    # 把临时文件 spool 的全部内容压缩成一个条目写进 writer (先压缩进另一个临时文件，才知道压缩后的大小)
+    spool.seek(0)
+    with spool_file(spool_dir) as packed:
+        crc, size, csize = compress_file(spool, packed, compress_type, compresslevel)
+        packed.seek(0)
+        writer.write_chunks(ZipEntry(name, compress_type, crc, size, None, time.localtime()[:6]), csize, iter_file_chunks(packed))
+
+def iter_file_chunks(fp, chunk_size=COPY_CHUNK_SIZE):
+    while True:
+        data = fp.read(chunk_size)
+        if not data: return
+        yield data
+
+class ChunkSink:
+    # 把 ZipStreamWriter 的输出收集成块，供生成器逐块交出去
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(data)
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+def spool_file(spool_dir=None):
+    return tempfile.TemporaryFile(dir=spool_dir)
+
+def as_reader(spool):
+    # 返回从头读取的只读文件对象 (io.BufferedReader，st.download_button 可以直接接收)
+    spool.flush()
+    reader = open(os.dup(spool.fileno()), "rb")
+    spool.close()
+    # dup 出来的描述符和原文件共享读写位置
+    reader.seek(0)
+    return reader
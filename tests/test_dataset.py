@@ -0,0 +1,88 @@
+import io
+import json
+
+import pytest
+
+from remix_core.dataset import iter_json_items, iter_renumbered_json, renumber_json_file, renumber_json_ids
+
+ITEMS = [
+    {"id": "7", "prompt": "Ünïcode “quotes” and \\n escapes\nnew line", "remixSuggestions": [{"label": "a", "prompt": "b"}]},
+    {"id": "3", "prompt": "emoji 😀 and tab\t", "remixSuggestions": [], "score": 1.5e-10, "flags": [True, False, None]},
+    {"prompt": "no id"},
+    {"id": 12, "prompt": "", "remixSuggestions": [{"label": "x" * 40, "prompt": "y" * 300}]},
+]
+
+def expected(items, start, first=1, last=None):
+    items = json.loads(json.dumps(items))
+    counter = start
+    for n, item in enumerate(items, 1):
+        if first <= n <= (last or len(items)) and "id" in item:
+            item["id"] = str(counter)
+            counter += 1
+    return json.dumps(items, indent=4, ensure_ascii=False)
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 1 << 20])
+def test_renumber_matches_json_dumps(chunk_size):
+    # 很小的块让每个值 (包括数字和转义) 都会在缓冲区末尾被截断一次
+    source = json.dumps(ITEMS, ensure_ascii=False).encode("utf-8")
+    result = "".join(iter_renumbered_json(io.BytesIO(source), 1001, chunk_size=chunk_size))
+    assert result == expected(ITEMS, 1001)
+    assert list(iter_json_items(io.BytesIO(source), chunk_size)) == ITEMS
+
+def test_renumber_file_is_byte_identical():
+    out = io.BytesIO()
+    stats, error = renumber_json_file(io.BytesIO(json.dumps(ITEMS).encode("utf-16")), out, 5)
+    assert error is None and stats == {"items": 4, "renumbered": 3}
+    assert out.getvalue() == expected(ITEMS, 5).encode("utf-8")
+
+def test_renumber_range():
+    result, error = renumber_json_ids(io.BytesIO(json.dumps(ITEMS).encode()), 500, 2, 3)
+    assert error is None and result == expected(ITEMS, 500, 2, 3)
+    assert json.loads(result)[0]["id"] == "7" and json.loads(result)[1]["id"] == "500" and json.loads(result)[3]["id"] == 12
+
+@pytest.mark.parametrize("first, last, message", [
+    (3, 2, "is empty"),
+    (0, 2, "start at 1"),
+    (5, None, "out of range"),
+    (2, 9, "out of range"),
+])
+def test_renumber_bad_range(first, last, message):
+    result, error = renumber_json_ids(io.BytesIO(json.dumps(ITEMS).encode()), 1, first, last)
+    assert result is None and message in error
+
+@pytest.mark.parametrize("source, message", [
+    ('{"id": 1}', "root must be a list"),
+    ("", "root must be a list"),
+    ('[{"id": 1}, {"id": 2', "Expecting"),
+    ('[{"id": 1}, {"id": 2}', "Expecting ',' delimiter"),
+    ('[{"id": 1}] []', "Extra data"),
+])
+def test_renumber_invalid_json(source, message):
+    result, error = renumber_json_ids(io.BytesIO(source.encode()), 1)
+    assert result is None and message in error
+
+class CountingReader(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+def test_syntax_error_does_not_read_whole_file():
+    # 开头就有语法错误的大文件：报错前只读了一两块，不会把整个文件读进来
+    source = CountingReader(b'[{"id": 1} {"id": 2}, ' + b'{"id": 3, "prompt": "padding"}, ' * 200000 + b"]")
+    with pytest.raises(ValueError, match="Expecting ','"):
+        list(iter_json_items(source, chunk_size=1024))
+    assert source.bytes_read <= 4096
+    source = CountingReader(b'[{"id": 1, "x": nope}, ' + b'{"id": 3}, ' * 200000 + b"]")
+    with pytest.raises(ValueError, match="Expecting value"):
+        list(iter_json_items(source, chunk_size=1024))
+    assert source.bytes_read <= 4096
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_top_level_numbers_split_across_chunks(chunk_size):
+    source = b"[1.5e-10, -2.25, 100, true, null]"
+    assert list(iter_json_items(io.BytesIO(source), chunk_size)) == [1.5e-10, -2.25, 100, True, None]
@@ -0,0 +1,55 @@
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import synthetic  # noqa: E402
+from remix_core import DeckCache, iter_slides, process_ppt_file, upload_digest  # noqa: E402
+
+def write_deck(path, seed=1):
+    synthetic.write_deck(str(path), synthetic.deck_spec(slides=5, picture_ratio=0.8, image_kb=4, seed=seed))
+    return str(path)
+
+def summary(records):
+    return [(r.text, r.image and r.image.name, r.image and r.image.name and r.image.digest) for r in records]
+
+def test_hit_and_miss(tmp_path):
+    deck = write_deck(tmp_path / "deck.pptx")
+    cache = DeckCache(str(tmp_path / "cache"))
+    expected = summary(iter_slides(deck))
+    assert summary(cache.slides(deck)) == expected
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 0
+    # 同样的内容 (换成上传的 BytesIO) 命中；start_id 不同也一样
+    with open(deck, "rb") as f:
+        upload = io.BytesIO(f.read())
+    assert summary(cache.slides(upload)) == expected
+    assert cache.stats()["hits"] == 1
+    data, images = process_ppt_file(upload, 900, deck_cache=cache)
+    assert data[0]["id"] == "900" and cache.stats()["hits"] == 2
+    assert bytes(images["900.png"].blob)
+    # 内容不同就是另一个条目
+    other = write_deck(tmp_path / "other.pptx", seed=2)
+    assert upload_digest(other) != upload_digest(deck)
+    assert summary(cache.slides(other)) == summary(iter_slides(other))
+    assert cache.stats()["misses"] == 2 and cache.stats()["files"] == 4
+
+def test_corrupt_index_is_a_miss(tmp_path):
+    deck = write_deck(tmp_path / "deck.pptx")
+    cache_dir = tmp_path / "cache"
+    cache = DeckCache(str(cache_dir))
+    expected = summary(cache.slides(deck))
+    index = next(os.path.join(root, name) for root, _, names in os.walk(cache_dir) for name in names if name.endswith(".json"))
+    with open(index, "w") as f:
+        f.write("{broken")
+    assert summary(cache.slides(deck)) == expected
+    assert cache.stats()["misses"] == 2
+    assert summary(cache.slides(deck)) == expected and cache.stats()["hits"] == 1
+
+def test_caller_deck_path_is_not_copied(tmp_path):
+    deck = write_deck(tmp_path / "deck.pptx")
+    cache = DeckCache(str(tmp_path / "cache"))
+    digest = upload_digest(deck)
+    expected = summary(cache.slides(deck, digest, deck))
+    assert cache.stats()["files"] == 1 # 只有解析结果 (.json)
+    assert summary(cache.slides(deck, digest, deck)) == expected and cache.stats()["hits"] == 1
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+from remix_core import DuplicateIndex, OverlayIndex, add_builtin_prompts, check_item, describe_key
+from remix_core.dedupe import lsh_bands
+from remix_core.remix import REMIX_LIST_EN
+
+PROMPT = "A watercolor painting of a lighthouse on a rocky cliff at sunset, seagulls circling above the crashing waves"
+NEAR = "A watercolor painting of a lighthouse on a rocky cliff at sunrise, seagulls circling above the crashing waves"
+OTHER = "A low-poly 3D render of a red sports car parked in a neon-lit underground garage"
+
+def item(item_id, prompt, remixes=()):
+    return {"id": item_id, "prompt": prompt, "remixSuggestions": [{"label": "x", "prompt": p} for p in remixes]}
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.9])
+def test_lsh_bands_inflection_below_threshold(threshold):
+    bands, rows = lsh_bands(128, threshold)
+    assert bands * rows == 128 and (1 / bands) ** (1 / rows) <= threshold
+
+def test_query_threshold():
+    index = DuplicateIndex()
+    index.add_many([("a", PROMPT), ("b", OTHER)])
+    hits = index.query(NEAR)
+    assert [key for _, key, _ in hits] == ["a"] and 0.8 <= hits[0][0] < 1
+    assert index.query(NEAR, threshold=0.99) == []
+    # 固定的开头 ("Create an image of") 和标点、大小写不影响相似度
+    assert index.query("Create an image of: " + PROMPT.upper() + "!")[0][:2] == (1.0, "a")
+    assert index.query(NEAR, exclude=lambda key: key == "a") == []
+    index.remove("a")
+    assert index.query(PROMPT) == [] and len(index) == 1
+
+def test_save_and_load():
+    index = DuplicateIndex(threshold=0.7)
+    index.add_many([(("a.json", "1", "prompt"), PROMPT), (("a.json", "2", "prompt"), OTHER)])
+    index.remove(("a.json", "2", "prompt"))
+    buf = io.BytesIO()
+    index.save(buf)
+    buf.seek(0)
+    loaded = DuplicateIndex.load(buf)
+    assert loaded.threshold == 0.7 and len(loaded) == 1
+    assert loaded.query(NEAR) == index.query(NEAR)
+
+def test_overlay_projects_are_isolated():
+    # 回归：所有项目共用一份 base，项目加入的 prompt 只进自己的小索引，不改 base，别的项目也查不到
+    base = DuplicateIndex()
+    add_builtin_prompts(base)
+    size = len(base)
+    first, second = OverlayIndex(base), OverlayIndex(base)
+    assert first.base is second.base is base
+    first.add(("p1", "1", "prompt"), PROMPT)
+    assert len(base) == size and len(first) == size + 1 and len(second) == size
+    assert [key for _, key, _ in first.query(NEAR)] == [("p1", "1", "prompt")]
+    assert second.query(NEAR) == []
+    # 自己的条目和 base 同 key 时以自己的为准
+    builtin = ("builtin", REMIX_LIST_EN[0]["label"], "remix")
+    first.add(builtin, OTHER)
+    assert builtin not in [key for _, key, _ in first.query(REMIX_LIST_EN[0]["prompt"])]
+    assert builtin in [key for _, key, _ in second.query(REMIX_LIST_EN[0]["prompt"])]
+    first.remove(("p1", "1", "prompt"))
+    assert first.query(NEAR) == [] and len(base) == size
+
+def test_check_item():
+    index = OverlayIndex(DuplicateIndex())
+    add_builtin_prompts(index.base)
+    assert check_item(index, "p", item("1", PROMPT, [REMIX_LIST_EN[0]["prompt"], OTHER])) == []
+    # 再次保存同一个条目不算重复；内置原文的 remix 也不算
+    assert check_item(index, "p", item("1", PROMPT, [REMIX_LIST_EN[0]["prompt"]])) == []
+    found = check_item(index, "p", item("2", NEAR, [REMIX_LIST_EN[0]["prompt"], PROMPT]))
+    assert [(field, [key for _, key, _ in hits]) for field, hits in found] == [("prompt", [("p", "1", "prompt")]), ("remix2", [("p", "1", "prompt")])]
+    assert describe_key(found[0][1][0][1]) == "p #1 prompt"
+    # 改了几个字的内置 prompt 会找到内置条目；重新保存时去掉的 remix2 不再留在索引里
+    edited = REMIX_LIST_EN[2]["prompt"].replace("soft shadows", "soft shadow")
+    found = dict(check_item(index, "p", item("3", "", [edited])))
+    assert describe_key(found["remix1"][0][1]) == f"built-in '{REMIX_LIST_EN[2]['label']}'"
+    assert ("p", "1", "remix2") not in index.own
+    assert check_item(index, "p", item("4", OTHER)) == []
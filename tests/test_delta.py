@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import struct
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import synthetic  # noqa: E402
+from remix_core import (MANIFEST_NAME, ExportBuilder, apply_delta, build_processed_results, diff_dataset_zips,  # noqa: E402
+                        process_ppt_file, read_manifest)
+
+@pytest.fixture
+def versions(tmp_path):
+    # 基准和新版本：改一条 prompt、换一张图、删一条、加一条
+    deck = str(tmp_path / "deck.pptx")
+    synthetic.write_deck(deck, synthetic.deck_spec(slides=6, picture_ratio=1, unique_ratio=1, image_kb=4))
+    data, images = process_ppt_file(deck, 1)
+    images = {name: bytes(image.blob) for name, image in images.items()}
+    processed = build_processed_results(data, seed=0)
+    base = export(tmp_path / "base.zip", processed, images)
+    processed["2.json"] = dict(processed["2.json"], prompt="changed")
+    images["3.png"] = images["4.png"]
+    del processed["5.json"], images["5.png"]
+    processed["100.json"] = dict(processed["1.json"], id="100")
+    images["100.png"] = images["1.png"]
+    return base, export(tmp_path / "new.zip", processed, images)
+
+def export(path, processed, images):
+    with open(path, "wb") as f:
+        ExportBuilder().write(f, processed, images)
+    return str(path)
+
+def diff(base, new, path):
+    with open(path, "wb") as f:
+        stats = diff_dataset_zips(base, new, f)
+    return str(path), stats
+
+def members(path):
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {name: zf.read(name) for name in zf.namelist() if name != MANIFEST_NAME}
+
+def test_apply_reproduces_target(tmp_path, versions):
+    base, new = versions
+    delta, stats = diff(base, new, tmp_path / "delta.zip")
+    assert (stats["changed"], stats["images"], stats["removed"]) == (3, 2, 1)
+    out = str(tmp_path / "out.zip")
+    apply_delta(base, delta, out)
+    assert members(out) == members(new)
+    # 原地修改的结果相同；应用后的 manifest 可以直接作为下一次 diff 的基准
+    in_place = shutil.copy(base, tmp_path / "in_place.zip")
+    apply_delta(in_place, delta)
+    assert members(in_place) == members(new)
+    assert diff(read_manifest(in_place), new, tmp_path / "empty.zip")[1]["changed"] == 0
+
+def test_manifest_mismatch_is_rejected(tmp_path, versions):
+    base, new = versions
+    delta, _ = diff(new, new, tmp_path / "delta.zip")
+    copy = shutil.copy(base, tmp_path / "copy.zip")
+    with pytest.raises(ValueError, match="different version"):
+        apply_delta(copy, delta)
+    with open(base, "rb") as a, open(copy, "rb") as b:
+        assert a.read() == b.read()
+
+def patch(path, name, crc=None, payload=False):
+    # crc: 改中央目录里记的 CRC；payload: 改条目数据的第一个字节
+    with open(path, "r+b") as f:
+        data = bytearray(f.read())
+        pos = data.find(b"PK\x01\x02")
+        while data[pos + 46:pos + 46 + struct.unpack_from("<H", data, pos + 28)[0]] != name.encode(): pos = data.find(b"PK\x01\x02", pos + 4)
+        if crc is not None: struct.pack_into("<I", data, pos + 16, crc)
+        if payload:
+            offset = struct.unpack_from("<I", data, pos + 42)[0]
+            name_len, extra_len = struct.unpack_from("<HH", data, offset + 26)
+            data[offset + 30 + name_len + extra_len] ^= 0xFF
+        f.seek(0)
+        f.write(data)
+
+@pytest.mark.parametrize("change", [{"crc": 0}, {"payload": True}])
+def test_crc_mismatch_is_rejected(tmp_path, versions, change):
+    base, new = versions
+    delta, _ = diff(base, new, tmp_path / "delta.zip")
+    patch(delta, "images/3.png", **change)
+    copy = shutil.copy(base, tmp_path / "copy.zip")
+    with pytest.raises(ValueError, match="images/3.png"):
+        apply_delta(copy, delta)
+    with pytest.raises(ValueError, match="images/3.png"):
+        apply_delta(base, delta, str(tmp_path / "out.zip"))
+    # 出错时 base 不变，也不留下输出文件
+    with open(base, "rb") as a, open(copy, "rb") as b:
+        assert a.read() == b.read()
+    assert not any(name.startswith("out.zip") for name in os.listdir(tmp_path))
+
+def test_diff_against_manifest_file(tmp_path, versions):
+    base, new = versions
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps(read_manifest(base)))
+    assert diff(str(manifest), new, tmp_path / "b.zip")[1] == diff(base, new, tmp_path / "a.zip")[1]
@@ -0,0 +1,59 @@
+import io
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import synthetic  # noqa: E402
+from remix_core import ExportBuilder, build_processed_results, extract_images_from_ppt, process_ppt_file  # noqa: E402
+from remix_core.zipwriter import spool_file  # noqa: E402
+
+@pytest.fixture
+def deck(tmp_path):
+    path = str(tmp_path / "deck.pptx")
+    synthetic.write_deck(path, synthetic.deck_spec(slides=6, picture_ratio=1, unique_ratio=0.5, image_kb=4))
+    return path
+
+class FailingNormalizer:
+    key = ("png", 90, None)
+
+    def iter_normalized(self, items):
+        for _ in items: raise OSError("disk full")
+        yield
+
+def test_extract_closes_fp_on_error(deck):
+    fp = spool_file()
+    assert extract_images_from_ppt(io.BytesIO(b"not a zip"), 1, fp=fp) == (None, "File is not a valid .pptx file.")
+    assert fp.closed
+    fp = spool_file()
+    with pytest.raises(OSError):
+        extract_images_from_ppt(deck, 1, fp=fp, normalizer=FailingNormalizer())
+    assert fp.closed
+
+def test_abandoned_export_does_not_block(deck):
+    data, images = process_ppt_file(deck, 1)
+    processed = build_processed_results(data, seed=0)
+    builder = ExportBuilder()
+    chunks = builder.iter_chunks(processed, images)
+    next(chunks) # 下载中途被取消，生成器留在那里
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(f=builder.build_file(processed, images)), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    with zipfile.ZipFile(result["f"]) as zf:
+        assert zf.testzip() is None
+        assert len(zf.namelist()) == len(data) + 1
+
+def test_cache_hits_only_from_previous_build(deck):
+    data, images = process_ppt_file(deck, 1)
+    processed = build_processed_results(data, seed=0)
+    builder = ExportBuilder()
+    builder.build(processed, images)
+    assert builder.last_stats["cached"] == 0
+    builder.build(processed, images)
+    assert builder.last_stats["cached"] == builder.last_stats["unique_images"] + 1
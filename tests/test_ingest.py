@@ -0,0 +1,101 @@
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import synthetic  # noqa: E402
+from remix_core import metrics  # noqa: E402
+from remix_core.cli import main  # noqa: E402
+from remix_core.ingest import MediaArchive, count_slides, process_ppt_file  # noqa: E402
+
+def write_deck(path, slides=4):
+    synthetic.write_deck(str(path), synthetic.deck_spec(slides=slides, picture_ratio=1, unique_ratio=1, image_kb=4))
+    return str(path)
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+def corrupt_crc(path, member):
+    # 改掉中央目录里记录的 CRC-32，读这个成员时 zipfile 报 "Bad CRC-32"
+    with zipfile.ZipFile(path) as zf:
+        start_dir = zf.start_dir
+    with open(path, "r+b") as f:
+        data = f.read()
+        header = data.index(member.encode("utf-8"), start_dir) - 46
+        assert data[header:header + 4] == b"PK\x01\x02"
+        f.seek(header + 16)
+        f.write(bytes(b ^ 0xFF for b in data[header + 16:header + 20]))
+
+def test_corrupt_media_raises_value_error(tmp_path):
+    deck = write_deck(tmp_path / "bad.pptx")
+    corrupt_crc(deck, "ppt/media/image2.png")
+    with pytest.raises(ValueError, match="Error reading PPT"):
+        process_ppt_file(deck, 1)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_convert_skips_corrupt_deck(tmp_path, capsys, workers):
+    # 并行时每个文件切成单张 slide 的段：坏文件后面的段要收完，下一个文件的 ID 仍从 1 开始
+    bad, good = write_deck(tmp_path / "bad.pptx"), write_deck(tmp_path / "good.pptx")
+    corrupt_crc(bad, "ppt/media/image2.png")
+    out_dir = tmp_path / "out"
+    assert main(["convert", bad, good, "-o", str(out_dir), "--start-id", "1", "--workers", str(workers), "--chunk-slides", "1"]) == 1
+    assert "bad.pptx: Error: Error reading PPT" in capsys.readouterr().err
+    assert sorted(os.listdir(out_dir)) == ["good.zip"]
+    with zipfile.ZipFile(out_dir / "good.zip") as zf:
+        assert zf.testzip() is None
+        assert "images/1.png" in zf.namelist()
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+@pytest.mark.parametrize("source", [b"", b"not a zip"])
+def test_invalid_archive_closes_file(tmp_path, source):
+    path = tmp_path / "bad.pptx"
+    path.write_bytes(source)
+    before = open_fds()
+    for _ in range(3):
+        with pytest.raises(ValueError, match="not a valid"):
+            MediaArchive(str(path))
+        with pytest.raises(ValueError, match="not a valid"):
+            MediaArchive(io.BytesIO(source))
+    assert open_fds() == before
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_archive_close(tmp_path):
+    deck = write_deck(tmp_path / "deck.pptx")
+    before = open_fds()
+    with MediaArchive(deck) as archive:
+        data, images = process_ppt_file(archive, 1)
+        assert len(data) == 4 and images["1.png"].blob
+        assert open_fds() > before
+    assert open_fds() == before
+    assert count_slides(deck) == 4 and open_fds() == before
+    main(["convert", deck, deck, "-o", str(tmp_path / "out"), "--start-id", "1"])
+    assert open_fds() == before
+
+def test_extract_skips_corrupt_deck(tmp_path, capsys):
+    bad, good = write_deck(tmp_path / "bad.pptx"), write_deck(tmp_path / "good.pptx")
+    corrupt_crc(bad, "ppt/media/image2.png")
+    out_dir = tmp_path / "out"
+    assert main(["extract", bad, good, "-o", str(out_dir), "--start-id", "1"]) == 1
+    assert "bad.pptx: Error: Error reading PPT" in capsys.readouterr().err
+    assert sorted(os.listdir(out_dir)) == ["good.zip"]
+    with zipfile.ZipFile(out_dir / "good.zip") as zf:
+        assert zf.namelist() == ["1.png", "2.png", "3.png", "4.png"]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_convert_records_zip_build(tmp_path, workers):
+    decks = [write_deck(tmp_path / "a.pptx"), write_deck(tmp_path / "b.pptx")]
+    out_dir = tmp_path / "out"
+    metrics.enable()
+    metrics.REGISTRY.reset()
+    try:
+        assert main(["convert", *decks, "-o", str(out_dir), "--start-id", "1", "--workers", str(workers), "--chunk-slides", "1"]) == 0
+        stage = metrics.REGISTRY.snapshot()["zip_build"]
+    finally:
+        metrics.enable(False)
+    # 与单进程的 ExportBuilder 一样：8 张图片加上两个 dataset.json
+    assert stage["count"] == 2 and stage["items"] == 10
+    assert stage["bytes_out"] == sum(os.path.getsize(out_dir / name) for name in ("a.zip", "b.zip"))
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import synthetic  # noqa: E402
+from remix_core import ExportBuilder, build_processed_results, merge_dataset_zips, process_ppt_file  # noqa: E402
+
+def export(tmp_path, name, start_id, layout="copies", seed=1):
+    deck = str(tmp_path / f"{name}.pptx")
+    synthetic.write_deck(deck, synthetic.deck_spec(slides=5, picture_ratio=0.8, unique_ratio=0.5, image_kb=4, seed=seed))
+    data, images = process_ppt_file(deck, start_id)
+    path = str(tmp_path / f"{name}.zip")
+    with open(path, "wb") as f:
+        ExportBuilder(layout=layout).write(f, build_processed_results(data, seed=0), images)
+    return path
+
+def contents(paths):
+    # [(条目, 图片内容)]，按顺序连起来；ID 换成序号，只比较内容
+    result = []
+    for path in paths:
+        with zipfile.ZipFile(path) as zf:
+            assert zf.testzip() is None
+            manifest = json.loads(zf.read("images.json")) if "images.json" in zf.namelist() else None
+            for item in json.loads(zf.read("dataset.json")):
+                name = manifest.get(item["id"]) if manifest is not None else f"images/{item['id']}.png"
+                image = zf.read(name) if name in zf.namelist() else None
+                result.append((item["prompt"], item["remixSuggestions"], image))
+    return result
+
+def ids(paths):
+    result = []
+    for path in paths:
+        with zipfile.ZipFile(path) as zf:
+            items = json.loads(zf.read("dataset.json"))
+            assert sorted(n for n in zf.namelist() if n.startswith("images/")) == sorted(f"images/{item['id']}.png" for item in items)
+            result += [int(item["id"]) for item in items]
+    return result
+
+def test_merge_renumbers_and_keeps_content(tmp_path):
+    sources = [export(tmp_path, "a", 1), export(tmp_path, "b", 1, layout="unique", seed=2)]
+    out = str(tmp_path / "merged.zip")
+    stats = merge_dataset_zips(sources, out, start_id=100)
+    assert stats["items"] == len(contents(sources)) and stats["missing"] == 0
+    assert ids([out]) == list(range(100, 100 + stats["items"]))
+    assert contents([out]) == contents(sources)
+
+@pytest.mark.parametrize("shard", [{"shard_items": 3}, {"shard_bytes": 12_000}])
+def test_shards_round_trip(tmp_path, shard):
+    sources = [export(tmp_path, "a", 1), export(tmp_path, "b", 1, seed=2)]
+    merged = str(tmp_path / "merged.zip")
+    merge_dataset_zips(sources, merged, start_id=1)
+    stats = merge_dataset_zips(sources, str(tmp_path / "shard.zip"), start_id=1, **shard)
+    paths = [info["path"] for info in stats["shards"]]
+    assert len(paths) > 1 and all(os.path.basename(path).startswith("shard-000") for path in paths)
+    assert not os.path.exists(tmp_path / "shard.zip")
+    if "shard_items" in shard: assert all(info["items"] <= 3 for info in stats["shards"])
+    else: assert all(os.path.getsize(path) <= 12_000 or info["items"] == 1 for path, info in zip(paths, stats["shards"]))
+    # 切片连起来 ID 仍然连续，内容与不切片的合并结果相同；再合并回一个文件也一样
+    assert ids(paths) == ids([merged])
+    assert contents(paths) == contents([merged])
+    again = str(tmp_path / "again.zip")
+    merge_dataset_zips(paths, again, start_id=1)
+    with zipfile.ZipFile(merged) as a, zipfile.ZipFile(again) as b:
+        assert a.namelist() == b.namelist()
+        assert all(a.read(name) == b.read(name) for name in a.namelist())
+
+def test_missing_dataset_json_leaves_no_output(tmp_path):
+    bad = str(tmp_path / "bad.zip")
+    with zipfile.ZipFile(bad, "w") as zf:
+        zf.writestr("images/1.png", b"x")
+    out = str(tmp_path / "merged.zip")
+    with pytest.raises(ValueError, match="no dataset.json"):
+        merge_dataset_zips([export(tmp_path, "a", 1), bad], out, shard_items=2)
+    # 已经完成的切片保留，没写完的删掉
+    assert not any(name.endswith(".part") for name in os.listdir(tmp_path))
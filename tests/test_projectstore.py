@@ -0,0 +1,88 @@
+import gc
+import os
+import sqlite3
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import synthetic  # noqa: E402
+from remix_core import DeckCache, ProjectStore, process_ppt_file  # noqa: E402
+
+def write_deck(path, seed=1):
+    synthetic.write_deck(str(path), synthetic.deck_spec(slides=5, picture_ratio=0.8, image_kb=4, seed=seed))
+    return str(path)
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProjectStore(str(tmp_path / "projects"))
+    yield store
+    store.close()
+
+def test_create_project_matches_process_ppt_file(tmp_path, store):
+    deck = write_deck(tmp_path / "deck.pptx")
+    data, images = process_ppt_file(deck, 900)
+    project_id = store.create_project(deck, 900, name="demo", deck_cache=DeckCache(str(tmp_path / "cache")))
+    assert store.project(project_id)["name"] == "demo"
+    assert store.slide_count(project_id) == len(data)
+    assert [store.slide(project_id, i) for i in range(len(data))] == data
+    assert store.item_ids(project_id) == [item["id"] for item in data]
+    project_images = store.images(project_id)
+    assert sorted(project_images) == sorted(images)
+    assert all(bytes(project_images[name].blob) == bytes(images[name].blob) for name in images)
+    with pytest.raises(IndexError):
+        store.slide(project_id, len(data))
+
+def test_draft_result_and_first_unsaved(tmp_path, store):
+    project_id = store.create_project(write_deck(tmp_path / "deck.pptx"), 1)
+    ids = store.item_ids(project_id)
+    assert store.first_unsaved(project_id) == 0 and store.card_state(project_id, ids[0]) is None
+    store.save_draft(project_id, ids[0], [{"prompt": "a"}])
+    assert store.card_state(project_id, ids[0]) == {"prompt": None, "remixSuggestions": [{"prompt": "a"}], "saved": False}
+    # 草稿不算保存，也不覆盖已有的记录
+    store.save_draft(project_id, ids[0], [{"prompt": "b"}])
+    assert store.card_state(project_id, ids[0])["remixSuggestions"] == [{"prompt": "a"}]
+    assert store.first_unsaved(project_id) == 0 and store.saved_count(project_id) == 0
+    store.save_result(project_id, ids[0], "p0", [{"prompt": "c"}])
+    assert store.card_state(project_id, ids[0]) == {"prompt": "p0", "remixSuggestions": [{"prompt": "c"}], "saved": True}
+    store.save_result(project_id, ids[2], "p2", [])
+    assert store.first_unsaved(project_id) == 1 and store.saved_count(project_id) == 2
+    assert list(store.processed(project_id)) == [f"{ids[0]}.json", f"{ids[2]}.json"]
+    for item_id in ids: store.save_result(project_id, item_id, "p", [])
+    # 全部保存过时停在最后一张
+    assert store.first_unsaved(project_id) == len(ids) - 1
+
+def test_delete_releases_unused_deck(tmp_path, store):
+    deck = write_deck(tmp_path / "deck.pptx")
+    first = store.create_project(deck, 1)
+    second = store.create_project(deck, 100)
+    other = store.create_project(write_deck(tmp_path / "other.pptx", seed=2), 200)
+    path = store.deck_path(store.project(first)["deck_digest"])
+    assert bytes(next(iter(store.images(first).values())).blob)
+    # 还有项目用同一个 deck 时不删文件
+    store.delete_project(first)
+    assert store.project(first) is None and os.path.exists(path)
+    store.delete_project(second)
+    assert not os.path.exists(path)
+    assert os.path.exists(store.deck_path(store.project(other)["deck_digest"]))
+    assert sorted(os.listdir(os.path.dirname(path))) == [os.path.basename(store.deck_path(store.project(other)["deck_digest"]))]
+
+def test_thread_connection_closed_when_thread_ends(store):
+    conns = []
+    thread = threading.Thread(target=lambda: conns.append(store._conn()))
+    thread.start()
+    thread.join()
+    gc.collect()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conns[0].execute("SELECT 1")
+    assert store.projects() == []
+
+def test_close_closes_every_connection(store):
+    conn = store._conn()
+    store.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    # 关掉之后再用会重新打开连接
+    assert store.projects() == []
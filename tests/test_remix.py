@@ -0,0 +1,59 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from remix_parser import legacy_parse_bulk_remix_text  # noqa: E402
+from remix_core import COPILOT_GEN_INSTRUCTION, iter_bulk_remix_items, parse_bulk_remix_text  # noqa: E402
+
+# 单遍解析器必须和原来的回溯实现 (benchmarks/remix_parser.py) 给出完全相同的 {label, prompt} 列表：
+# 手写的几段粘贴文本，加上用常见对话行随机拼成的文本
+
+GOLDEN_TEXTS = [
+    "",
+    "   \n\t\n",
+    COPILOT_GEN_INSTRUCTION,
+    "Neon Nights\nCreate this picture as a neon-lit city at night.\n\nPaper Craft\nRemake this image in paper cut style.",
+    "1. Watercolor Dream\n   Create this picture as a watercolor painting,\n   with soft edges and bleeding colors.\n2. Pixel Quest\n   Change to retro pixel art.",
+    "Label: Stained Glass\nPrompt: Make this a stained glass window.\n\nLabel: Ukiyo-e\nPrompt: Remake this image as a Japanese woodblock print.",
+    "Glitch: Apply a glitch effect with pixel splits.\nSepia: Add an aged sepia tone.\nMono: Convert to monochrome.",
+    "Sure! Here are 5 remix prompts:\n\n**1. Zoom In**\nCreate a macro close-up.\n**2. Zoom Out**\nCreate an expanded scene\nthat shows the surroundings.\n\nLet me know if you want more!",
+    "Create a cat\nCreate a dog\nCreate a bird",
+    "- Title A\n- Make it blue\n* Title B\n* Turn it red\n12\nUse pencil\n:\nMake:",
+    "Windows line\r\nCreate with CRLF endings\r\n\r\nSecond\r\nChange the palette\r\n",
+    "Ünïcode Title\nSwitch to a vaporwave palette. 🌈\n中文标题: Make this look like an ink painting",
+]
+
+CORPUS_LINES = [
+    "Create a cat", "create", "Make it blue", "Title", "1. Neon Glow", "2) Change colors", "- Apply blur", "* Use pencil",
+    "Label: Watercolor", "Prompt: Create this as watercolor", "", "   ", "Some continuation text", "Another line.",
+    "Title: Make this pop", "3. Foo: turn it red", ":", "Make:", "Add:", "x: y", "\t", "12", "Replace the sky\r",
+    "Ünïcode: Switch up", "**Bold Title**", "Here are your prompts:",
+]
+
+def golden_corpus(random_cases, seed=0):
+    rng = random.Random(seed)
+    cases = list(GOLDEN_TEXTS)
+    for _ in range(random_cases):
+        text = "\n".join(rng.choice(CORPUS_LINES) for _ in range(rng.randrange(20)))
+        if rng.random() < 0.2: text += "\n"
+        cases.append(text)
+    return cases
+
+def assert_same(text):
+    expected = legacy_parse_bulk_remix_text(text)
+    assert parse_bulk_remix_text(text) == expected
+    # 逐行读取 (上传的文件) 时结果也一样；空文本的 legacy 结果与逐行无关
+    if text.strip(): assert list(iter_bulk_remix_items(line + "\n" for line in text.split("\n"))) == expected
+
+@pytest.mark.parametrize("text", GOLDEN_TEXTS)
+def test_golden_texts(text):
+    assert_same(text)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_corpus(seed):
+    for text in golden_corpus(1000, seed)[len(GOLDEN_TEXTS):]:
+        assert_same(text)
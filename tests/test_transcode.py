@@ -0,0 +1,64 @@
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+from remix_core import ExportBuilder, ImageNormalizer, image_digest
+
+def png(color, side=64):
+    out = io.BytesIO()
+    Image.new("RGB", (side, side), color).save(out, "PNG")
+    return out.getvalue()
+
+IMAGES = [png((n * 40, 0, 0)) for n in range(5)]
+
+def items(images):
+    return [(image_digest(blob), blob) for blob in images]
+
+@pytest.fixture
+def normalizer():
+    normalizers = []
+    def make(*args, **kwargs):
+        normalizers.append(ImageNormalizer(*args, **kwargs))
+        return normalizers[-1]
+    yield make
+    for n in normalizers: n.close()
+
+def test_hits_and_misses(normalizer):
+    norm = normalizer("jpeg", 80, workers=2)
+    first = list(norm.iter_normalized(items(IMAGES), lookahead=2))
+    assert [hit for _, _, hit in first] == [False] * 5
+    assert all(result.format == "jpeg" and result.status == "transcoded" for _, result, _ in first)
+    # 顺序与输入一致；重复的图片第二次起来自缓存
+    again = list(norm.iter_normalized(items([IMAGES[3], IMAGES[0], IMAGES[3]])))
+    assert [d for d, _, _ in again] == [image_digest(IMAGES[3]), image_digest(IMAGES[0]), image_digest(IMAGES[3])]
+    assert [hit for _, _, hit in again] == [True, True, True]
+    assert again[0][1] == first[3][1]
+    assert norm.stats()["hits"] == 3 and norm.stats()["misses"] == 5
+
+def test_cache_is_bounded(normalizer):
+    norm = normalizer("png", max_side=16, cache_bytes=1)
+    list(norm.iter_normalized(items(IMAGES)))
+    assert norm.stats()["cached"] == 0
+    assert [hit for _, _, hit in norm.iter_normalized(items(IMAGES[:1]))] == [False]
+
+def test_unchanged_image_is_kept(normalizer):
+    result = normalizer("keep").normalize(image_digest(IMAGES[0]), IMAGES[0])
+    assert result.status == "unchanged" and result.data == IMAGES[0] and result.format == "png"
+
+def test_export_rebuilds_entries_when_options_change(normalizer):
+    # ExportBuilder 的图片条目按 (摘要, 处理参数) 缓存：换了参数不能用上次的条目
+    processed = {f"{n}.json": {"id": str(n), "prompt": "p", "remixSuggestions": []} for n in range(1, 4)}
+    storage = {f"{n}.png": IMAGES[n] for n in range(1, 4)}
+    builder = ExportBuilder()
+
+    def export(norm):
+        with zipfile.ZipFile(builder.build(processed, storage, normalizer=norm)) as zf:
+            return sorted(zf.namelist()), builder.last_stats["cached"]
+
+    assert export(normalizer("jpeg", 80)) == (["dataset.json", "images/1.jpg", "images/2.jpg", "images/3.jpg"], 0)
+    assert export(normalizer("jpeg", 80))[1] == 4
+    assert export(normalizer("webp", 80)) == (["dataset.json", "images/1.webp", "images/2.webp", "images/3.webp"], 1)
+    assert export(normalizer("jpeg", 50))[1] == 1
+    assert export(None) == (["dataset.json", "images/1.png", "images/2.png", "images/3.png"], 1)
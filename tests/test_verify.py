@@ -0,0 +1,24 @@
+from remix_core import HttpBackend, StandInServer, Verifier, VerifyCache, verify_request
+
+class CountingBackend:
+    def __init__(self, backend):
+        self.backend = backend
+        self.fetches = 0
+
+    def fetch(self, request):
+        self.fetches += 1
+        return self.backend.fetch(request)
+
+def test_verify_cache_and_fresh_sample(tmp_path):
+    with StandInServer() as server:
+        backend = CountingBackend(HttpBackend(server.url))
+        verifier = Verifier(backend, VerifyCache(str(tmp_path)))
+        request = verify_request("Create a red fox", 7)
+        first = verifier.get(request)
+        assert verifier.get(request) == first and backend.fetches == 1
+        assert verifier.get(request, fresh=True) == first and backend.fetches == 2
+        # 换 seed 就是另一张图
+        other = verifier.get(verify_request("Create a red fox", 8))
+        assert other != first and backend.fetches == 3
+        results = verifier.verify_all([request, request, verify_request("Create a blue fox", 7)])
+        assert len(results) == 2 and backend.fetches == 4